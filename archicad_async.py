@@ -0,0 +1,23 @@
+# Import typing not essential for the code.
+from typing import Any, List
+
+# This module is the concurrent gather helper of the shared session (see 'archicad_session.py').
+#
+# The Archicad JSON API commands of the archicad package are blocking HTTP requests and the scripts have no
+# event loop, so the independent queries of a script are not wrapped into asyncio awaitables: they are sent on the
+# thread pool of the session ('session.Submit', limited by 'MAX_PARALLEL_REQUESTS') and the script waits for all of them.
+# The wall time is the time of the slowest query instead of the sum.
+# Any function calling commands (e.g. a part of a script collecting its data) can be run the same way.
+#
+# Usage:
+#   zones, walls = RunConcurrently(session, [(session.commands.GetElementsByType, ('Zone',)),
+#                                            (session.commands.GetElementsByType, ('Wall',))])
+
+
+# This function runs the functions concurrently on the thread pool of the session and waits for all of them.
+# The thread pool is the one of the session, it is not created again on every call.
+# Arguments: the session (see 'OpenSession'), list of (function, arguments tuple) tuples.
+# Returns the list of the results in the same order, the first error of the calls (in the order of the list) is raised.
+def RunConcurrently(session, calls: List[tuple]) -> List[Any]:
+    pendingResults = [session.Submit(function, *args) for function, args in calls]
+    return [pendingResult.Result() for pendingResult in pendingResults]
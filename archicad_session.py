@@ -0,0 +1,581 @@
+# Import archicad connection (required).
+from archicad import ACConnection
+# Import the thread pool to send the queued commands to Archicad side by side.
+from concurrent.futures import ThreadPoolExecutor
+# Import contextmanager to create the 'with session.Batch():' block.
+from contextlib import contextmanager
+# Import OrderedDict for the LRU metadata cache, Lock to use the cache from more threads.
+from collections import OrderedDict
+from threading import Lock, local
+# Import hashlib, json, os and uuid for the metadata cache on the disk, atexit to print the instrumentation,
+# tempfile to replace the write journal in one step.
+import atexit, hashlib, json, os, tempfile, uuid
+# Import typing not essential for the code.
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+# Import the opt-in instrumentation of the API calls.
+from instrumentation import Instrumentation, InstrumentedProxy
+# Import the classification index (the flattened classification tree of a system).
+from classification_index import ClassificationIndex, getClassificationItemGuid
+
+# This module is shared by all the scripts of the repository.
+# It establishes the connection with Archicad and gives back the usual shorts of the commands,
+# types and utilities (acc, act, acu) through an 'ArchicadSession' object.
+#
+# Every Archicad JSON API command is a separate HTTP request and the scripts are waiting for
+# the answer of each request before they send the next one. Most of the commands at the
+# beginning of the scripts are independent of each other (e.g. getting a property id and
+# getting the elements), so there is no reason to wait for them one by one.
+# The JSON API has no batch command, so the session 'pipelines' them instead:
+# the independent commands are queued and when the results are needed the whole queue
+# is sent at once on parallel threads. The round-trips overlap instead of adding up.
+
+################################ CONFIGURATION #################################
+# The maximum number of requests sent to Archicad at the same time.
+MAX_PARALLEL_REQUESTS = 8
+# The maximum number of metadata items (property ids, property details, classification systems)
+# kept in the cache of the session. The least recently used items are dropped first.
+METADATA_CACHE_SIZE = 4096
+# The folder where the property ids and the classification indexes are saved between the runs (one file per project).
+# None means the cache is kept in the memory only, for the lifetime of the session.
+METADATA_CACHE_FOLDER = None
+# The file where the written (property guid, element guid) pairs are recorded by every script, with the key of
+# the project (see 'session.GetProjectKey'), so more projects can share the same file.
+# The incremental tools (e.g. the incremental element ID conflict check) are reading it to know
+# which elements were changed since their last run. None means nothing is recorded.
+WRITE_JOURNAL_FILE = None
+# Record every command and utility call (count, latency, payload sizes, element counts) and the phases
+# of the scripts (see 'session.Phase'), and print them as a table at the end of the script.
+# It can be turned on with the 'ARCHICAD_INSTRUMENTATION=1' environment variable too.
+INSTRUMENTATION = os.environ.get('ARCHICAD_INSTRUMENTATION', '') not in ('', '0')
+# The JSON file of the recorded calls (the trace). None means the trace is not saved.
+# It can be set with the 'ARCHICAD_TRACE_FILE' environment variable too.
+INSTRUMENTATION_TRACE_FILE = os.environ.get('ARCHICAD_TRACE_FILE')
+# The folder of a project snapshot (see 'project_snapshot.py'): the commands are answered from the snapshot
+# instead of a running Archicad and the writes are dry-runs. None means the scripts connect to Archicad.
+# It can be set with the 'ARCHICAD_SNAPSHOT' environment variable too.
+SNAPSHOT = os.environ.get('ARCHICAD_SNAPSHOT')
+################################################################################
+
+
+# This class holds the result of a queued command (similar to a future).
+# It is only a placeholder until the session sends the queue with 'Flush'.
+# Calling 'Result()' before that sends the queue automatically.
+# A command sent with 'Submit' is running in the background, 'Result()' waits for it.
+class PendingResult:
+    def __init__(self, session, function: Callable, args, kwargs):
+        self._session = session
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+        self._done = False
+        self._value = None
+        self._error = None
+        # The future of the background thread if the command was sent with 'Submit'.
+        self._future = None
+        # The command can be run by the 'Flush' of the queue and by 'Result()' from another thread
+        # at the same time, the lock lets only one of them run it and the other one waits for the answer.
+        self._lock = Lock()
+
+    # Returns True if the command was already sent and the answer arrived.
+    def IsDone(self) -> bool:
+        return self._done
+
+    # Returns the result of the command, if the command raised an error it is raised here.
+    def Result(self) -> Any:
+        # If the command is running in the background wait for it.
+        if self._future is not None:
+            self._future.result()
+        # If the queue was not sent yet send it now.
+        if not self._done:
+            self._session.Flush()
+        # The command was queued by another thread (it is not in the queue of this thread), run it here.
+        if not self._done:
+            self._run()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    # Execute the command, this is called by the session (from a worker thread).
+    # The command runs only once, if it is already running the call waits for it.
+    def _run(self):
+        with self._lock:
+            if self._done:
+                return
+            try:
+                self._value = self._function(*self._args, **self._kwargs)
+            # The error is kept and raised only when somebody asks for the result.
+            except Exception as error:
+                self._error = error
+            self._done = True
+
+
+# This class is a dictionary with limited size, when it is full the least recently used item is dropped.
+# It is used from more threads (queued commands) so every operation is locked.
+class LRUCache:
+    def __init__(self, maxSize: int):
+        self.maxSize = maxSize
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    # Returns the cached value or the 'default' if the key is not in the cache.
+    def Get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return default
+            # The key was used so it goes to the end (most recently used).
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    # Add or update a value, drop the least recently used items above the size limit.
+    def Set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxSize:
+                self._items.popitem(last=False)
+
+    # Remove the items which keys are matching the criterion, or all the items if there is no criterion.
+    def Invalidate(self, criterion: Optional[Callable[[Hashable], bool]] = None):
+        with self._lock:
+            if criterion is None:
+                self._items.clear()
+            else:
+                for key in [key for key in self._items if criterion(key)]:
+                    del self._items[key]
+
+    # Returns the (key, value) pairs, used to save the cache.
+    def Items(self) -> List:
+        with self._lock:
+            return list(self._items.items())
+
+
+# The value returned by 'LRUCache.Get' for the keys not in the cache (None is a cached value: the item was not found).
+NOT_CACHED = object()
+
+
+# This function returns the guid (string) of an element id.
+# It works with both 'ElementId' and 'ElementIdArrayItem' (which contains an 'ElementId').
+def getElementGuid(elementId) -> str:
+    return str(getattr(elementId, 'elementId', elementId).guid)
+
+
+# This function returns the guid (string) of a property id.
+# It works with both 'PropertyId' and 'PropertyIdArrayItem' (which contains a 'PropertyId').
+def getPropertyGuid(propertyId) -> str:
+    return str(getattr(propertyId, 'propertyId', propertyId).guid)
+
+
+# This function creates a hashable key from a property user id
+# (BuiltInPropertyUserId has a 'nonLocalizedName', UserDefinedPropertyUserId has a 'localizedName' list).
+def getPropertyUserIdKey(propertyUserId) -> tuple:
+    nonLocalizedName = getattr(propertyUserId, 'nonLocalizedName', None)
+    if nonLocalizedName is not None:
+        return ('BuiltIn', nonLocalizedName)
+    return ('UserDefined', tuple(getattr(propertyUserId, 'localizedName', ())))
+
+
+# The session class used by the scripts.
+# Arguments: conn the established ACConnection.
+class ArchicadSession:
+    def __init__(self, conn: ACConnection):
+        self.conn = conn
+        # The same shorts the scripts used to create from the connection.
+        self.commands = conn.commands
+        self.types = conn.types
+        self.utilities = conn.utilities
+        # The instrumentation (None if it is not turned on).
+        self.instrumentation = None
+        if INSTRUMENTATION or INSTRUMENTATION_TRACE_FILE:
+            self._startInstrumentation()
+        # The queued (not yet sent) commands are kept per thread (see the '_queue' property).
+        self._threadState = local()
+        # The background thread pool of the 'Submit' function (created at the first use).
+        self._executor = None
+        # The metadata cache (see the 'Metadata cache' part below).
+        self.metadataCache = LRUCache(METADATA_CACHE_SIZE)
+        # The functions called when the metadata is invalidated (e.g. after property writes).
+        self._invalidationHooks: List[Callable] = []
+        # The file of the metadata cache on the disk (None if it is not used) and whether the cache
+        # was changed since it was loaded (the file is written only once, at the end of the script).
+        self._metadataCachePath = None
+        self._metadataCacheChanged = False
+        # The identity of the open project (see '_getProjectIdentity'), requested at the first use.
+        self._projectIdentity = NOT_CACHED
+        # The classification indexes of the systems: system name:ClassificationIndex (see 'GetClassificationIndex').
+        self._classificationIndexes: Dict[str, ClassificationIndex] = {}
+        self._classificationIndexLock = Lock()
+        if METADATA_CACHE_FOLDER:
+            self._loadMetadataCache(METADATA_CACHE_FOLDER)
+
+    # ------------------------------------ Instrumentation ------------------------------------
+    # The commands and the utilities are wrapped, so every call of the scripts and of the session
+    # is recorded (see 'instrumentation.py'). The summary is printed (and the trace is saved)
+    # when the script ends.
+
+    # Wrap the commands and the utilities and register the report at the end of the script.
+    def _startInstrumentation(self):
+        self.instrumentation = Instrumentation()
+        self.commands = InstrumentedProxy(self.conn.commands, self.instrumentation, 'command')
+        self.utilities = InstrumentedProxy(self.conn.utilities, self.instrumentation, 'utility')
+        atexit.register(self.ReportInstrumentation)
+
+    # Record the local work in the 'with' block (e.g. 'cluster', 'fill workbook') as a phase.
+    # Nothing is recorded if the instrumentation is not turned on.
+    @contextmanager
+    def Phase(self, name: str):
+        if self.instrumentation is None:
+            yield
+            return
+        with self.instrumentation.Phase(name):
+            yield
+
+    # Print the summary table and save the trace (if 'INSTRUMENTATION_TRACE_FILE' is set).
+    def ReportInstrumentation(self):
+        if self.instrumentation is None:
+            return
+        self.instrumentation.PrintSummary()
+        if INSTRUMENTATION_TRACE_FILE:
+            self.instrumentation.SaveTrace(INSTRUMENTATION_TRACE_FILE)
+
+    # The queued (not yet sent) commands of the actual thread.
+    # Every thread has its own queue, so the threads (e.g. the calls of 'RunConcurrently', see 'archicad_async.py')
+    # do not send each other's commands and a 'Flush' sends only the commands of its own thread.
+    @property
+    def _queue(self) -> List[PendingResult]:
+        if not hasattr(self._threadState, 'queue'):
+            self._threadState.queue = []
+        return self._threadState.queue
+
+    @_queue.setter
+    def _queue(self, queue: List[PendingResult]):
+        self._threadState.queue = queue
+
+    # Queue a command (or utility) call without sending it.
+    # Arguments: the function (e.g. acc.GetElementsByType) and its arguments.
+    # Returns a 'PendingResult', the value is available with its 'Result()' method.
+    def Queue(self, function: Callable, *args, **kwargs) -> PendingResult:
+        pendingResult = PendingResult(self, function, args, kwargs)
+        self._queue.append(pendingResult)
+        return pendingResult
+
+    # Send all the queued commands together and wait for all the answers.
+    def Flush(self):
+        # Take the queue and start a new one, so the commands can not be sent twice.
+        # The commands already run by their 'Result()' (from another thread) are left out.
+        queue = [pendingResult for pendingResult in self._queue if not pendingResult._done]
+        self._queue = []
+        # One command does not need any thread.
+        if len(queue) == 1:
+            queue[0]._run()
+        elif queue:
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(queue))) as executor:
+                # Wait for all of them (list consumes the map iterator).
+                list(executor.map(PendingResult._run, queue))
+
+    # Send a command (or any function calling commands) right away in the background.
+    # The script can continue its work (e.g. reading the next part of a file) while Archicad
+    # is answering, this is how the work of the script and the requests can be pipelined.
+    # Arguments: the function and its arguments.
+    # Returns a 'PendingResult', its 'Result()' method waits for the answer.
+    def Submit(self, function: Callable, *args, **kwargs) -> PendingResult:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS)
+        pendingResult = PendingResult(self, function, args, kwargs)
+        pendingResult._future = self._executor.submit(pendingResult._run)
+        return pendingResult
+
+    # With this context manager the commands queued inside the 'with' block are sent
+    # together when the block ends, e.g.:
+    #   with session.Batch():
+    #       propertyId = session.Queue(acu.GetBuiltInPropertyId, 'General_ElementID')
+    #       elements = session.Queue(acc.GetElementsByType, 'Zone')
+    #   elements.Result()
+    @contextmanager
+    def Batch(self):
+        try:
+            yield self
+        finally:
+            self.Flush()
+
+    # ---------------------------------- Metadata cache ----------------------------------
+    # The property ids, property details and classification systems do not change while a script
+    # is running, but the scripts were asking for them again and again. These functions have the
+    # same arguments as the utilities/commands with the same names, but every answer is kept in the
+    # 'metadataCache' and the next request is answered from there without any round-trip.
+
+    # This function returns the cached value of the key or calls the function and caches its result.
+    # A None result (e.g. a property which does not exist) is cached too, it is not requested again.
+    def _cached(self, key: Hashable, function: Callable, *args) -> Any:
+        value = self.metadataCache.Get(key, NOT_CACHED)
+        if value is NOT_CACHED:
+            value = function(*args)
+            self.metadataCache.Set(key, value)
+            self._metadataCacheChanged = True
+        return value
+
+    # Cached version of acu.GetBuiltInPropertyId.
+    def GetBuiltInPropertyId(self, name: str):
+        return self._cached(('builtInPropertyId', name), self.utilities.GetBuiltInPropertyId, name)
+
+    # Cached version of acu.GetUserDefinedPropertyId.
+    def GetUserDefinedPropertyId(self, groupName: str, name: str):
+        return self._cached(('userDefinedPropertyId', groupName, name), self.utilities.GetUserDefinedPropertyId, groupName, name)
+
+    # Cached version of acc.GetPropertyIds.
+    # Only the property user ids not found in the cache are requested (in one command).
+    def GetPropertyIds(self, propertyUserIds: List) -> List:
+        keys = [('propertyIds',) + getPropertyUserIdKey(userId) for userId in propertyUserIds]
+        missing = [(key, userId) for key, userId in zip(keys, propertyUserIds) if self.metadataCache.Get(key, NOT_CACHED) is NOT_CACHED]
+        if missing:
+            for (key, _), propertyId in zip(missing, self.commands.GetPropertyIds([userId for _, userId in missing])):
+                self.metadataCache.Set(key, propertyId)
+            self._metadataCacheChanged = True
+        return [self.metadataCache.Get(key) for key in keys]
+
+    # Cached version of acc.GetDetailsOfProperties.
+    # Only the properties not found in the cache are requested (in one command).
+    def GetDetailsOfProperties(self, propertyIds: List) -> List:
+        keys = [('propertyDetails', getPropertyGuid(propertyId)) for propertyId in propertyIds]
+        missing = [(key, propertyId) for key, propertyId in zip(keys, propertyIds) if self.metadataCache.Get(key, NOT_CACHED) is NOT_CACHED]
+        if missing:
+            for (key, _), details in zip(missing, self.commands.GetDetailsOfProperties([propertyId for _, propertyId in missing])):
+                self.metadataCache.Set(key, details)
+        return [self.metadataCache.Get(key) for key in keys]
+
+    # Cached version of acu.FindClassificationSystem.
+    # Returns None if there is no such system (the utility raises StopIteration instead).
+    def FindClassificationSystem(self, systemName: str):
+        return self._cached(('classificationSystem', systemName), self._findClassificationSystem, systemName)
+
+    # This function calls acu.FindClassificationSystem, None if the system is not found.
+    def _findClassificationSystem(self, systemName: str):
+        try:
+            return self.utilities.FindClassificationSystem(systemName)
+        except StopIteration:
+            return None
+
+    # Indexed version of acu.FindClassificationItemInSystem: the tree of the system is not requested and walked
+    # on every call, the item is found in the classification index (see 'GetClassificationIndex').
+    # Returns the 'ClassificationItemDetails' of the item (it has the 'classificationItemId'), or None.
+    def FindClassificationItemInSystem(self, systemName: str, itemId: str):
+        index = self.GetClassificationIndex(systemName)
+        item = index.FindItem(itemId)
+        # The index loaded from the disk can be older than the project: if the id is not found or its item
+        # is not the same in the project (e.g. deleted and created again with a new guid), it is built again once.
+        if index.loaded and (item is None or not index.IsCurrent([getClassificationItemGuid(item)], self.commands)):
+            item = self.GetClassificationIndex(systemName, rebuild=True).FindItem(itemId)
+        return item
+
+    # ------------------------------------ Classification index ------------------------------------
+    # The classification tree of a system is requested only once per session and kept in a
+    # 'ClassificationIndex' (see 'classification_index.py'), the items and their details are found
+    # in it without any request. If 'METADATA_CACHE_FOLDER' is set, the index is saved there and the
+    # next run loads it instead of requesting the tree.
+
+    # Returns the classification index of the system (built at the first call).
+    # If there is no such system the index is empty (no item is found in it) and it is not saved.
+    # Arguments: the name of the classification system, rebuild: request the tree again.
+    def GetClassificationIndex(self, systemName: str, rebuild: bool = False) -> ClassificationIndex:
+        # More threads can ask for the same index (e.g. the concurrent queries of the room report).
+        with self._classificationIndexLock:
+            index = None if rebuild else self._classificationIndexes.get(systemName)
+            if index is None:
+                path = self._getClassificationIndexPath(systemName)
+                if path and not rebuild and os.path.exists(path):
+                    index = ClassificationIndex.Load(path, systemName, self.types)
+                if index is None:
+                    classificationSystemId = self.FindClassificationSystem(systemName)
+                    if classificationSystemId is None:
+                        index = ClassificationIndex(systemName, self.types)
+                        path = None
+                    else:
+                        index = ClassificationIndex.Build(self.commands, self.types, classificationSystemId, systemName)
+                    if path:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        index.Save(path)
+                self._classificationIndexes[systemName] = index
+        return index
+
+    # Returns the file of the classification index of the system on the disk (None if it is not saved).
+    def _getClassificationIndexPath(self, systemName: str) -> Optional[str]:
+        if not METADATA_CACHE_FOLDER:
+            return None
+        projectIdentity = self._getProjectIdentity()
+        if projectIdentity is None:
+            return None
+        return os.path.join(METADATA_CACHE_FOLDER, hashlib.sha1(f"{projectIdentity}\n{systemName}".encode('utf-8')).hexdigest() + '.classifications.json')
+
+    # Register a function which is called when the metadata is invalidated.
+    # The function gets the written (or invalidated) property ids, or None if everything was invalidated.
+    def AddInvalidationHook(self, hook: Callable[[Optional[List]], None]):
+        self._invalidationHooks.append(hook)
+
+    # Invalidate the metadata cache.
+    # Arguments: propertyIds (optional), if it is given only the details of these properties are dropped,
+    # else the whole cache (also the file on the disk, at the end of the script) is cleared.
+    def InvalidateMetadata(self, propertyIds: Optional[Iterable] = None):
+        if propertyIds is None:
+            self.metadataCache.Invalidate()
+            self._metadataCacheChanged = True
+        else:
+            propertyIds = list(propertyIds)
+            guids = set(getPropertyGuid(propertyId) for propertyId in propertyIds)
+            self.metadataCache.Invalidate(lambda key: key[0] == 'propertyDetails' and key[1] in guids)
+        self._callInvalidationHooks(propertyIds)
+
+    # Call the registered hooks with the property ids (None if everything was invalidated).
+    def _callInvalidationHooks(self, propertyIds: Optional[List]):
+        for hook in self._invalidationHooks:
+            hook(propertyIds)
+
+    # Set property values and notify the hooks about the written properties.
+    # Writing a value does not change the definition of the property, so the cached details are kept.
+    # Arguments and result are the same as the acc.SetPropertyValuesOfElements command.
+    def SetPropertyValuesOfElements(self, elementPropertyValues: List) -> List:
+        result = self.commands.SetPropertyValuesOfElements(elementPropertyValues)
+        self._callInvalidationHooks(list({getPropertyGuid(value.propertyId): value.propertyId for value in elementPropertyValues}.values()))
+        self._recordWrittenElements(elementPropertyValues)
+        return result
+
+    # ------------------------------------ Write journal ------------------------------------
+    # Every written (property guid, element guid) pair is appended to the 'WRITE_JOURNAL_FILE'
+    # (one pair per line, after the key of the project), so the other scripts can find the changed
+    # elements without reading the values of every element of the project.
+    # The lines of the projects without identity (see 'GetProjectKey') and the lines of the older
+    # journals (without project key) have the '-' key.
+
+    # Append the written pairs to the journal (if the journal is used).
+    def _recordWrittenElements(self, elementPropertyValues: List):
+        if not WRITE_JOURNAL_FILE:
+            return
+        projectKey = self.GetProjectKey() or '-'
+        with open(WRITE_JOURNAL_FILE, 'a', encoding='utf-8') as file:
+            file.writelines(f"{projectKey} {getPropertyGuid(value.propertyId)} {getElementGuid(value.elementId)}\n" for value in elementPropertyValues)
+
+    # Returns the (project key, property guid, element guid) tuples of the lines of the journal text.
+    @staticmethod
+    def _parseWriteJournalLines(text: str) -> List[tuple]:
+        return [('-',) * (3 - len(parts)) + tuple(parts) for parts in (line.split() for line in text.splitlines()) if parts]
+
+    # Returns the content of the journal and the position (byte offset) after its last complete line
+    # (a line being appended by another script at the same time is not read).
+    def _readWriteJournal(self) -> Tuple[bytes, int]:
+        with open(WRITE_JOURNAL_FILE, 'rb') as file:
+            content = file.read()
+        return content, content.rfind(b'\n') + 1
+
+    # Returns the set of the element guids of the open project written with the property since the journal was cleared,
+    # and the position of the journal they were read to (to be given to 'ClearWriteJournal').
+    def ReadWriteJournal(self, propertyId) -> Tuple[set, int]:
+        if not WRITE_JOURNAL_FILE or not os.path.exists(WRITE_JOURNAL_FILE):
+            return set(), 0
+        projectKey, propertyGuid = self.GetProjectKey() or '-', getPropertyGuid(propertyId)
+        content, position = self._readWriteJournal()
+        return set(elementGuid for lineProject, lineProperty, elementGuid in self._parseWriteJournalLines(content[:position].decode('utf-8'))
+                   if lineProject == projectKey and lineProperty == propertyGuid), position
+
+    # Remove the lines of the open project and the property read by 'ReadWriteJournal' from the journal
+    # (after the changes were processed). The lines of the other projects and the lines appended after the
+    # position (written by other scripts since the journal was read) are kept.
+    # The journal is written into a temporary file in the same folder and then renamed to the journal file,
+    # so an interrupted clear does not leave a truncated journal.
+    def ClearWriteJournal(self, propertyId, position: int):
+        if not WRITE_JOURNAL_FILE or not os.path.exists(WRITE_JOURNAL_FILE) or position <= 0:
+            return
+        projectKey, propertyGuid = self.GetProjectKey() or '-', getPropertyGuid(propertyId)
+        content, _ = self._readWriteJournal()
+        lines = [line for line in self._parseWriteJournalLines(content[:position].decode('utf-8')) if line[:2] != (projectKey, propertyGuid)]
+        folder = os.path.dirname(os.path.abspath(WRITE_JOURNAL_FILE))
+        with tempfile.NamedTemporaryFile(dir=folder, suffix='.tmp', delete=False) as file:
+            try:
+                file.write(''.join(' '.join(line) + '\n' for line in lines).encode('utf-8'))
+                file.write(content[position:])
+            except BaseException:
+                file.close()
+                os.remove(file.name)
+                raise
+        os.replace(file.name, WRITE_JOURNAL_FILE)
+
+    # This function returns a string identifying the open project, or None if it is not available.
+    # The base JSON API has no command for the project info, the 'GetProjectInfo' command of the Tapir add-on is used
+    # (https://github.com/ENZYME-APD/tapir-archicad-automation), without the add-on the cache is kept in the memory only.
+    # It is requested only once per session.
+    def _getProjectIdentity(self) -> Optional[str]:
+        if self._projectIdentity is NOT_CACHED:
+            try:
+                projectInfo = self.commands.ExecuteAddOnCommand(self.types.AddOnCommandId('TapirCommand', 'GetProjectInfo')) or {}
+            except Exception:
+                projectInfo = {'isUntitled': True}
+            if projectInfo.get('isUntitled', False):
+                self._projectIdentity = None
+            else:
+                self._projectIdentity = projectInfo.get('projectLocation') or projectInfo.get('projectName')
+        return self._projectIdentity
+
+    # Returns the key of the open project (the hash of its identity), the files of the project are named by it
+    # (e.g. the metadata cache, the index of the incremental element ID conflict check), or None if the project has no identity.
+    def GetProjectKey(self) -> Optional[str]:
+        projectIdentity = self._getProjectIdentity()
+        if projectIdentity is None:
+            return None
+        return hashlib.sha1(projectIdentity.encode('utf-8')).hexdigest()
+
+    # Load the property ids of the project from the disk into the cache.
+    # Only the property ids are saved since they are simple guids, the other metadata is kept in the memory.
+    def _loadMetadataCache(self, folder: str):
+        projectKey = self.GetProjectKey()
+        if projectKey is None:
+            return
+        # One file per project, the name of the file is the hash of the project identity.
+        self._metadataCachePath = os.path.join(folder, projectKey + '.json')
+        # The file is written once, when the script ends.
+        atexit.register(self._saveMetadataCache)
+        if not os.path.exists(self._metadataCachePath):
+            return
+        try:
+            with open(self._metadataCachePath, encoding='utf-8') as file:
+                items = [(tuple(k if not isinstance(k, list) else tuple(k) for k in key), typeName, uuid.UUID(guid))
+                         for key, (typeName, guid) in json.load(file)]
+        # The file can not be read (e.g. it was truncated by a killed script): the cache is empty
+        # and the file is written again at the end of the script.
+        except (OSError, ValueError, TypeError):
+            self._metadataCacheChanged = True
+            return
+        for key, typeName, guid in items:
+            propertyId = self.types.PropertyId(guid)
+            # The cached object must have the same type as the one Archicad gave back.
+            if typeName == 'PropertyIdArrayItem':
+                propertyId = self.types.PropertyIdArrayItem(propertyId)
+            self.metadataCache.Set(key, propertyId)
+
+    # Save the property ids of the cache to the disk (if the disk cache is used and the cache was changed).
+    # The properties which were not found are not saved, they can be created before the next run.
+    def _saveMetadataCache(self):
+        if self._metadataCachePath is None or not self._metadataCacheChanged:
+            return
+        self._metadataCacheChanged = False
+        items = [(key, (type(value).__name__, getPropertyGuid(value))) for key, value in self.metadataCache.Items()
+                 if key[0] in ('builtInPropertyId', 'userDefinedPropertyId', 'propertyIds') and value is not None
+                 and hasattr(getattr(value, 'propertyId', value), 'guid')]
+        os.makedirs(os.path.dirname(self._metadataCachePath), exist_ok=True)
+        with open(self._metadataCachePath, 'w', encoding='utf-8') as file:
+            json.dump(items, file)
+
+
+# This function establishes the connection with the Archicad software, Archicad must be open
+# and the pln file must be open too.
+# Arguments: port (optional) the port of the Archicad instance, if it is not given the 'ARCHICAD_PORT'
+# environment variable is used (set by 'batch_runner.py'), else the first running Archicad
+# (same as ACConnection.connect()).
+# If a snapshot is set ('SNAPSHOT') the session is opened on the snapshot, no Archicad is needed.
+# Returns the 'ArchicadSession'.
+def OpenSession(port: Optional[int] = None) -> ArchicadSession:
+    if SNAPSHOT:
+        # Imported here, the snapshot needs numpy and the scripts connecting to Archicad do not.
+        from project_snapshot import SnapshotConnection
+        return ArchicadSession(SnapshotConnection(SNAPSHOT))
+    port = port or (int(os.environ['ARCHICAD_PORT']) if os.environ.get('ARCHICAD_PORT') else None)
+    conn = ACConnection.connect(port) if port else ACConnection.connect()
+    # assert that the connection is alive
+    assert conn
+    return ArchicadSession(conn)
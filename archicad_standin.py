@@ -0,0 +1,103 @@
+# Import argparse for the command line options, json for the requests and responses, time for the latency.
+import argparse, json, time
+# Import the HTTP server of the standard library, every request is answered on its own thread.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# Import Thread to run the server in the background.
+from threading import Thread
+# Import typing not essential for the code.
+from typing import Any, Dict, Optional
+
+# This module is a local stand-in of a running Archicad instance for testing the batch runner (see 'batch_runner.py').
+#
+# It answers the Archicad JSON API requests on a port like Archicad does (POST of {"command": ..., "parameters": ...}):
+# 'API.IsAlive', 'API.GetProductInfo' and the project info of the Tapir add-on
+# ('API.ExecuteAddOnCommand' with 'TapirCommand' / 'GetProjectInfo') are built in,
+# any other command is answered from the responses given to the server (command name:result),
+# the unknown commands are answered with an error the same way as Archicad does.
+#
+# Usage: python archicad_standin.py --port 19723 --project "Office A" [--responses responses.json] [--latency 0.01]
+
+################################ CONFIGURATION #################################
+# The Archicad version, build number and language code given back by 'API.GetProductInfo'
+# (the archicad package selects its commands and types by them).
+PRODUCT_INFO = {"version": 27, "buildNumber": 3001, "languageCode": "INT"}
+################################################################################
+
+
+# This function creates the request handler class of a stand-in server.
+# Arguments: the name of the project, dictionary of command name:result, latency (seconds) of every answer.
+def createRequestHandler(projectName: str, responses: Dict[str, Any], latency: float):
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if latency:
+                time.sleep(latency)
+            body = json.dumps(answer(request.get('command'), request.get('parameters') or {})).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # The requests are not logged to the console.
+        def log_message(self, format, *args):
+            pass
+
+    # This function returns the answer of a command: {"succeeded": True, "result": ...} or {"succeeded": False, "error": ...}.
+    def answer(command: Optional[str], parameters: Dict) -> Dict:
+        if command == 'API.IsAlive':
+            return {"succeeded": True, "result": {"isAlive": True}}
+        if command == 'API.GetProductInfo':
+            return {"succeeded": True, "result": PRODUCT_INFO}
+        if command == 'API.ExecuteAddOnCommand' and parameters.get('addOnCommandId', {}).get('commandName') == 'GetProjectInfo':
+            return {"succeeded": True, "result": {"addOnCommandResponse": {
+                "isUntitled": False, "isTeamwork": False, "projectName": projectName,
+                "projectLocation": f"{projectName}.pln", "projectPath": f"{projectName}.pln"}}}
+        if command in responses:
+            return {"succeeded": True, "result": responses[command]}
+        return {"succeeded": False, "error": {"code": 4001, "message": f"Unsupported command of the stand-in server: {command}"}}
+
+    return RequestHandler
+
+
+# This class is a stand-in server running in the background on a port.
+class StandInServer:
+    def __init__(self, port: int, projectName: str, responses: Optional[Dict[str, Any]] = None, latency: float = 0.0):
+        self.port = port
+        self.projectName = projectName
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), createRequestHandler(projectName, responses or {}, latency))
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    def Start(self) -> 'StandInServer':
+        self._thread.start()
+        return self
+
+    def Stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'StandInServer':
+        return self.Start()
+
+    def __exit__(self, *exception):
+        self.Stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in of a running Archicad instance (JSON API).")
+    parser.add_argument("--port", type=int, default=19723, help="the Archicad ports are 19723-19743")
+    parser.add_argument("--project", default="Stand-in project")
+    parser.add_argument("--responses", help="json file with command name:result pairs")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    arguments = parser.parse_args()
+
+    responses = {}
+    if arguments.responses:
+        with open(arguments.responses, encoding="utf-8") as file:
+            responses = json.load(file)
+    server = StandInServer(arguments.port, arguments.project, responses, arguments.latency)
+    print(f"Stand-in Archicad '{arguments.project}' on port {arguments.port} (Ctrl+C to stop)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server._server.server_close()
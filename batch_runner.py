@@ -0,0 +1,204 @@
+# Import argparse for the command line options, json for the jobs file, the requests and the results,
+# os, subprocess and sys to run the scripts, time for the timings.
+import argparse, json, os, subprocess, sys, time
+# Import the thread pool, one thread is running the jobs of one Archicad instance.
+from concurrent.futures import ThreadPoolExecutor
+# Import urllib to send the JSON API requests without the archicad package.
+from urllib.request import Request, urlopen
+# Import typing not essential for the code.
+from typing import Dict, List, Optional
+
+# This script runs the scripts of the repository (e.g. zone numbering, room report, element ID conflict check)
+# on more projects, each project opened in its own Archicad instance, instead of running them one by one by hand.
+#
+# Every running Archicad listens on its own port (19723-19743). The projects are given with the port
+# of their instance, or they are found by their name if the Tapir add-on is installed (its 'GetProjectInfo' command).
+# The instances are working in parallel (one worker thread per instance), the scripts of a project run
+# one after the other (a project is not modified by two scripts at the same time).
+# Every script is started as a separate process with the 'ARCHICAD_PORT' environment variable,
+# so the 'OpenSession' of the script connects to the right instance (see 'archicad_session.py').
+# The output of every script is saved into a log file, the results and timings are printed as a summary
+# and they can be saved into a JSON file.
+#
+# The JSON API can not open or save projects, so the instances must be started with the projects before the run
+# (and the projects saved after it). For testing, the instances can be stand-in servers (see 'archicad_standin.py').
+#
+# The jobs file (JSON):
+# {
+#     "scripts": ["zone_numbering_explained.py", "elementID_conflict_explained.py"],
+#     "projects": [
+#         {"name": "Office A", "port": 19723},
+#         {"name": "Office B", "scripts": ["room_report_explained.py"]}
+#     ]
+# }
+# The "scripts" of a project replace the common ones. Without "projects" every running instance is a project.
+#
+# Usage: python batch_runner.py jobs.json [--workers 4] [--timeout 3600] [--json results.json]
+
+################################ CONFIGURATION #################################
+scriptFolder = os.path.dirname(os.path.realpath(__file__))
+# The folder of the log files (one subfolder per project, one log file per script).
+logFolder = os.path.join(scriptFolder, "batch_logs")
+# The ports of the Archicad instances (the same range as the archicad package is searching).
+ARCHICAD_PORTS = range(19723, 19744)
+# The time limit (seconds) of answering a request when the instances are searched.
+CONNECTION_TIMEOUT = 2
+# The time limit (seconds) of a script, a script running longer is stopped.
+SCRIPT_TIMEOUT = 3600
+################################################################################
+
+
+# This function sends a JSON API command to the instance on the port.
+# Returns the 'result' of the answer, or None if there is no instance or the command failed.
+def postCommand(port: int, command: str, parameters: Optional[Dict] = None) -> Optional[Dict]:
+    request = Request(f"http://127.0.0.1:{port}", headers={'Content-Type': 'application/json'})
+    body = {"command": command}
+    if parameters is not None:
+        body["parameters"] = parameters
+    try:
+        with urlopen(request, json.dumps(body).encode('utf-8'), timeout=CONNECTION_TIMEOUT) as response:
+            answer = json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+    return answer.get("result") if answer.get("succeeded") else None
+
+
+# This function returns the name of the project open in the instance with the Tapir add-on, or None
+# (the base JSON API has no command for it).
+def getProjectName(port: int) -> Optional[str]:
+    result = postCommand(port, "API.ExecuteAddOnCommand", {
+        "addOnCommandId": {"commandNamespace": "TapirCommand", "commandName": "GetProjectInfo"},
+        "addOnCommandParameters": {}})
+    projectInfo = (result or {}).get("addOnCommandResponse") or {}
+    if projectInfo.get("isUntitled"):
+        return None
+    return projectInfo.get("projectName")
+
+
+# This function finds the running instances.
+# Returns a dictionary with port:project name (None if it is not known) key:value pairs.
+def FindInstances(ports=ARCHICAD_PORTS) -> Dict[int, Optional[str]]:
+    # The ports are checked side by side, the empty ports are waiting for the time limit.
+    with ThreadPoolExecutor(max_workers=len(ports) or 1) as executor:
+        alive = list(executor.map(lambda port: (postCommand(port, "API.IsAlive") or {}).get("isAlive", False), ports))
+    return {port: getProjectName(port) for port, isAlive in zip(ports, alive) if isAlive}
+
+
+# This function returns the comparable form of a project name: 'Office A.pln' and 'office a' are the same project.
+def getProjectKey(name: str) -> str:
+    name = os.path.basename(name).strip().lower()
+    return name[:-4] if name.endswith(".pln") else name
+
+
+# This function creates the jobs of the projects: list of {'project', 'port', 'scripts'} dictionaries.
+# The projects without a port get the port of the instance with the same project name.
+# The projects which are not found get None as port (they are reported, not run).
+# Arguments: the jobs file content, dictionary returned by 'FindInstances'.
+def CreateJobs(jobsConfig: Dict, instances: Dict[int, Optional[str]]) -> List[Dict]:
+    scripts = jobsConfig.get("scripts", [])
+    projects = jobsConfig.get("projects")
+    if projects is None:
+        projects = [{"name": name or f"port {port}", "port": port} for port, name in instances.items()]
+    portsOfProjects = {getProjectKey(name): port for port, name in instances.items() if name}
+    jobs = []
+    for project in projects:
+        port = project.get("port") or portsOfProjects.get(getProjectKey(project["name"]))
+        jobs.append({"project": project["name"], "port": port if port in instances else None,
+                     "scripts": project.get("scripts", scripts)})
+    return jobs
+
+
+# This function runs a script on the instance of the port as a separate process.
+# Returns the result: {'project', 'port', 'script', 'status', 'returnCode', 'seconds', 'log', 'lastLine'}.
+def RunScript(project: str, port: int, script: str, timeout: float = SCRIPT_TIMEOUT) -> Dict:
+    scriptPath = script if os.path.isabs(script) else os.path.join(scriptFolder, script)
+    logPath = os.path.join(logFolder, "".join(c if c.isalnum() or c in " -_." else "_" for c in project),
+                           os.path.splitext(os.path.basename(script))[0] + ".log")
+    os.makedirs(os.path.dirname(logPath), exist_ok=True)
+    environment = dict(os.environ, ARCHICAD_PORT=str(port))
+    start = time.perf_counter()
+    with open(logPath, "w", encoding="utf-8") as logFile:
+        try:
+            completed = subprocess.run([sys.executable, scriptPath], cwd=os.path.dirname(scriptPath), env=environment,
+                                       stdout=logFile, stderr=subprocess.STDOUT, timeout=timeout)
+            returnCode = completed.returncode
+            status = "ok" if returnCode == 0 else "failed"
+        except subprocess.TimeoutExpired:
+            returnCode = None
+            status = "timeout"
+    seconds = time.perf_counter() - start
+    # The last line of the log is the message of the error (or the last message of the script).
+    with open(logPath, encoding="utf-8", errors="replace") as logFile:
+        lines = [line.strip() for line in logFile if line.strip()]
+    return {"project": project, "port": port, "script": script, "status": status, "returnCode": returnCode,
+            "seconds": seconds, "log": logPath, "lastLine": lines[-1] if lines else ""}
+
+
+# This function runs the scripts of a job one after the other.
+# A failed script does not stop the next ones, the scripts are independent.
+def runJob(job: Dict, timeout: float) -> List[Dict]:
+    if job["port"] is None:
+        return [{"project": job["project"], "port": None, "script": script, "status": "not found", "returnCode": None,
+                 "seconds": 0.0, "log": None, "lastLine": "the project is not open in any running Archicad"}
+                for script in job["scripts"]]
+    return [RunScript(job["project"], job["port"], script, timeout) for script in job["scripts"]]
+
+
+# This function runs the jobs, the jobs of the different instances in parallel.
+# Arguments: the jobs (see 'CreateJobs'), the maximum number of instances working at the same time
+# (None means all of them), time limit of a script.
+# Returns the list of the results in the order of the jobs.
+def RunJobs(jobs: List[Dict], workers: Optional[int] = None, timeout: float = SCRIPT_TIMEOUT) -> List[Dict]:
+    # The jobs of the same instance are run by the same worker one after the other.
+    jobsOfPorts = {}
+    for index, job in enumerate(jobs):
+        jobsOfPorts.setdefault(job["port"], []).append(index)
+    results = [None] * len(jobs)
+
+    def runJobsOfPort(indices):
+        for index in indices:
+            results[index] = runJob(jobs[index], timeout)
+            for result in results[index]:
+                print(f"{result['project']} / {result['script']}: {result['status']} ({result['seconds']:.1f} s)", flush=True)
+
+    with ThreadPoolExecutor(max_workers=workers or len(jobsOfPorts) or 1) as executor:
+        list(executor.map(runJobsOfPort, jobsOfPorts.values()))
+    return [result for jobResults in results for result in jobResults]
+
+
+# This function prints the results and the summary of the projects.
+def PrintSummary(results: List[Dict]):
+    print(f"{'project':<30} {'script':<40} {'port':>6} {'status':<10} {'seconds':>9}")
+    for result in results:
+        print(f"{result['project'][:30]:<30} {result['script'][:40]:<40} {str(result['port'] or '-'):>6} "
+              f"{result['status']:<10} {result['seconds']:>9.1f}")
+        if result["status"] != "ok":
+            print(f"    {result['lastLine']}")
+    projects = {}
+    for result in results:
+        projects.setdefault(result["project"], []).append(result)
+    print()
+    for project, projectResults in projects.items():
+        okCount = sum(1 for result in projectResults if result["status"] == "ok")
+        print(f"{project}: {okCount}/{len(projectResults)} ok, {sum(result['seconds'] for result in projectResults):.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scripts on more projects opened in more Archicad instances.")
+    parser.add_argument("jobs", help="the jobs file (json)")
+    parser.add_argument("--workers", type=int, help="the maximum number of instances working at the same time")
+    parser.add_argument("--timeout", type=float, default=SCRIPT_TIMEOUT, help="the time limit of a script (seconds)")
+    parser.add_argument("--json", help="save the results into this json file")
+    arguments = parser.parse_args()
+
+    with open(arguments.jobs, encoding="utf-8") as file:
+        jobsConfig = json.load(file)
+    instances = FindInstances()
+    print("Running Archicad instances: " + (", ".join(f"{port} ({name or '?'})" for port, name in instances.items()) or "none"))
+    start = time.perf_counter()
+    results = RunJobs(CreateJobs(jobsConfig, instances), arguments.workers, arguments.timeout)
+    PrintSummary(results)
+    print(f"Total: {time.perf_counter() - start:.1f} s")
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
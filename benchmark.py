@@ -0,0 +1,274 @@
+# Import argparse for the command line options, json for the machine-readable results,
+# random for the generators, time and tracemalloc to measure the wall-time and the peak memory.
+import argparse, io, json, random, time, tracemalloc
+# Import typing not essential for the code.
+from typing import Callable, Dict, List, Optional
+
+# Import the core logic of the scripts (these modules do not need the Archicad connection).
+from grouping import getRowName, numberRowSections, numberStoriesAndRows
+from room_relations import getAdjacentRoomsFromBoundaries, getGuid, getUniqueElements, splitRoomElementsByType
+from navigator_tree import findTopmostUnusedItems
+from conflict_index import ElementIdIndex
+import synthetic_project as synthetic
+
+# This script benchmarks the core logic of the scripts with synthetic project data (see 'synthetic_project.py'),
+# so the scaling of the algorithms can be measured and the regressions can be found without a running Archicad.
+#
+# Every phase is run twice at every scale: once for the wall-time and once with tracemalloc for the peak memory
+# (tracemalloc slows down the code, so the time is not measured in that run).
+# The data is generated before the phase, its time and memory are not counted.
+#
+# Usage: python benchmark.py [--scales 1000 10000 100000] [--phases zones rooms ...] [--json results.json]
+# The output can be redirected into 'bench_output.txt' (it is ignored by git).
+
+################################ CONFIGURATION #################################
+# The default scales (number of zones, parking spaces, chairs, navigator items, rooms, elements).
+DEFAULT_SCALES = [1000, 10000, 100000]
+# The Excel phases create real workbooks, they are limited to this number of rows
+# and the report phase to this number of room sheets (every sheet has ~400 cells).
+EXCEL_SCALE_LIMIT = 10000
+REPORT_SCALE_LIMIT = 1000
+# The same seed generates the same project every time.
+SEED = 2024
+# The tolerances of the grouping (the same as in the numbering scripts).
+STORY_GROUPING_LIMIT = 1
+ROW_GROUPING_LIMIT = 0.25
+CHAIR_ROW_GROUPING_LIMIT = 0.25
+AISLE_GAP_LIMIT = 0.5
+# The chunk size of the streaming Excel export and import (the same as in the Excel scripts).
+EXCEL_CHUNK_SIZE = 2000
+################################################################################
+
+
+# The phases: name:(function creating the data, function running the logic on the data, scale limit).
+# The first function gets the scale and a random generator, the second one gets its result.
+PHASES: Dict[str, tuple] = {}
+
+
+# This function registers a phase (used as a decorator on the function running the logic).
+# The larger scales are run with the limit (None means no limit).
+def phase(name: str, prepare: Callable, limit: Optional[int] = None):
+    def register(run: Callable):
+        PHASES[name] = (prepare, run, limit)
+        return run
+    return register
+
+
+# Zone numbering: the full numbering of the zone numbering script (without a numbering state),
+# converting the bounding boxes, grouping into stories and rows and numbering the zones (see 'numbering_state.py').
+@phase("zones", lambda scale, rng: prepareZones(scale, rng))
+def runZoneNumbering(data):
+    from bounding_box_arrays import BoundingBoxArray
+    from numbering_state import UpdateNumbering
+    guids, boundingBoxes = data
+    boxes = BoundingBoxArray.FromBoundingBoxes(boundingBoxes)
+    return UpdateNumbering(guids, boxes, None, STORY_GROUPING_LIMIT, ROW_GROUPING_LIMIT,
+                           lambda storyIndex, elemIndex: f"{storyIndex:1d}{elemIndex:02d}",
+                           settings={'storyLimit': STORY_GROUPING_LIMIT, 'rowLimit': ROW_GROUPING_LIMIT}).numbers
+
+
+# Parking space numbering and zone overall dimensions with the numpy bounding box array: converting the bounding boxes,
+# grouping into stories and rows, formatting the overall dimensions.
+@phase("boxes", lambda scale, rng: synthetic.generateBoundingBoxes(*synthetic.generateGridPositions(scale, rng), rng))
+def runBoundingBoxArrays(boundingBoxes):
+    from bounding_box_arrays import BoundingBoxArray, FormatLargerFirst
+    boxes = BoundingBoxArray.FromBoundingBoxes(boundingBoxes)
+    stories = boxes.GroupIntoStoriesAndRows(STORY_GROUPING_LIMIT, ROW_GROUPING_LIMIT)
+    widths, heights, _ = boxes.Extents()
+    return list(numberStoriesAndRows(stories)), FormatLargerFirst(widths, heights)
+
+
+# Chair numbering: grouping into rows and cutting the rows into sections at the aisles,
+# then the names of the chairs (the same as the chair numbering script).
+@phase("chairs", lambda scale, rng: synthetic.generateChairBoundingBoxes(scale, rng))
+def runChairNumbering(boundingBoxes):
+    from bounding_box_arrays import BoundingBoxArray
+    boxes = BoundingBoxArray.FromBoundingBoxes(boundingBoxes)
+    rows = boxes.SplitAtGaps(boxes.ClusterGroups('zMin', CHAIR_ROW_GROUPING_LIMIT), 'xMin', 'xMax', AISLE_GAP_LIMIT)
+    return [f"{getRowName(rowIndex)}.{indexInRow}/{sectionName}"
+            for rowIndex, sectionName, section in numberRowSections(rows)
+            for indexInRow, _ in enumerate(section, start=1)]
+
+
+# Unused items in the view map: the topmost unused items of the tree.
+@phase("viewmap", lambda scale, rng: prepareViewMap(scale, rng))
+def runUnusedViewSearch(data):
+    root, usedGuids = data
+    return findTopmostUnusedItems(root, isUsed=lambda item: item.navigatorItemId.guid in usedGuids,
+                                  isExcluded=lambda item: False)
+
+
+# Room report: splitting the related elements by type and finding the adjacent rooms.
+@phase("rooms", lambda scale, rng: synthetic.generateRooms(scale, rng))
+def runRoomRelations(data):
+    rooms, relatedElements, elementTypes = data
+    uniqueElements = getUniqueElements(relatedElements.values())
+    groups = splitRoomElementsByType(relatedElements, elementTypes,
+                                     {"walls": ["Wall"], "objects": ["Object"], "openings": ["Door", "Window"]})
+    boundaryObjectsIds = {room: list(map(getGuid, groups["walls"][room])) for room in rooms}
+    return len(uniqueElements), getAdjacentRoomsFromBoundaries(rooms, boundaryObjectsIds)
+
+
+# Element ID conflict: building the index and listing the conflicts.
+@phase("conflicts", lambda scale, rng: synthetic.generateElementIds(scale, 0.01, rng))
+def runConflictGrouping(elementIds):
+    index = ElementIdIndex("General_ElementID")
+    for guid, value in elementIds.items():
+        index.Update(guid, value)
+    return index.Conflicts()
+
+
+# Room report: rendering the room sheets from the compiled template.
+@phase("report", lambda scale, rng: prepareReport(scale, rng), REPORT_SCALE_LIMIT)
+def runReportFill(data):
+    from report_template import CompiledTemplate
+    workbook, sheets = data
+    base = workbook.active
+    template = CompiledTemplate(base)
+    for title, values in sheets:
+        template.Render(workbook, title, values)
+    workbook.remove(base)
+    workbook.save(io.BytesIO())
+
+
+# Excel export and import (the default mode of the scripts): filling the worksheet, saving and loading the workbook,
+# reading the table back and creating the new property values from the current ones (see 'excel_tables.py').
+@phase("excel", lambda scale, rng: prepareExcel(scale, rng), EXCEL_SCALE_LIMIT)
+def runExcelRoundTrip(data):
+    from openpyxl import Workbook, load_workbook
+    from excel_tables import CreateNewPropertyValues, FillExcelWorksheetWithPropertyValuesOfElements, ReadWorksheetTable
+    elements, propertyIds, propertyDefinitions, propertyValuesDictionary, getPropertyValuesOfElements = data
+    # Export.
+    workbook = Workbook()
+    FillExcelWorksheetWithPropertyValuesOfElements(workbook.active, propertyIds, propertyDefinitions, propertyValuesDictionary)
+    file = io.BytesIO()
+    workbook.save(file)
+    # Import.
+    file.seek(0)
+    elementIds, importedPropertyIds, newValues = ReadWorksheetTable(load_workbook(file).active, synthetic.syntheticTypes)
+    elemPropertyValues, _ = CreateNewPropertyValues(synthetic.syntheticTypes, elementIds, importedPropertyIds, newValues,
+                                                    getPropertyValuesOfElements(elementIds, importedPropertyIds))
+    return len(elemPropertyValues)
+
+
+# Streaming Excel export and import: the property values are requested in chunks into a write-only workbook,
+# the workbook is read back in chunks with a read-only iterator (see 'excel_tables.py').
+@phase("excelstream", lambda scale, rng: prepareExcel(scale, rng), EXCEL_SCALE_LIMIT)
+def runExcelStreamingRoundTrip(data):
+    from openpyxl import Workbook, load_workbook
+    from excel_tables import CreateNewPropertyValues, ReadWorksheetTableInChunks, StreamExcelWorksheetsWithPropertyValuesOfElements
+    elements, propertyIds, propertyDefinitions, propertyValuesDictionary, getPropertyValuesOfElements = data
+    # Export.
+    workbook = Workbook(write_only=True)
+    StreamExcelWorksheetsWithPropertyValuesOfElements([workbook.create_sheet()], propertyIds, propertyDefinitions, [elements],
+                                                      lambda chunk, ids: {element: propertyValuesDictionary[element] for element in chunk},
+                                                      EXCEL_CHUNK_SIZE)
+    file = io.BytesIO()
+    workbook.save(file)
+    # Import.
+    file.seek(0)
+    workbook = load_workbook(file, read_only=True)
+    importedPropertyIds, chunks = ReadWorksheetTableInChunks(workbook.worksheets[0], synthetic.syntheticTypes, EXCEL_CHUNK_SIZE)
+    count = 0
+    for elementIds, newValues in chunks:
+        elemPropertyValues, _ = CreateNewPropertyValues(synthetic.syntheticTypes, elementIds, importedPropertyIds, newValues,
+                                                        getPropertyValuesOfElements(elementIds, importedPropertyIds))
+        count += len(elemPropertyValues)
+    workbook.close()
+    return count
+
+
+# This function creates the guids and the bounding boxes of the zones of the 'zones' phase.
+def prepareZones(zoneCount: int, rng: random.Random):
+    boundingBoxes = synthetic.generateBoundingBoxes(*synthetic.generateGridPositions(zoneCount, rng), rng)
+    return [str(synthetic.makeElement(rng).elementId.guid) for _ in boundingBoxes], boundingBoxes
+
+
+# This function creates the property values of the elements and the current values of the 'excel' phases
+# (10 properties, 1% of the values are changed, so the import has values to write).
+def prepareExcel(elementCount: int, rng: random.Random):
+    elements, propertyIds, propertyDefinitions, propertyValuesDictionary = synthetic.generatePropertyValues(elementCount, 10, rng)
+    return elements, propertyIds, propertyDefinitions, propertyValuesDictionary, \
+        synthetic.makeGetPropertyValuesOfElements(propertyValuesDictionary, 0.01, rng)
+
+
+# This function creates the navigator item tree and the used guids of the 'viewmap' phase.
+def prepareViewMap(itemCount: int, rng: random.Random):
+    root, items = synthetic.generateNavigatorTree(itemCount, rng)
+    return root, synthetic.generateUsedItems(items, 0.02, rng)
+
+
+# This function creates the template workbook and the values of the room sheets of the 'report' phase.
+def prepareReport(roomCount: int, rng: random.Random):
+    from openpyxl import Workbook
+    from openpyxl.styles import Border, Font, Side
+    from report_template import collectRoomValues
+    workbook = Workbook()
+    template = workbook.active
+    # A template like the 'RDS template.xlsx': labels and bordered cells.
+    for row in range(1, 58):
+        for column in range(1, 8):
+            cell = template.cell(row=row, column=column, value=f"Label {row}" if column == 1 else None)
+            cell.border = Border(bottom=Side(style="thin"))
+            cell.font = Font(bold=row < 4)
+    rooms = list(range(roomCount))
+    cellValuesForRoom = {"C2": {room: f"Room {room}" for room in rooms}, "G2": {room: f"{room:04d}" for room in rooms}}
+    cellValueRangeForRoom = {tuple(f"B{row}" for row in range(20, 57)):
+                             {room: [f"Object {rng.randrange(50)}" for _ in range(rng.randint(0, 8))] for room in rooms}}
+    roomValues = collectRoomValues(cellValuesForRoom, cellValueRangeForRoom, rooms)
+    return workbook, [(f"{room:04d} Room", roomValues[room]) for room in rooms]
+
+
+# This function returns the scales of a phase: the scales above the limit of the phase are run
+# with the limit (only once).
+def getPhaseScales(name: str, scales: List[int]) -> List[int]:
+    limit = PHASES[name][2]
+    return sorted(set(min(scale, limit) if limit is not None else scale for scale in scales))
+
+
+# This function runs a phase and measures it.
+# Returns a dictionary with the wall-time (seconds) and the peak memory (bytes).
+def measurePhase(name: str, scale: int, measureMemory: bool) -> Dict:
+    prepare, run, _ = PHASES[name]
+    # Wall-time.
+    data = prepare(scale, random.Random(SEED))
+    start = time.perf_counter()
+    run(data)
+    seconds = time.perf_counter() - start
+    result = {"phase": name, "scale": scale, "seconds": seconds, "peakBytes": None}
+    # Peak memory (the data is generated again, the phases may change it).
+    if measureMemory:
+        data = prepare(scale, random.Random(SEED))
+        tracemalloc.start()
+        run(data)
+        result["peakBytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+# This function prints the results as a table.
+def printResults(results: List[Dict]):
+    print(f"{'phase':<12} {'scale':>8} {'seconds':>10} {'peak MB':>10}")
+    for result in results:
+        peak = f"{result['peakBytes'] / 1024 / 1024:10.2f}" if result["peakBytes"] is not None else f"{'-':>10}"
+        print(f"{result['phase']:<12} {result['scale']:>8} {result['seconds']:>10.4f} {peak}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the core logic of the scripts with synthetic project data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--phases", nargs="+", choices=list(PHASES), default=list(PHASES))
+    parser.add_argument("--no-memory", action="store_true", help="do not measure the peak memory (faster)")
+    parser.add_argument("--json", help="save the results into this json file")
+    arguments = parser.parse_args()
+
+    results = []
+    for name in arguments.phases:
+        for scale in getPhaseScales(name, arguments.scales):
+            results.append(measurePhase(name, scale, not arguments.no_memory))
+            # Print the progress, the large scales take a while.
+            print(f"{name} {scale}: {results[-1]['seconds']:.4f} s", flush=True)
+    printResults(results)
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
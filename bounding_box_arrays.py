@@ -0,0 +1,165 @@
+# Import numpy for the vectorized bounding box calculations.
+# https://numpy.org/doc/stable/
+import numpy as np
+# Import typing not essential for the code.
+from typing import List, Sequence, Tuple
+
+# This module keeps the bounding boxes of the elements in one numpy array instead of a list of objects.
+#
+# The results of the 'Get2DBoundingBoxes' and 'Get3DBoundingBoxes' commands are lists of wrapper objects,
+# every use of them goes through attribute chains (e.g. 'bb.boundingBox3D.zMin') in Python loops.
+# Here they are converted once into a float array with one row per element and the
+# xMin, yMin, zMin, xMax, yMax, zMax columns, and the calculations (extents, formatting,
+# grouping into stories and rows) are done on the whole columns at once.
+# The 2D bounding boxes have no z coordinates, their zMin and zMax are NaN.
+# An element without bounding box (the command returned an 'error' for it) has a NaN row.
+
+# The order of the columns.
+COLUMNS = ('xMin', 'yMin', 'zMin', 'xMax', 'yMax', 'zMax')
+
+
+# This function returns the cluster id of every value: the values are sorted and a new cluster starts
+# where the gap between two neighbouring values is bigger than the limit
+# (the same rule as the 'sweepClusters' function of 'grouping.py').
+# The cluster ids are counted from 0 in the order of the values.
+# Arguments: the values (1D array), tolerance limit.
+def clusterIds(values: np.ndarray, limit: float) -> np.ndarray:
+    order = np.argsort(values, kind='stable')
+    sortedValues = values[order]
+    ids = np.empty(len(values), dtype=np.int64)
+    # The gap to the previous value, a new cluster starts after a bigger gap.
+    ids[order] = np.concatenate(([0], np.cumsum(np.diff(sortedValues) > limit))) if len(values) else []
+    return ids
+
+
+# This function returns the xMin, yMin, zMin, xMax, yMax, zMax values of an item of the
+# 'Get3DBoundingBoxes' or 'Get2DBoundingBoxes' result (NaN for the missing values).
+def getBoxValues(item) -> tuple:
+    box = getattr(item, 'boundingBox3D', None)
+    if box is not None:
+        return (box.xMin, box.yMin, box.zMin, box.xMax, box.yMax, box.zMax)
+    box = getattr(item, 'boundingBox2D', None)
+    if box is not None:
+        return (box.xMin, box.yMin, np.nan, box.xMax, box.yMax, np.nan)
+    return (np.nan,) * len(COLUMNS)
+
+
+# This function cuts an ordered index array into groups where the group id changes.
+# Arguments: element indices in their order, group id of every index (same order).
+# Returns a list of lists of element indices.
+def splitByIds(order: np.ndarray, ids: np.ndarray) -> List[List[int]]:
+    if not len(order):
+        return []
+    boundaries = np.flatnonzero(np.diff(ids)) + 1
+    return [group.tolist() for group in np.split(order, boundaries)]
+
+
+# This class is the bounding boxes of the elements in a (number of elements x 6) float array.
+class BoundingBoxArray:
+    def __init__(self, data: np.ndarray):
+        self.data = np.asarray(data, dtype=np.float64).reshape(-1, len(COLUMNS))
+
+    # Create the array from the result of the 'Get2DBoundingBoxes' or 'Get3DBoundingBoxes' command.
+    # The attributes are read once, the array is created from them in one step.
+    @classmethod
+    def FromBoundingBoxes(cls, boundingBoxes: Sequence) -> 'BoundingBoxArray':
+        return cls(np.array([getBoxValues(item) for item in boundingBoxes], dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    # Returns a column (a view, not a copy), e.g. boxes.Column('zMin').
+    def Column(self, name: str) -> np.ndarray:
+        return self.data[:, COLUMNS.index(name)]
+
+    # Returns True for the elements with a bounding box (the rows without NaN in x and y).
+    def IsValid(self) -> np.ndarray:
+        return ~np.isnan(self.data[:, [0, 1, 3, 4]]).any(axis=1)
+
+    # Returns the width (x), depth (y) and height (z) of the boxes.
+    def Extents(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (np.abs(self.data[:, 3] - self.data[:, 0]),
+                np.abs(self.data[:, 4] - self.data[:, 1]),
+                np.abs(self.data[:, 5] - self.data[:, 2]))
+
+    # Returns the cluster id of every element by a column (e.g. the story by 'zMin'), see 'clusterIds'.
+    def ClusterIds(self, column: str, limit: float) -> np.ndarray:
+        return clusterIds(self.Column(column), limit)
+
+    # Returns the clusters by a column: list of lists of element indices sorted by the column
+    # (the same result as 'sweepClusters' of 'grouping.py'). The elements without bounding box are left out.
+    def ClusterGroups(self, column: str, limit: float) -> List[List[int]]:
+        valid = np.flatnonzero(self.IsValid())
+        values = self.Column(column)[valid]
+        order = np.argsort(values, kind='stable')
+        return splitByIds(valid[order], clusterIds(values, limit)[order])
+
+    # Group the elements into stories (by zMin), the stories into rows (by yMin) and order the rows by xMin.
+    # Returns the same structure as 'groupIntoStoriesAndRows' of 'grouping.py' (so 'numberStoriesAndRows' can number it):
+    # list of stories, every story is a list of rows, every row is a list of element indices.
+    # The elements without bounding box are left out.
+    #
+    # The order is created with stable sorts one after the other (z, then y inside the stories,
+    # then x inside the rows), so the elements with the same coordinates keep the same order as before.
+    def GroupIntoStoriesAndRows(self, storyLimit: float, rowLimit: float) -> List[List[List[int]]]:
+        valid = np.flatnonzero(self.IsValid())
+        if not len(valid):
+            return []
+        xs, ys, zs = self.Column('xMin')[valid], self.Column('yMin')[valid], self.Column('zMin')[valid]
+        storyIds = clusterIds(zs, storyLimit)
+        # Sort by z, then by y inside the stories (np.lexsort sorts by the last key first and it is stable).
+        order = np.argsort(zs, kind='stable')
+        order = order[np.lexsort((ys[order], storyIds[order]))]
+        # A new row starts at a new story or where the gap in y is bigger than the row limit.
+        newRow = np.diff(ys[order]) > rowLimit
+        newRow |= np.diff(storyIds[order]) != 0
+        rowIds = np.empty(len(order), dtype=np.int64)
+        rowIds[order] = np.concatenate(([0], np.cumsum(newRow)))
+        # Sort by x inside the rows.
+        order = order[np.lexsort((xs[order], rowIds[order]))]
+        # Cut the order into rows, then the list of rows into stories by the story of their first element.
+        rows = splitByIds(valid[order], rowIds[order])
+        rowStarts = np.concatenate(([0], np.flatnonzero(np.diff(rowIds[order])) + 1))
+        storyStarts = np.flatnonzero(np.diff(storyIds[order][rowStarts])) + 1
+        return [rows[start:end] for start, end in zip(np.concatenate(([0], storyStarts)),
+                                                       np.concatenate((storyStarts, [len(rows)])))]
+
+    # Cut every group (e.g. a row of chairs) into sections where the empty gap between two neighbouring elements
+    # is bigger than the limit (e.g. an aisle in a row: from the xMax of a chair to the xMin of the next chair,
+    # so the gap does not depend on the width of the chairs).
+    # It is done for all the groups at once: one sort by (group, start column) and one pass over the sorted elements,
+    # so it is O(n log n) for any number of groups and gaps.
+    # Arguments: the groups (list of lists of element indices, e.g. the result of 'ClusterGroups'),
+    # start and end column of the elements (e.g. 'xMin' and 'xMax'), limit.
+    # Returns list of groups in the same order, every group is a list of sections ordered by the start column,
+    # every section is a list of element indices sorted by the start column.
+    def SplitAtGaps(self, groups: List[List[int]], startColumn: str, endColumn: str, limit: float) -> List[List[List[int]]]:
+        if not groups:
+            return []
+        indices = np.concatenate([np.asarray(group, dtype=np.int64) for group in groups])
+        groupIds = np.repeat(np.arange(len(groups)), [len(group) for group in groups])
+        starts = self.Column(startColumn)[indices]
+        order = np.lexsort((starts, groupIds))
+        ends = self.Column(endColumn)[indices][order]
+        # A new section starts at a new group or where the gap from the end of an element
+        # to the start of the next one is bigger than the limit.
+        newSection = starts[order][1:] - ends[:-1] > limit
+        newSection |= np.diff(groupIds[order]) != 0
+        sectionIds = np.concatenate(([0], np.cumsum(newSection)))
+        sections = splitByIds(indices[order], sectionIds)
+        # Collect the sections into their groups by the group of their first element.
+        sectionStarts = np.concatenate(([0], np.flatnonzero(newSection) + 1))
+        result = [[] for _ in groups]
+        for groupId, section in zip(groupIds[order][sectionStarts].tolist(), sections):
+            result[groupId].append(section)
+        return result
+
+
+# This function formats two values with the larger one first, e.g. the width and the depth of a zone: '5.20 x 3.10'.
+# Arguments: the two value arrays, number of decimals, separator.
+# Returns a list of strings.
+# The larger and smaller values are selected on the whole arrays, only the string formatting is done
+# one by one (numpy has no faster way to create Python strings).
+def FormatLargerFirst(a: np.ndarray, b: np.ndarray, decimals: int = 2, separator: str = " x ") -> List[str]:
+    pattern = f"%.{decimals}f" + separator.replace("%", "%%") + f"%.{decimals}f"
+    return [pattern % values for values in zip(np.maximum(a, b).tolist(), np.minimum(a, b).tolist())]
@@ -0,0 +1,134 @@
+# Import json to save and load the index between the runs, uuid to create the classification item ids.
+import json, uuid
+# Import typing not essential for the code.
+from typing import Dict, List, Optional, Tuple
+
+# This module is the classification index of the session (see 'GetClassificationIndex' in 'archicad_session.py').
+#
+# The 'FindClassificationItemInSystem' utility requests the whole classification tree of the system
+# and walks it on every call, and 'GetDetailsOfClassificationItems' is called with the same item ids many times
+# (e.g. the same classification of hundreds of zones).
+# The index requests the tree once ('GetAllClassificationsInSystem'), flattens it and keeps the items in dictionaries:
+# item guid:(id, name, description, parent guid), id:item guid and name:item guids, so every lookup is O(1)
+# and the details of the items are answered without any request.
+# The index can be saved and loaded (it is a small json file), so the next run does not request the tree at all.
+
+
+# This function returns the guid string of a classification item id (or of an item with a 'classificationItemId').
+def getClassificationItemGuid(classificationItemId) -> str:
+    classificationItemId = getattr(classificationItemId, 'classificationItemId', classificationItemId)
+    return str(classificationItemId.guid)
+
+
+# This class is the flattened classification tree of a classification system.
+class ClassificationIndex:
+    def __init__(self, systemName: str, types=None):
+        self.systemName = systemName
+        # The types of the connection (act) to create the classification item ids and details.
+        self.types = types
+        # item guid:(id, name, description, parent guid).
+        self.items: Dict[str, Tuple[str, str, str, Optional[str]]] = {}
+        # id:item guid (the ids are unique in a system).
+        self.guidOfId: Dict[str, str] = {}
+        # name:list of item guids (the names are not unique).
+        self.guidsOfName: Dict[str, List[str]] = {}
+        # The details of the items not found in the system (requested once): item guid:details or None.
+        self._otherDetails: Dict[str, object] = {}
+        # True if the index was loaded from the disk (it can be older than the project).
+        self.loaded = False
+        # The guids of the loaded index checked in the project (see 'IsCurrent').
+        self._checkedGuids = set()
+
+    # Add an item to the index.
+    def Add(self, guid: str, itemId: str, name: str, description: str, parentGuid: Optional[str] = None):
+        self.items[guid] = (itemId, name, description, parentGuid)
+        self.guidOfId[itemId] = guid
+        self.guidsOfName.setdefault(name, []).append(guid)
+
+    # Create the index from the tree of the system.
+    # Arguments: the commands (acc), the types (act), the classification system id, the name of the system.
+    @classmethod
+    def Build(cls, commands, types, classificationSystemId, systemName: str) -> 'ClassificationIndex':
+        index = cls(systemName, types)
+        # The tree is walked with a stack instead of recursion (the trees can be deep).
+        stack = [(item.classificationItem, None) for item in reversed(commands.GetAllClassificationsInSystem(classificationSystemId))]
+        while stack:
+            item, parentGuid = stack.pop()
+            guid = getClassificationItemGuid(item)
+            index.Add(guid, item.id, item.name, getattr(item, 'description', ''), parentGuid)
+            stack.extend((child.classificationItem, guid) for child in reversed(getattr(item, 'children', None) or []))
+        return index
+
+    # Returns the details of an item as a 'ClassificationItemDetails'.
+    def _details(self, guid: str):
+        itemId, name, description, _ = self.items[guid]
+        return self.types.ClassificationItemDetails(self.types.ClassificationItemId(uuid.UUID(guid)), itemId, name, description)
+
+    # Returns the item with the id (e.g. 'Chair') as a 'ClassificationItemDetails' (it has a 'classificationItemId'),
+    # or None if there is no item with the id.
+    def FindItem(self, itemId: str):
+        guid = self.guidOfId.get(itemId)
+        return self._details(guid) if guid is not None else None
+
+    # Returns the items with the name as a list of 'ClassificationItemDetails'.
+    def FindItemsByName(self, name: str) -> List:
+        return [self._details(guid) for guid in self.guidsOfName.get(name, [])]
+
+    # Returns False if an item of the loaded index is not the same in the project any more (it was deleted,
+    # or its id or name was changed), then the index has to be built again. The index built in this session is current.
+    # Arguments: the guids of the items (in the index) to check, the commands (acc).
+    # Every item is requested only once (in one command).
+    def IsCurrent(self, guids: List[str], commands) -> bool:
+        guids = [guid for guid in dict.fromkeys(guids) if guid not in self._checkedGuids]
+        if not self.loaded or not guids:
+            return True
+        details = commands.GetDetailsOfClassificationItems([self.types.ClassificationItemId(uuid.UUID(guid)) for guid in guids])
+        for guid, detailsOfItem in zip(guids, details):
+            # If there is no 'classificationItem' attribute the item has an 'error' instead (it does not exist).
+            item = getattr(detailsOfItem, 'classificationItem', None)
+            if item is None or (item.id, item.name) != self.items[guid][:2]:
+                return False
+            self._checkedGuids.add(guid)
+        return True
+
+    # Returns the guid of the parent item (None for the items at the top of the tree).
+    def ParentGuid(self, guid: str) -> Optional[str]:
+        return self.items[guid][3] if guid in self.items else None
+
+    # Returns the details of the classification item ids (in the same order) as 'ClassificationItemDetails',
+    # None for the missing ids (None) and for the items which do not exist.
+    # The items not in the system (e.g. of another system) are requested with the commands (if given),
+    # every item only once.
+    def GetDetailsOfClassificationItems(self, classificationItemIds: List, commands=None) -> List:
+        guids = [getClassificationItemGuid(itemId) if itemId is not None else None for itemId in classificationItemIds]
+        otherGuids = list(dict.fromkeys(guid for guid in guids if guid is not None and guid not in self.items and guid not in self._otherDetails))
+        if otherGuids and commands is not None:
+            otherDetails = commands.GetDetailsOfClassificationItems(
+                [self.types.ClassificationItemId(uuid.UUID(guid)) for guid in otherGuids])
+            for guid, details in zip(otherGuids, otherDetails):
+                # If there is no 'classificationItem' attribute the item has an 'error' instead.
+                self._otherDetails[guid] = getattr(details, 'classificationItem', None)
+        detailsOfGuids = {guid: self._details(guid) for guid in set(guids) if guid in self.items}
+        return [detailsOfGuids.get(guid) or self._otherDetails.get(guid) if guid is not None else None for guid in guids]
+
+    # Save the index into a json file.
+    def Save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'systemName': self.systemName, 'items': self.items}, file)
+
+    # Load an index saved by 'Save'. Returns None if the file was saved for another system
+    # or it can not be read (e.g. it was truncated by a killed script), then the index is built again.
+    @classmethod
+    def Load(cls, path: str, systemName: str, types=None) -> Optional['ClassificationIndex']:
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('systemName') != systemName:
+                return None
+            index = cls(systemName, types)
+            for guid, (itemId, name, description, parentGuid) in data['items'].items():
+                index.Add(guid, itemId, name, description, parentGuid)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        index.loaded = True
+        return index
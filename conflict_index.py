@@ -0,0 +1,256 @@
+# Import json, os and tempfile to save and load the index between the runs, time for the read times of the values.
+import json, os, tempfile, time
+# Import sys to intern the values of the chunked scan, uuid to pack the element guids into bytes.
+import sys, uuid
+# Import typing not essential for the code.
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+# This module is the persistent index of the incremental element ID conflict check.
+#
+# The full check requests the element ID of every element of the project on every run.
+# The index keeps the element guid:element ID pairs (and the inverted element ID:element guids)
+# between the runs, so on the next run only these elements have to be requested:
+#   - the new elements (not in the index yet),
+#   - the elements written by the scripts since the last run (see 'WRITE_JOURNAL_FILE' of 'archicad_session.py'),
+#   - a rotating slice of the other elements (the element IDs changed by hand are found this way,
+#     every element is checked again after 'elementCount / sliceSize' runs).
+# The deleted elements are removed from the index by comparing it with the list of all elements.
+# The conflicts are read from the index, so they are reported for the whole project.
+# The index keeps the time when the value of every element was read, the values not read on this run can be
+# out of date (changed by hand), the script reports how old they are (see 'OldestReadTime').
+#
+# The 'CompactValueIndex' is the index of the chunked full check: the values of the elements are requested
+# in chunks and every chunk is added to the index and dropped before the next one is requested,
+# so only one chunk of the response objects is in the memory at the same time.
+# More properties are checked in the same scan: the values of all of them are requested together for a chunk
+# and every property has its own index (the indexes share the packed element guids), a property can be checked
+# only among the elements of a scope (e.g. the zone numbers of the zones, the IDs of the parking spaces).
+
+
+# This class is the element guid:value index with the inverted value:element guids index.
+class ElementIdIndex:
+    def __init__(self, propertyGuid: str):
+        # The guid of the indexed property, an index saved for another property is not loaded.
+        self.propertyGuid = propertyGuid
+        # element guid:value.
+        self.valueOfElement: Dict[str, str] = {}
+        # value:set of element guids.
+        self.elementsOfValue: Dict[str, Set[str]] = {}
+        # element guid:the time (seconds since the epoch) when the value was read from Archicad.
+        self.readTimeOfElement: Dict[str, float] = {}
+        # The position of the next rotating refresh slice in the sorted element guids.
+        self.refreshCursor = 0
+
+    # Set the value of an element (new, changed or read again).
+    # Arguments: element guid, value, the time when the value was read (None: now).
+    def Update(self, elementGuid: str, value: str, readTime: Optional[float] = None):
+        self.readTimeOfElement[elementGuid] = time.time() if readTime is None else readTime
+        oldValue = self.valueOfElement.get(elementGuid)
+        if oldValue == value and elementGuid in self.valueOfElement:
+            return
+        if elementGuid in self.valueOfElement:
+            self._removeFromValue(elementGuid, oldValue)
+        self.valueOfElement[elementGuid] = value
+        self.elementsOfValue.setdefault(value, set()).add(elementGuid)
+
+    # Remove an element (e.g. deleted from the project).
+    def Remove(self, elementGuid: str):
+        if elementGuid in self.valueOfElement:
+            self._removeFromValue(elementGuid, self.valueOfElement.pop(elementGuid))
+            self.readTimeOfElement.pop(elementGuid, None)
+
+    # Remove the element from the set of the value, empty sets are not kept.
+    def _removeFromValue(self, elementGuid: str, value: str):
+        elements = self.elementsOfValue.get(value)
+        if elements is not None:
+            elements.discard(elementGuid)
+            if not elements:
+                del self.elementsOfValue[value]
+
+    # Returns the guids of the indexed elements.
+    def ElementGuids(self) -> Set[str]:
+        return set(self.valueOfElement)
+
+    # Returns the time when the oldest value of the index was read, or None if the index is empty.
+    def OldestReadTime(self) -> Optional[float]:
+        return min(self.readTimeOfElement.values(), default=None)
+
+    # Returns the next 'size' element guids of the rotating refresh and moves the cursor.
+    # The guids are taken in sorted order, the slice continues from the beginning at the end of the list.
+    def NextRefreshSlice(self, size: int) -> List[str]:
+        elementGuids = sorted(self.valueOfElement)
+        if not elementGuids or size <= 0:
+            return []
+        if size >= len(elementGuids):
+            return elementGuids
+        start = self.refreshCursor % len(elementGuids)
+        refreshSlice = (elementGuids + elementGuids)[start:start + size]
+        self.refreshCursor = (start + size) % len(elementGuids)
+        return refreshSlice
+
+    # Returns the list of (value, sorted list of element guids) tuples of the values with more than one element,
+    # sorted by the value.
+    def Conflicts(self) -> List[Tuple[str, List[str]]]:
+        return [(value, sorted(elements)) for value, elements in sorted(self.elementsOfValue.items()) if len(elements) > 1]
+
+    # Save the index into a json file.
+    # The index is written into a temporary file in the same folder and then renamed to the path,
+    # so an interrupted save does not leave a truncated index (which would be checked again from the start).
+    def Save(self, path: str):
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=folder, suffix='.tmp', delete=False) as file:
+            try:
+                json.dump({'propertyGuid': self.propertyGuid,
+                           'refreshCursor': self.refreshCursor,
+                           'valueOfElement': self.valueOfElement,
+                           'readTimeOfElement': self.readTimeOfElement}, file)
+            except BaseException:
+                file.close()
+                os.remove(file.name)
+                raise
+        os.replace(file.name, path)
+
+    # Load the index from a json file.
+    # Returns an empty index if the file does not exist, it can not be read or it was saved for another property.
+    @classmethod
+    def Load(cls, path: Optional[str], propertyGuid: str) -> 'ElementIdIndex':
+        index = cls(propertyGuid)
+        if not path or not os.path.exists(path):
+            return index
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return index
+        if data.get('propertyGuid') != propertyGuid:
+            return index
+        index.refreshCursor = data.get('refreshCursor', 0)
+        # The index saved without the read times: the values were read before the file was saved.
+        readTimeOfElement = data.get('readTimeOfElement', {})
+        savedTime = os.path.getmtime(path)
+        for elementGuid, value in data.get('valueOfElement', {}).items():
+            index.Update(elementGuid, value, readTimeOfElement.get(elementGuid, savedTime))
+        return index
+
+
+# This function selects the elements to request on this run and removes the deleted elements from the index.
+# Arguments: the index, the guids of all the elements of the project,
+# the guids written since the last run (write journal), size of the rotating refresh slice.
+# Returns the set of the element guids whose value must be requested.
+def SelectElementsToRefresh(index: ElementIdIndex, currentElementGuids: Iterable[str],
+                            writtenElementGuids: Iterable[str], refreshSliceSize: int) -> Set[str]:
+    currentElementGuids = set(currentElementGuids)
+    indexedElementGuids = index.ElementGuids()
+    # Deleted elements.
+    for elementGuid in indexedElementGuids - currentElementGuids:
+        index.Remove(elementGuid)
+    # New elements, written elements (if they still exist) and the rotating slice of the others.
+    toRefresh = currentElementGuids - indexedElementGuids
+    toRefresh.update(currentElementGuids.intersection(writtenElementGuids))
+    toRefresh.update(index.NextRefreshSlice(refreshSliceSize))
+    return toRefresh
+
+
+# This class is the value:element numbers index of the chunked full check.
+# The element guids are packed into one bytearray (16 bytes each) and the elements are referred to
+# by their number (position in the packed guids), so the index does not keep any Archicad object.
+# A value with one element is stored as a single int, the list is created at the second element
+# (most of the values are unique). The values are interned, the same strings of the chunks are stored once.
+# Arguments: guids (optional) the packed guids shared with other indexes of the same elements.
+class CompactValueIndex:
+    def __init__(self, guids: Optional[bytearray] = None):
+        self.guids = guids if guids is not None else bytearray()
+        # value:element number or list of element numbers.
+        self.elementsOfValue: Dict[str, Union[int, List[int]]] = {}
+
+    # Returns the number of the elements.
+    def __len__(self) -> int:
+        return len(self.guids) // 16
+
+    # Add the elements (e.g. the result of 'GetAllElements'), their numbers are the next numbers in their order.
+    def AddElements(self, elements: Iterable):
+        for element in elements:
+            self.guids += getattr(element, 'elementId', element).guid.bytes
+
+    # Returns the packed guid (16 bytes) of the element with the number.
+    def ElementGuidBytes(self, elementNumber: int) -> bytes:
+        return bytes(self.guids[elementNumber * 16:elementNumber * 16 + 16])
+
+    # Returns the guid of the element with the number.
+    def ElementGuid(self, elementNumber: int) -> uuid.UUID:
+        return uuid.UUID(bytes=self.ElementGuidBytes(elementNumber))
+
+    # Add the value of an element.
+    def Add(self, value: str, elementNumber: int):
+        value = sys.intern(value) if isinstance(value, str) else value
+        elementNumbers = self.elementsOfValue.get(value)
+        if elementNumbers is None:
+            self.elementsOfValue[value] = elementNumber
+        elif isinstance(elementNumbers, int):
+            self.elementsOfValue[value] = [elementNumbers, elementNumber]
+        else:
+            elementNumbers.append(elementNumber)
+
+    # Returns the list of (value, list of element guids) tuples of the values with more than one element,
+    # sorted by the value.
+    def Conflicts(self) -> List[Tuple[str, List[uuid.UUID]]]:
+        return [(value, [self.ElementGuid(elementNumber) for elementNumber in elementNumbers])
+                for value, elementNumbers in sorted(self.elementsOfValue.items()) if not isinstance(elementNumbers, int)]
+
+
+# This function returns the packed guids (16 bytes) of the elements, e.g. the scope of a check
+# from the result of 'GetElementsByType' or 'GetElementsByClassification'.
+def GetPackedGuids(elements: Iterable) -> Set[bytes]:
+    return {getattr(element, 'elementId', element).guid.bytes for element in elements}
+
+
+# This function returns a hashable form of a property value: the simple values (strings, numbers, booleans)
+# are kept, the Archicad types (e.g. enum value ids) and lists are converted to a json string.
+def getHashableValue(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return json.dumps([item.to_dict() if hasattr(item, 'to_dict') else item for item in value], sort_keys=True, default=str)
+    if hasattr(value, 'to_dict'):
+        return json.dumps(value.to_dict(), sort_keys=True, default=str)
+    return value
+
+
+# This function requests the values of the properties of the elements in chunks and adds them to the indexes.
+# The values of all the properties are requested in one command per chunk (a property checked more times,
+# e.g. in more scopes, is requested once). The response of a chunk is dropped before the next chunk is requested,
+# so the memory used by the responses depends on the chunk size only.
+# If every index has a scope only the elements in any of the scopes are requested.
+# The elements without value (e.g. the property is not available for them) are left out.
+# Arguments: the commands (acc), the types (act), the indexes (sharing the packed guids of the elements),
+# property id of every index, chunk size, scope of every index (optional, set of packed guids or None for all the elements).
+def ScanPropertyValuesInChunks(commands, types, indexes: List[CompactValueIndex], propertyIds: List, chunkSize: int,
+                               scopes: Optional[List[Optional[Set[bytes]]]] = None):
+    if not indexes:
+        return
+    scopes = scopes or [None] * len(indexes)
+    elements = indexes[0]
+    # The column of every index in the requested property values.
+    propertyIdOfGuid = {str(propertyId.guid).lower(): propertyId for propertyId in propertyIds}
+    columns = list(propertyIdOfGuid)
+    indexColumns = [columns.index(str(propertyId.guid).lower()) for propertyId in propertyIds]
+    elementNumbers = range(len(elements))
+    if all(scope is not None for scope in scopes):
+        inAnyScope = set().union(*scopes)
+        elementNumbers = [elementNumber for elementNumber in elementNumbers if elements.ElementGuidBytes(elementNumber) in inAnyScope]
+    for start in range(0, len(elementNumbers), chunkSize):
+        chunkNumbers = elementNumbers[start:start + chunkSize]
+        chunk = [types.ElementIdArrayItem(types.ElementId(elements.ElementGuid(elementNumber))) for elementNumber in chunkNumbers]
+        propertyValuesForElements = commands.GetPropertyValuesOfElements(chunk, list(propertyIdOfGuid.values()))
+        for elementNumber, propertyValues in zip(chunkNumbers, propertyValuesForElements):
+            # If there is no 'propertyValues' attribute the item has an 'error' instead.
+            propertyValues = getattr(propertyValues, 'propertyValues', None)
+            if propertyValues is None:
+                continue
+            guidBytes = elements.ElementGuidBytes(elementNumber)
+            for index, column, scope in zip(indexes, indexColumns, scopes):
+                if scope is not None and guidBytes not in scope:
+                    continue
+                value = getattr(getattr(propertyValues[column], 'propertyValue', None), 'value', None)
+                if value is not None:
+                    index.Add(getHashableValue(value), elementNumber)
+        del chunk, propertyValuesForElements
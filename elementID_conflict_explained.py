@@ -1,60 +1,188 @@
-# Import archicad connection (required).
-from archicad import ACConnection
+# Import os to get the folder of the script (for the index file), time for the age of the index values.
+import os, time
+# Import the shared session module (required).
+from archicad_session import OpenSession, getElementGuid
+# Import the persistent index of the incremental check (required for the incremental check only).
+from conflict_index import CompactValueIndex, ElementIdIndex, GetPackedGuids, ScanPropertyValuesInChunks, SelectElementsToRefresh
 
 # Establish the connection with the Archicad software, Archicad must be open and the pln file must be open too.
 #
 # We can use the acu.OpenFile() utility but we need an established connection first so we need to open Archicad and a new plan
 # as a minimum because all utilities use the connection.
-conn = ACConnection.connect()
-assert conn
+# The shared session module is doing the connection and it can send independent commands together.
+session = OpenSession()
 
 # Create shorts of the commands, types and utilities.
-acc = conn.commands
-act = conn.types
-acu = conn.utilities
+acc = session.commands
+act = session.types
+acu = session.utilities
 
 # original comment -> ################################ CONFIGURATION #################################
 # Get all elements from the project.
-elements = acc.GetAllElements()
+# The request is only queued here and sent together with the property id request below.
+elementsResult = session.Queue(acc.GetAllElements)
 # Define messages.
 messageWhenNoConflictFound = "There is no elementID conflict."
-conflictMessageParts = ["[Conflict]", "elements have", "as element ID:\n"]
+# The message of the other checks ('{label}' is the label of the checked property).
+messageWhenNoConflictFoundForLabel = "There is no {label} conflict."
+# The message of the incremental check when not every value was read again on this run (the others can be out of date).
+messageWhenNoConflictFoundInIndex = ("There is no {label} conflict in the index, but {staleCount} of {count} values were not read again on this run "
+                                     "(the oldest one was read {age} ago). Run the full check to confirm it.")
+conflictMessageParts = ["[Conflict]", "elements have", "as {label}:\n"]
+
+# The checked properties, all of them are checked in the same scan (one request per chunk for all the properties).
+# "property": the name of a built in property or [group name, property name] of a user defined property,
+# "label": the name of the property in the messages,
+# "elementType" (optional): only the elements of this type are checked (e.g. the zone numbers of the zones),
+# "classification" (optional): [classification system name, classification item id],
+# only the elements with this classification are checked (e.g. the IDs of the parking spaces).
+conflictChecks = [
+    {"property": "General_ElementID", "label": "element ID"},
+    # {"property": "Zone_ZoneNumber", "label": "zone number", "elementType": "Zone"},
+    # {"property": "General_ElementID", "label": "parking space ID", "classification": ["ARCHICAD Classification", "Parking Space"]},
+    # {"property": "General_ElementID", "label": "seat ID", "classification": ["ARCHICAD Classification", "Chair"]},
+]
+
+# Incremental check (element ID only): the element IDs are kept in an index file between the runs (see 'conflict_index.py')
+# and only the new, the written (see 'WRITE_JOURNAL_FILE' of 'archicad_session.py') and a slice
+# of the other elements are requested again. The index files are saved into this folder, one file per project
+# (named by 'session.GetProjectKey()'). None means the full check (every element on every run).
+incrementalIndexFolder = None  # e.g. os.path.join(os.path.dirname(os.path.abspath(__file__)), 'elementID_index')
+# Number of the not changed elements requested again on every run to find the element IDs changed by hand.
+refreshSliceSize = 5000
+
+# Full check in chunks: the property values are requested for this many elements at a time and every chunk
+# is added to compact indexes before the next one is requested (see 'CompactValueIndex' in 'conflict_index.py'),
+# so the memory used by the responses depends on the chunk size, not on the size of the model.
+# None means the values of all the elements are requested in one response.
+scanChunkSize = 5000
 
 # This function createss the constructed message for the conflicts.
-def GetConflictMessage(elementIDPropertyValue, elementIds):
-    return f"{conflictMessageParts[0]} {len(elementIds)} {conflictMessageParts[1]} '{elementIDPropertyValue}' {conflictMessageParts[2]}{sorted(elementIds, key=lambda id: id.guid)}"
+def GetConflictMessage(elementIDPropertyValue, elementIds, label="element ID"):
+    return f"{conflictMessageParts[0]} {len(elementIds)} {conflictMessageParts[1]} '{elementIDPropertyValue}' {conflictMessageParts[2].format(label=label)}{sorted(elementIds, key=lambda id: id.guid)}"
+
+# This function returns the age (seconds) as a text, e.g. '3 hours'.
+def GetAgeText(seconds):
+    for unit, length in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= length:
+            return f"{int(seconds // length)} {unit}{'s' if seconds >= 2 * length else ''}"
+    return "less than a minute"
+
+# This function returns the message of a check without conflict: the original message for the element IDs of all the elements.
+def GetNoConflictMessage(check):
+    if check["property"] == "General_ElementID" and "elementType" not in check and "classification" not in check:
+        return messageWhenNoConflictFound
+    return messageWhenNoConflictFoundForLabel.format(label=check["label"])
+
+# This function returns the property user id of a check: a built in property name or [group name, property name].
+def getPropertyUserId(check):
+    if isinstance(check["property"], str):
+        return act.BuiltInPropertyUserId(check["property"])
+    return act.UserDefinedPropertyUserId(list(check["property"]))
+
+# This function returns the elements of the scope of a check (queued, see 'archicad_session.py'),
+# or None if the check has no scope (every element is checked).
+# The checks with the same scope share the same request (queued requests by scope).
+def queueScopeElements(check, queuedScopes):
+    if "elementType" in check:
+        key = ("elementType", check["elementType"])
+        if key not in queuedScopes:
+            queuedScopes[key] = session.Queue(acc.GetElementsByType, check["elementType"])
+        return queuedScopes[key]
+    if "classification" in check:
+        key = ("classification",) + tuple(check["classification"])
+        if key not in queuedScopes:
+            classificationItem = session.FindClassificationItemInSystem(*check["classification"])
+            # If there is no such classification item the scope is empty.
+            if classificationItem is None:
+                queuedScopes[key] = session.Queue(list)
+            else:
+                queuedScopes[key] = session.Queue(acc.GetElementsByClassification, classificationItem.classificationItemId)
+        return queuedScopes[key]
+    return None
 # original comment -> ################################################################################
 
+# The index file of the open project. The projects without identity (see 'GetProjectKey' in 'archicad_session.py')
+# can not be kept apart in the index folder, they are checked with the full check.
+incrementalIndexFile = None
+if incrementalIndexFolder:
+    projectKey = session.GetProjectKey()
+    if projectKey is None:
+        print("The project has no identity (it is not saved or the Tapir add-on is not installed), the full check is used.")
+    else:
+        incrementalIndexFile = os.path.join(incrementalIndexFolder, projectKey + '.json')
+
 # Get the built in property id of 'General_ElementID' for all the elements.
-elementIdPropertyId = acu.GetBuiltInPropertyId('General_ElementID')
-# Get the built in property value of 'General_ElementID' for all the elements.
-propertyValuesForElements = acc.GetPropertyValuesOfElements(elements, [elementIdPropertyId])
-
-# Create a dictionary with the property value : element id, key:value pairs.
-propertyValuesToElementIdsDictionary = {}
-# Loop through the elements' property values.
-for i in range(len(propertyValuesForElements)):
-    # Take the element id of the actual element.
-    elementId = elements[i].elementId
-    # Take the property value of the actual element.
-    propertyValue = propertyValuesForElements[i].propertyValues[0].propertyValue.value
-    # If the property value is not in the dictionary create the key of the actual property value
-    # and its value as an empty set.
-    if propertyValue not in propertyValuesToElementIdsDictionary:
-        propertyValuesToElementIdsDictionary[propertyValue] = set()
-    # Add the actual elmentid to the set.
-    propertyValuesToElementIdsDictionary[propertyValue].add(elementId)
-
-# As base condition no conflict.
-noConflictFound = True
-# Loop through the 'propertyValuesToElementIdsDictionary' items.
-for k, v in sorted(propertyValuesToElementIdsDictionary.items()):
-    # If the actual property value's (key) set has more than one element
-    # it means the same id is given to those elements which ids in the actual set.
-    # It is a conflict. 
-    if len(v) > 1:
-        noConflictFound = False
-        print(GetConflictMessage(k, v))
-# If there was no conflict (the element id set of the actual value contains only one element).
-if noConflictFound:
-    print(messageWhenNoConflictFound)
+elementIdPropertyIdResult = session.Queue(session.GetBuiltInPropertyId, 'General_ElementID')
+# The property ids and the scopes of the checks are requested together with the elements (full check only).
+if not incrementalIndexFile:
+    propertyIdsResult = session.Queue(session.GetPropertyIds, [getPropertyUserId(check) for check in conflictChecks])
+    queuedScopes = {}
+    scopeResults = [queueScopeElements(check, queuedScopes) for check in conflictChecks]
+# Send the queued requests together and take their results.
+session.Flush()
+elements = elementsResult.Result()
+elementIdPropertyId = elementIdPropertyIdResult.Result()
+
+# Incremental check: request only the element IDs which may have changed since the last run.
+if incrementalIndexFile:
+    # Load the index of the last run (an empty index on the first run).
+    index = ElementIdIndex.Load(incrementalIndexFile, str(elementIdPropertyId.guid))
+    # Element guid:element id dictionary of all the elements.
+    elementsByGuid = {getElementGuid(element): element.elementId for element in elements}
+    # Remove the deleted elements and select the elements to request.
+    # The elements written since the last run and the position of the journal they were read to.
+    writtenElements, journalPosition = session.ReadWriteJournal(elementIdPropertyId)
+    elementsToRefresh = SelectElementsToRefresh(index, elementsByGuid, writtenElements, refreshSliceSize)
+    refreshedElements = [element for element in elements if getElementGuid(element) in elementsToRefresh]
+    if refreshedElements:
+        refreshedValues = acc.GetPropertyValuesOfElements(refreshedElements, [elementIdPropertyId])
+        for element, propertyValues in zip(refreshedElements, refreshedValues):
+            index.Update(getElementGuid(element), propertyValues.propertyValues[0].propertyValue.value)
+    # Save the index and clear the processed lines of the write journal
+    # (the lines written by other scripts since the journal was read are kept).
+    index.Save(incrementalIndexFile)
+    session.ClearWriteJournal(elementIdPropertyId, journalPosition)
+    # The values not read on this run can be out of date, the age of the oldest one is reported.
+    staleCount = len(elements) - len(refreshedElements)
+    age = GetAgeText(time.time() - (index.OldestReadTime() or time.time()))
+    print(f"Element IDs requested: {len(refreshedElements)} of {len(elements)}" + (f", the oldest element ID of the index was read {age} ago" if staleCount else ""))
+
+    # Print the conflicts of the whole project from the index.
+    conflicts = index.Conflicts()
+    for value, elementGuids in conflicts:
+        print(GetConflictMessage(value, [elementsByGuid[elementGuid] for elementGuid in elementGuids]))
+    # The plain all-clear is printed only if every element ID was read on this run.
+    if not conflicts and staleCount:
+        print(messageWhenNoConflictFoundInIndex.format(label="element ID", staleCount=staleCount, count=len(elements), age=age))
+    elif not conflicts:
+        print(messageWhenNoConflictFound)
+
+# Full check in chunks: request the values of all the checked properties chunk by chunk into the compact indexes.
+else:
+    # The indexes of the checks share the packed guids of the elements.
+    guids = bytearray()
+    indexes = [CompactValueIndex(guids) for check in conflictChecks]
+    if indexes:
+        indexes[0].AddElements(elements)
+    # The number of the elements, a 'scanChunkSize' of None requests them in one chunk.
+    elementCount = len(elements)
+    # The element objects are not needed any more, only the packed guids of the indexes.
+    elements = elementsResult = None
+    # The checks of the properties which do not exist in the project are left out.
+    checks = []
+    for check, index, propertyId, scopeResult in zip(conflictChecks, indexes, propertyIdsResult.Result(), scopeResults):
+        if not hasattr(propertyId, 'propertyId'):
+            print(f"The property of the {check['label']} check is not found: {check['property']}")
+            continue
+        checks.append((check, index, propertyId.propertyId, GetPackedGuids(scopeResult.Result()) if scopeResult is not None else None))
+    ScanPropertyValuesInChunks(acc, act, [index for _, index, _, _ in checks], [propertyId for _, _, propertyId, _ in checks],
+                               scanChunkSize or max(elementCount, 1), [scope for _, _, _, scope in checks])
+
+    # Print the conflicts of every check from its index sorted by the value.
+    for check, index, _, _ in checks:
+        conflicts = index.Conflicts()
+        for value, elementGuids in conflicts:
+            print(GetConflictMessage(value, [act.ElementId(elementGuid) for elementGuid in elementGuids], check["label"]))
+        if not conflicts:
+            print(GetNoConflictMessage(check))
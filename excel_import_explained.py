@@ -1,27 +1,35 @@
-# Import archicad connection (required), handle_dependencies is not necessary.
-from archicad import ACConnection, handle_dependencies
+# Import handle_dependencies to check the openpyxl module.
+from archicad import handle_dependencies
+# Import the shared session module (required).
+from archicad_session import OpenSession
+# Import the shared diff stage to write only the changed property values.
+from property_writer import WriteChangedPropertyValues
 # Import typing module (not necessary).
 from typing import List, Dict, Any
-# Import os for file operations. Sys not used. Uuid for uuid generation.
-import os, sys, uuid
+# Import os for file operations. Sys not used.
+import os, sys
 # Check if the importable (installed) if not returns an error.
 handle_dependencies('openpyxl')
 
 # Import Workobook from openpyxl for excel file operations.
 # https://openpyxl.readthedocs.io/en/stable/index.html
 from openpyxl import load_workbook
+# Import deque to keep the chunks sent to Archicad in order.
+from collections import deque
+# Import the worksheet logic of the import (see 'excel_tables.py').
+from excel_tables import CreateNewPropertyValues, ReadWorksheetTable, ReadWorksheetTableInChunks
 
 # Establish the connection with the Archicad software, Archicad must be open and the pln file must be open too.
 #
 # We can use the acu.OpenFile() utility but we need an established connection first so we need to open Archicad and a new plan
 # as a minimum because all utilities use the connection.
-conn = ACConnection.connect()
-assert conn
+# The shared session module is doing the connection and it can send independent commands together.
+session = OpenSession()
 
 # Create shorts of the commands, types and utilities.
-acc = conn.commands
-act = conn.types
-acu = conn.utilities
+acc = session.commands
+act = session.types
+acu = session.utilities
 
 # Getting the actual dirname as scriptFolder variable.
 # The use of realpath is to get the canonical path adn ignore symbolic links.
@@ -31,76 +39,107 @@ scriptFolder = os.path.dirname(os.path.realpath(__file__))
 inputFolder = scriptFolder
 # Define the output filename.
 inputFileName = "BeamAndWallGeometry.xlsx"
+# Streaming import: the rows are read with a read-only iterator, converted in chunks and every chunk is
+# sent to Archicad while the next chunk is read. The used memory does not depend on the number of rows.
+# Use it for big files, the values written are the same.
+streamingImport = False
+# The number of rows (elements) in one chunk of the streaming import.
+importChunkSize = 2000
+# The maximum number of chunks sent to Archicad and not yet finished.
+maxChunksInFlight = 2
 # original comment -> ################################################################################
 
+# This function reads the current values of a chunk and writes the changed values (same as the original import).
+# Arguments: element ids, property ids, new values of the elements (lists in the order of the property ids).
+# Returns the 'WriteSummary' of the chunk (see 'property_writer.py').
+def writeChunk(elementIds, propertyIds, newValues):
+    # Getting the property values of the elements of the chunk.
+    propertyValuesOfElements = acc.GetPropertyValuesOfElements(elementIds, propertyIds)
+    # The new property values and the (element guid, property guid):current property value dictionary,
+    # to compare the new values with.
+    elemPropertyValues, currentValues = CreateNewPropertyValues(act, elementIds, propertyIds, newValues, propertyValuesOfElements)
+    # Write only the values different from the current ones.
+    return WriteChangedPropertyValues(session, elemPropertyValues, currentValues)
+
+# This function imports one worksheet in streaming mode.
+# The rows are read and converted chunk by chunk, every chunk is sent to Archicad in the background
+# ('session.Submit') while the next chunk is read. At most 'maxChunksInFlight' chunks are waiting,
+# so the memory use is bounded and the writes start before the whole file is read.
+def StreamImportWorksheet(sheet):
+    # The property ids (first row) and the chunks of the rows read with the read-only iterator of the worksheet
+    # (see 'ReadWorksheetTableInChunks' in 'excel_tables.py').
+    table = ReadWorksheetTableInChunks(sheet, act, importChunkSize)
+    if table is None:
+        return
+    propertyIds, chunks = table
+
+    # The chunks sent to Archicad and not yet finished.
+    pendingChunks = deque()
+    # The number of the changed and unchanged values of the finished chunks (only the counts are kept,
+    # the write summaries of the chunks are dropped to keep the memory use bounded).
+    changedCount = 0
+    unchangedCount = 0
+    for elementIds, newValues in chunks:
+        pendingChunks.append(session.Submit(writeChunk, elementIds, propertyIds, newValues))
+        # Wait for the oldest chunk if there are too many chunks waiting.
+        if len(pendingChunks) >= maxChunksInFlight:
+            writeSummary = pendingChunks.popleft().Result()
+            changedCount += writeSummary.changedCount
+            unchangedCount += writeSummary.unchangedCount
+    # Wait for the remaining chunks.
+    while pendingChunks:
+        writeSummary = pendingChunks.popleft().Result()
+        changedCount += writeSummary.changedCount
+        unchangedCount += writeSummary.unchangedCount
+    print(f"{sheet.title}: {changedCount} property values changed, {unchangedCount} unchanged")
+
 # Prepare the created excel file's path with joining the Folder path and the filename.
 excelFilePath = os.path.join(inputFolder, inputFileName)
-# Load the excel file workbook as wb.
-wb = load_workbook(excelFilePath)
-# This list will be filled with the final element property value objects.
-elemPropertyValues = []
+# Streaming import: read the rows with a read-only iterator and write them chunk by chunk.
+if streamingImport:
+    # Load the excel file workbook as wb in read-only mode (the cells are read from the file when they are needed).
+    wb = load_workbook(excelFilePath, read_only=True)
+    for sheet in wb.worksheets:
+        StreamImportWorksheet(sheet)
+    # A read-only workbook keeps the file open until it is closed.
+    wb.close()
+# The original import: load the whole workbook and write all the values at once.
+else:
+    # Load the excel file workbook as wb.
+    wb = load_workbook(excelFilePath)
+    # This list will be filled with the final element property value objects.
+    elemPropertyValues = []
+    # The current values of the elements (element guid, property guid):property value, to compare the new values with.
+    currentValues = {}
 
-for sheet in wb.worksheets:
-	# Worksheet package doc.
-    # https://openpyxl.readthedocs.io/en/stable/api/openpyxl.worksheet.worksheet.html?highlight=max_worksheet
-	maxCol = sheet.max_column
-	maxRow = sheet.max_row
-	# All the data from the excel workbook will be inserted into this dictionary. 
-	newPropertyValues = {}
-	# element id list (from the excel workbook).
-	elementIds = []
-	# property id list (from the excel workbook).
-	propertyIds = []
-	# Loop through the columns from 2 to the last (maxCol).
-	for col in range (2, maxCol + 1):
-		# Append the propertyId guid converted by the uuid method
-        # from the string of the property id contained by the cell.
-		propertyIds.append(act.PropertyId(uuid.UUID(sheet.cell(1, col).value)))
-	# Loop through the rows from 3 to the last (maxRow).
-	for row in range (3, maxRow + 1):
-		# Get the rows in the excel workbook for the actual sheet into a dictionary.
-        # e.g. 0:{0:'a8138ba2-01da-4193-aa14-974e9ca78483', 1:'SW-001', 2:6, 3:0.3,	4:0.3}
-		newPropertyValues[row-3] = {col-2: sheet.cell(row, col).value for col in range (2, maxCol + 1)}
-        # Append the elementId guid converted by the uuid method
-        # from the string of the element id contained by the cell.
-		elementIds.append(act.ElementId(uuid.UUID(sheet.cell(row, 1).value)))
+    for sheet in wb.worksheets:
+        # The element ids, the property ids and the new values of the elements of the actual worksheet
+        # (see 'ReadWorksheetTable' in 'excel_tables.py').
+        elementIds, propertyIds, newValues = ReadWorksheetTable(sheet, act)
 
-    # Getting the property values of the elements based on the actual worksheet.
-	propertyValuesOfElements = acc.GetPropertyValuesOfElements(elementIds, propertyIds)
+        # Getting the property values of the elements based on the actual worksheet.
+        propertyValuesOfElements = acc.GetPropertyValuesOfElements(elementIds, propertyIds)
 
-    # Create a loop for the number of the element times.
-	for ii in range(len(newPropertyValues)):
-		# Create a loop for the number of the actual element's number of property times.
-		for jj in range(len(newPropertyValues[ii])):
-			# Try except block wouldn't be necessary.
-			try:
-                # Getting the property value directly from the 'propertyValuesOfElements' list.
-				propertyValue = propertyValuesOfElements[ii].propertyValues[jj].propertyValue
-                # Changing the old property value to the new one taking from the
-                # 'newPropertyValues' dictionary using the numeric indexes we gave as keys.
-				propertyValue.value = newPropertyValues[ii][jj]
-                # Give it a 'normal' status.
-				propertyValue.status = "normal"
-                # Finally using the elementsId for the actual element, propertyId of the actual property
-                # and the prepared property value create and append the element property value of the
-                # actual element actual property to the 'elemPropertyValues' list otside of the loops.
-				elemPropertyValues.append(act.ElementPropertyValue(elementIds[ii], propertyIds[jj], propertyValue))
-            # If something went wrong continue.
-			except:
-				continue
-# Set the created element property values to the corresponding elements in the Archicad project.
-acc.SetPropertyValuesOfElements(elemPropertyValues)	
+        # The new property values of the worksheet: a copy of the current property value of every cell
+        # changed to the new value with a 'normal' status (the cells of the properties not available for the element are skipped).
+        sheetPropertyValues, sheetCurrentValues = CreateNewPropertyValues(act, elementIds, propertyIds, newValues, propertyValuesOfElements)
+        elemPropertyValues.extend(sheetPropertyValues)
+        currentValues.update(sheetCurrentValues)
+    # Set the created element property values to the corresponding elements in the Archicad project.
+    # Only the values different from the current ones are written (see 'property_writer.py').
+    writeSummary = WriteChangedPropertyValues(session, elemPropertyValues, currentValues)
+    print(writeSummary)
 
-# original comment -> # Print the result
-# Get the element ids from the elemPropertyValues list.
-elementIds = [i.elementId for i in elemPropertyValues]
-# Get the property ids from a set (to get the unique guids only) generated from the 'lemPropertyValues' list.
-propertyIds = [act.PropertyId(guid) for guid in set(i.propertyId.guid for i in elemPropertyValues)]
-# Creae a property values dictionary from the elementids and propertyids.
-propertyValuesDictionary = acu.GetPropertyValuesDictionary(elementIds, propertyIds)
-# Loop through and taking each item of the 'propertyValuesDictionary'.
-for elementId, valuesDictionary in propertyValuesDictionary.items():
-	# For each element of the 'propertyValuesDictionary', loop through the values dictionary
-    # and take each property ids and values and print them onto the console.
-    for propertyId, value in valuesDictionary.items():
-        print(f"{elementId.guid} {propertyId.guid} {value}")
+    # original comment -> # Print the result
+    # Get the element ids from the elemPropertyValues list.
+    elementIds = [i.elementId for i in elemPropertyValues]
+    # Get the property ids from a set (to get the unique guids only) generated from the 'lemPropertyValues' list.
+    propertyIds = [act.PropertyId(guid) for guid in set(i.propertyId.guid for i in elemPropertyValues)]
+    # Creae a property values dictionary from the elementids and propertyids.
+    propertyValuesDictionary = acu.GetPropertyValuesDictionary(elementIds, propertyIds)
+    # Loop through and taking each item of the 'propertyValuesDictionary'.
+    for elementId, valuesDictionary in propertyValuesDictionary.items():
+        # For each element of the 'propertyValuesDictionary', loop through the values dictionary
+        # and take each property ids and values and print them onto the console.
+        for propertyId, value in valuesDictionary.items():
+            print(f"{elementId.guid} {propertyId.guid} {value}")
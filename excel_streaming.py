@@ -0,0 +1,78 @@
+# Import pickle and tempfile to keep the rows of the worksheet on the disk instead of the memory.
+import pickle, tempfile
+# Import islice to cut the chunks from any iterable (e.g. the rows of a read-only worksheet).
+from itertools import islice
+# Import typing not essential for the code.
+from typing import Any, Iterable, Iterator, List
+
+# Import get_column_letter from openpyxl to convert the column numbers to letters (1 -> 'A').
+# https://openpyxl.readthedocs.io/en/stable/api/openpyxl.utils.cell.html
+from openpyxl.utils import get_column_letter
+
+# This module contains the helpers of the streaming (memory-bounded) Excel export and import.
+#
+# openpyxl has a write-only mode: the rows are written into the file as they are appended,
+# so the workbook is never kept in the memory. The catch is that the column widths are written
+# before the first row, so they must be known before the rows are written.
+# The 'SpooledRows' class collects the rows chunk by chunk into a temporary file while it
+# tracks the column widths, then the rows can be read back and written into the worksheet.
+# This way only one chunk of rows is in the memory at the same time.
+
+
+# This function cuts a list (or any iterable) into smaller lists (chunks) with 'size' items.
+# The items are taken only when the next chunk is needed, so it works with iterators
+# (e.g. the rows of a read-only worksheet) without reading all of them.
+# Arguments: the list or iterable, the size of the chunks.
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# This class collects the rows of a worksheet into a temporary file and tracks the column widths.
+class SpooledRows:
+    def __init__(self):
+        # The temporary file is deleted when it is closed.
+        self._file = tempfile.TemporaryFile()
+        # The max string length of the values in every column.
+        self.columnWidths: List[int] = []
+        self.rowCount = 0
+
+    # Add a chunk of rows (list of lists) and update the column widths.
+    def AddRows(self, rows: List[List[Any]]):
+        for row in rows:
+            # Extend the widths list if this row is longer than the previous ones.
+            if len(row) > len(self.columnWidths):
+                self.columnWidths.extend([0] * (len(row) - len(self.columnWidths)))
+            for column, value in enumerate(row):
+                # The same as the 'AutoFitWorksheetColumns' function: the length of the string of the value.
+                self.columnWidths[column] = max(self.columnWidths[column], len(str(value)))
+        # One chunk is one pickle record in the file.
+        pickle.dump(rows, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.rowCount += len(rows)
+
+    # Read back the rows one by one in the same order as they were added.
+    def Rows(self) -> Iterator[List[Any]]:
+        self._file.seek(0)
+        while True:
+            try:
+                rows = pickle.load(self._file)
+            # The end of the file.
+            except EOFError:
+                return
+            yield from rows
+
+    # Close (and delete) the temporary file.
+    def Close(self):
+        self._file.close()
+
+
+# This function sets the column widths of a worksheet.
+# In a write-only worksheet this must be done before the first row is appended.
+# Arguments: worksheet, list of the widths (first item is column 'A').
+def SetColumnWidths(ws, columnWidths: List[int]):
+    for column, width in enumerate(columnWidths, start=1):
+        ws.column_dimensions[get_column_letter(column)].width = width
@@ -0,0 +1,249 @@
+# Import copy to copy the property values, uuid to read the guids of the cells.
+import copy, uuid
+# Import typing not essential for the code.
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Import get_column_letter from openpyxl to convert the column numbers to letters (1 -> 'A').
+# https://openpyxl.readthedocs.io/en/stable/api/openpyxl.utils.cell.html
+from openpyxl.utils import get_column_letter
+
+# Import the helpers of the streaming export and import.
+from excel_streaming import SpooledRows, SetColumnWidths, chunked
+
+# This module contains the worksheet logic of the Excel export and import scripts
+# ('excel_export_explained.py', 'excel_import_explained.py'): filling the worksheets with the property values
+# of the elements and reading the new values back from the worksheets.
+#
+# The functions get the Archicad types ('act') and the command functions as arguments, so they do not need
+# the connection and they can be run on any data (e.g. the synthetic project of 'synthetic_project.py').
+#
+# The table of a worksheet:
+#   row 1: the property ids (from the 2nd column),
+#   row 2: 'Element Guid' and the 'group name / property name' of the properties,
+#   from row 3: the element guid and the values of the properties of an element.
+
+
+# ----------------------------------------- Export -----------------------------------------
+
+# This function fit the cells to the longest value in the columns.
+def AutoFitWorksheetColumns(ws):
+    # Looping through the cells per column of each columns.
+    for columnCells in ws.columns:
+        # Getting the max string length of the filled cells using list comprehension.
+        length = max(len(str(cell.value)) for cell in columnCells)
+        # Setting the columns dimension to the max string length.
+        # https://www.geeksforgeeks.org/python-adjusting-rows-and-columns-of-an-excel-file-using-openpyxl-module/
+        # The column letter is getting the letter (string) index of the cell column instead of the number,
+        # this is the required parameter of the column_dimension method.
+        ws.column_dimensions[columnCells[0].column_letter].width = length
+
+
+# This function prints out the worksheet content into the console.
+def PrintWorksheetContent(ws):
+    # Looping through the columns.
+    for columnCells in ws.columns:
+        # Looping through the cells of the actual column.
+        for cell in columnCells:
+            # Print the worksheet title, the column letter, cell row number, cell value.
+            print(f"{ws.title}!{cell.column_letter}{cell.row}={cell.value}")
+
+
+# This is the main function to fill out the excel worksheets.
+# Arguments: worksheet, property ids, property definitions (details of the properties, same order as the ids),
+# the {element : {property id : value}} dictionary of the elements of the worksheet,
+# printContent: print the content of the worksheet into the console.
+def FillExcelWorksheetWithPropertyValuesOfElements(ws, propertyIds: List, propertyDefinitions: List,
+                                                   propertyValuesDictionary: Dict, printContent: bool = False):
+    # Zipping into a dictionary the propertyids with their definitions.
+    propertyDefinitionsDictionary = dict(zip(propertyIds, propertyDefinitions))
+
+    # Create the base table
+    # Cell in the row 2 and column 1 will have the value of 'Element Guid'
+    ws.cell(row=2, column=1).value = "Element Guid"
+    # Continue from row 3.
+    row = 3
+    # Loop through the propertyValuesDictionary and prepare, fill out the cells.
+    for element, valuesDictionary in propertyValuesDictionary.items():
+        # row 3 column 1 first element guid
+        ws.cell(row=row, column=1).value = str(element.elementId.guid)
+        # 'Go to' column 2
+        column = 2
+        # Loop through the valuesDictionary taking the ids, values and fill cells:
+        for propertyId, propertyValue in valuesDictionary.items():
+            # If the ctual row is 3 (at the beginning):
+            if row == 3:
+                # The cell of the row 1 and column 2 will be the actual property id.
+                ws.cell(row=1, column=column).value = str(propertyId.propertyId.guid)
+                # Getting the property definition for the actual propertiId.
+                propertyDefinition = propertyDefinitionsDictionary[propertyId]
+                # Row 2 column 3 write the 'group name / property definition name' string, e.g. 'General Parameters / Height'.
+                ws.cell(row=2, column=column).value = f"{propertyDefinition.group.name} / {propertyDefinition.name}"
+            # The actual row and column write the property value.
+            # For the first iteration these are: row 3 column 2.
+            ws.cell(row=row, column=column).value = propertyValue
+            # 'Go to' next column.
+            column += 1
+        # 'Go to' next row.
+        row += 1
+    # Fit the columns widths to the max length cell values, calling the 'AutoFitWorksheetColumns' function.
+    AutoFitWorksheetColumns(ws)
+    # Print worksheet content into the console, calling the 'PrintWorksheetContent' function.
+    if printContent:
+        PrintWorksheetContent(ws)
+
+
+# This is the streaming version of the 'FillExcelWorksheetWithPropertyValuesOfElements' function,
+# it creates the same tables in write-only worksheets.
+# The property values of the elements of all the worksheets are requested together in chunks
+# ('chunkSize' elements at a time, a chunk can contain elements of more worksheets),
+# the rows of every chunk are saved into the temporary file of their worksheet and the column widths are tracked
+# while the rows are created (see 'excel_streaming.py'). At the end the column widths are set and the rows
+# are written into the worksheets. Only one chunk of values is kept in the memory.
+# Arguments: worksheets (same order as the element lists), property ids, property definitions, element lists of the worksheets,
+# the function requesting the values of a chunk (e.g. acu.GetPropertyValuesDictionary), chunk size,
+# printContent: print the content of the worksheets into the console.
+def StreamExcelWorksheetsWithPropertyValuesOfElements(worksheets: List, propertyIds: List, propertyDefinitions: List,
+                                                      elementsOfWorksheets: List[List], getPropertyValuesDictionary: Callable,
+                                                      chunkSize: int, printContent: bool = False):
+    spooledRowsOfWorksheets = [SpooledRows() for ws in worksheets]
+    for spooledRows in spooledRowsOfWorksheets:
+        # The two header rows: the property ids and the 'group name / property definition name' strings.
+        spooledRows.AddRows([
+            [None] + [str(propertyId.propertyId.guid) for propertyId in propertyIds],
+            ["Element Guid"] + [f"{d.group.name} / {d.name}" for d in propertyDefinitions]
+        ])
+    # The elements of all the worksheets with the index of their worksheet.
+    worksheetIndicesAndElements = [(worksheetIndex, element) for worksheetIndex, elements in enumerate(elementsOfWorksheets) for element in elements]
+    # Request the property values chunk by chunk and add the rows of the elements to their worksheets.
+    for chunk in chunked(worksheetIndicesAndElements, chunkSize):
+        propertyValuesDictionary = getPropertyValuesDictionary([element for _, element in chunk], propertyIds)
+        rowsOfWorksheets = [[] for ws in worksheets]
+        for worksheetIndex, element in chunk:
+            valuesDictionary = propertyValuesDictionary[element]
+            rowsOfWorksheets[worksheetIndex].append([str(element.elementId.guid)] + [valuesDictionary.get(propertyId) for propertyId in propertyIds])
+        for spooledRows, rows in zip(spooledRowsOfWorksheets, rowsOfWorksheets):
+            if rows:
+                spooledRows.AddRows(rows)
+        # The values of the chunk are not needed any more.
+        del propertyValuesDictionary, rowsOfWorksheets
+
+    for ws, spooledRows in zip(worksheets, spooledRowsOfWorksheets):
+        # The column widths must be set before the first row is written into a write-only worksheet.
+        SetColumnWidths(ws, spooledRows.columnWidths)
+        # Write the rows into the worksheet (and print them into the console if it is required).
+        for rowIndex, row in enumerate(spooledRows.Rows(), start=1):
+            ws.append(row)
+            if printContent:
+                for column, value in enumerate(row, start=1):
+                    print(f"{ws.title}!{get_column_letter(column)}{rowIndex}={value}")
+        spooledRows.Close()
+
+
+# ----------------------------------------- Import -----------------------------------------
+
+# This function reads the table of a worksheet (the original import, every cell is read with 'sheet.cell').
+# Arguments: worksheet, the Archicad types (act).
+# Returns the element ids (from row 3), the property ids (from column 2) and the new values of the elements
+# (a list of the values in the order of the property ids for every element).
+def ReadWorksheetTable(sheet, types) -> Tuple[List, List, List[List]]:
+    # Worksheet package doc.
+    # https://openpyxl.readthedocs.io/en/stable/api/openpyxl.worksheet.worksheet.html?highlight=max_worksheet
+    maxCol = sheet.max_column
+    maxRow = sheet.max_row
+    # All the data from the excel workbook will be inserted into this list.
+    newValues = []
+    # element id list (from the excel workbook).
+    elementIds = []
+    # property id list (from the excel workbook).
+    propertyIds = []
+    # Loop through the columns from 2 to the last (maxCol).
+    for col in range (2, maxCol + 1):
+        # Append the propertyId guid converted by the uuid method
+        # from the string of the property id contained by the cell.
+        propertyIds.append(types.PropertyId(uuid.UUID(sheet.cell(1, col).value)))
+    # Loop through the rows from 3 to the last (maxRow).
+    for row in range (3, maxRow + 1):
+        # Get the values of the actual row in the excel workbook into a list.
+        # e.g. ['SW-001', 6, 0.3, 0.3]
+        newValues.append([sheet.cell(row, col).value for col in range (2, maxCol + 1)])
+        # Append the elementId guid converted by the uuid method
+        # from the string of the element id contained by the cell.
+        elementIds.append(types.ElementId(uuid.UUID(sheet.cell(row, 1).value)))
+    return elementIds, propertyIds, newValues
+
+
+# This function converts the rows of a chunk (from the 3rd row of the worksheet) to element ids and new values.
+# Arguments: rows (tuples of cell values, first cell is the element guid), number of the properties (columns),
+# the Archicad types (act).
+# Returns the list of element ids and the list of the new values of the elements (lists).
+# Empty rows and rows with invalid element guid are skipped.
+def convertRows(rows, propertyCount: int, types) -> Tuple[List, List[List]]:
+    elementIds = []
+    newValues = []
+    for row in rows:
+        # Empty row (e.g. formatted but empty rows at the end of the worksheet).
+        if not row or row[0] is None:
+            continue
+        try:
+            elementId = types.ElementId(uuid.UUID(str(row[0])))
+        except ValueError:
+            print(f"Skipped row with invalid element guid: {row[0]}")
+            continue
+        # The values of the properties, the missing cells at the end of the row are None.
+        values = list(row[1:propertyCount + 1])
+        values += [None] * (propertyCount - len(values))
+        elementIds.append(elementId)
+        newValues.append(values)
+    return elementIds, newValues
+
+
+# This function reads the table of a worksheet in chunks (the streaming import).
+# The rows are read with the read-only iterator of the worksheet and converted chunk by chunk.
+# Arguments: worksheet (a read-only worksheet), the Archicad types (act), number of rows in a chunk.
+# Returns the property ids and the iterator of the (element ids, new values) chunks, or None if the worksheet is empty.
+def ReadWorksheetTableInChunks(sheet, types, chunkSize: int) -> Optional[Tuple[List, Iterator[Tuple[List, List[List]]]]]:
+    # Read-only iterator of the rows, the values only.
+    rows = sheet.iter_rows(values_only=True)
+    # The first row contains the property ids (from the 2nd column).
+    header = next(rows, None)
+    if header is None:
+        return None
+    propertyCells = list(header[1:])
+    # Drop the empty cells at the end of the row.
+    while propertyCells and propertyCells[-1] is None:
+        propertyCells.pop()
+    propertyIds = [types.PropertyId(uuid.UUID(value)) for value in propertyCells]
+    # The second row contains the names of the properties, it is not needed.
+    next(rows, None)
+    # The chunks without any element are skipped.
+    chunks = (convertRows(rowsChunk, len(propertyIds), types) for rowsChunk in chunked(rows, chunkSize))
+    return propertyIds, ((elementIds, newValues) for elementIds, newValues in chunks if elementIds)
+
+
+# This function creates the new property values of the elements from their current values (same as the original import).
+# Arguments: the Archicad types (act), element ids, property ids, new values of the elements (lists in the order of the property ids),
+# the current values of the elements (the result of acc.GetPropertyValuesOfElements).
+# Returns the list of the 'ElementPropertyValue's and the (element guid, property guid):current property value dictionary
+# to compare the new values with (see 'WriteChangedPropertyValues' in 'property_writer.py').
+def CreateNewPropertyValues(types, elementIds: List, propertyIds: List, newValues: List[List],
+                            propertyValuesOfElements: List) -> Tuple[List, Dict]:
+    elemPropertyValues = []
+    currentValues = {}
+    for ii, values in enumerate(newValues):
+        for jj, value in enumerate(values):
+            try:
+                # Getting the property value directly from the 'propertyValuesOfElements' list.
+                currentValue = propertyValuesOfElements[ii].propertyValues[jj].propertyValue
+                # Changing a copy of the old property value to the new one and give it a 'normal' status.
+                # The old property value is kept to compare it with the new one.
+                propertyValue = copy.copy(currentValue)
+                propertyValue.value = value
+                propertyValue.status = "normal"
+                # The same keys as the 'getElementGuid' and 'getPropertyGuid' functions of 'archicad_session.py' give
+                # (this module does not import the session, so the benchmark runs without the archicad package).
+                currentValues[(str(elementIds[ii].guid), str(propertyIds[jj].guid))] = currentValue
+                elemPropertyValues.append(types.ElementPropertyValue(elementIds[ii], propertyIds[jj], propertyValue))
+            # The property is not available for the element (there is an 'error' instead of the value).
+            except (AttributeError, IndexError):
+                continue
+    return elemPropertyValues, currentValues
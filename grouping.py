@@ -0,0 +1,110 @@
+# Import string for the letters of the row names of the chairs.
+import string
+# Import typing not essential for the code.
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+# This module is the shared grouping engine of the numbering scripts
+# (zone numbering, parking space numbering, chair numbering).
+# The benchmark (see 'benchmark.py') runs the same functions, so it measures the code of the scripts.
+#
+# The scripts used to create the list of the levels (clusters) first and then for every level
+# and every row they looped through all the elements again to find the ones inside the actual
+# level or row. With many levels and rows this is almost quadratic.
+# Here the elements are sorted and cut into groups in one sweep instead: the elements of a group
+# are next to each other in the sorted order, so every element is visited only a few times
+# and the whole grouping is O(n log n).
+#
+# The functions work with element indices (positions in the 'elements' list of the scripts)
+# and plain float lists, so they do not need the Archicad connection.
+
+
+# Sort the elements by their position and cut the sorted list into groups.
+# A new group starts where the gap between two neighbouring positions is bigger than the limit
+# (this is the same rule as the 'createClusters' function of the scripts used).
+# Arguments: indices of the elements to group, positions of all the elements (e.g. zMin values),
+# tolerance limit.
+# Returns list of groups, each group is a list of element indices sorted by the position.
+def sweepClusters(indices: Iterable[int], positions: Sequence[float], limit: float) -> List[List[int]]:
+    # Sorting is done once, the groups are contiguous ranges of the sorted list.
+    order = sorted(indices, key=positions.__getitem__)
+    # If there is no elements nothing to group so return an empty list.
+    if not order:
+        return []
+    groups = []
+    currentGroup = [order[0]]
+    lastPos = positions[order[0]]
+    for index in order[1:]:
+        pos = positions[index]
+        # Still inside the tolerance, the element belongs to the actual group.
+        if pos - lastPos <= limit:
+            currentGroup.append(index)
+        # Else close the actual group and start a new one with this element.
+        else:
+            groups.append(currentGroup)
+            currentGroup = [index]
+        lastPos = pos
+    # The last group is not closed by the loop so append it here.
+    groups.append(currentGroup)
+    return groups
+
+
+# Group the elements into stories, the stories into rows and order the rows by the x position.
+# Arguments: xMin, yMin, zMin values of the elements (same order as the elements list),
+# story and row tolerance limits.
+# Returns list of stories (ordered by z), every story is a list of rows (ordered by y),
+# every row is a list of element indices ordered by x.
+def groupIntoStoriesAndRows(xPositions: Sequence[float], yPositions: Sequence[float], zPositions: Sequence[float],
+                            storyLimit: float, rowLimit: float) -> List[List[List[int]]]:
+    stories = []
+    # Every element is sorted once by z, once by y inside its story and once by x inside its row.
+    for story in sweepClusters(range(len(zPositions)), zPositions, storyLimit):
+        rows = sweepClusters(story, yPositions, rowLimit)
+        stories.append([sorted(row, key=xPositions.__getitem__) for row in rows])
+    return stories
+
+
+# Walk through the grouped stories and rows in one sweep and give every element its number.
+# Arguments: stories created by 'groupIntoStoriesAndRows',
+# alternateRows if True every second row is numbered from the opposite direction (right to left),
+# like the zones on the two sides of a corridor or the parking spaces on the two sides of a lane.
+# Yields tuples: (element index, story index starting from 0, element index on the story starting from 1).
+def numberStoriesAndRows(stories: List[List[List[int]]], alternateRows: bool = True) -> Iterator[Tuple[int, int, int]]:
+    for storyIndex, rows in enumerate(stories):
+        elemIndex = 1
+        for rowIndex, row in enumerate(rows):
+            # The odd rows are numbered in reverse order if it is required.
+            orderedRow = reversed(row) if alternateRows and rowIndex % 2 == 1 else row
+            for index in orderedRow:
+                yield index, storyIndex, elemIndex
+                elemIndex += 1
+
+
+# This function returns the name of a row: A, B, ..., Z, then AA, AB, ... (stadiums have more than 26 rows).
+def getRowName(rowIndex: int) -> str:
+    name = ''
+    rowIndex += 1
+    while rowIndex:
+        rowIndex, remainder = divmod(rowIndex - 1, 26)
+        name = string.ascii_uppercase[remainder] + name
+    return name
+
+
+# This function returns the names of the sections of a row from the number of the sections.
+# A row with one aisle has two sections, they are the 'Right' and 'Left' side,
+# the rows with more aisles (or without aisle) have the sections 'S1', 'S2', ... from the smallest x.
+def getSectionNames(sectionCount: int) -> List[str]:
+    if sectionCount == 2:
+        return ['Right', 'Left']
+    return [f'S{sectionIndex + 1}' for sectionIndex in range(sectionCount)]
+
+
+# Walk through the rows cut into sections at the aisles (see 'BoundingBoxArray.SplitAtGaps') and give the order
+# of numbering of every section (used by the chair numbering).
+# A row with one aisle is numbered from the aisle on both sides: the right side (smaller x) from the biggest x
+# (reversed order), the left side from the smallest x. The other sections are numbered from the smallest x.
+# Arguments: list of rows, every row is a list of sections, every section is a list of element indices sorted by x.
+# Yields tuples: (row index starting from 0, section name, element indices of the section in the order of numbering).
+def numberRowSections(rows: List[List[List[int]]]) -> Iterator[Tuple[int, str, List[int]]]:
+    for rowIndex, sections in enumerate(rows):
+        for section, sectionName in zip(sections, getSectionNames(len(sections))):
+            yield rowIndex, sectionName, list(reversed(section)) if sectionName == 'Right' else list(section)
@@ -0,0 +1,153 @@
+# Import json to estimate the payload sizes and to save the trace, time for the timings.
+import json, time
+# Import contextmanager to create the 'with instrumentation.Phase(name):' block.
+from contextlib import contextmanager
+# Import Lock because the queued commands are recorded from more threads.
+from threading import Lock
+# Import typing not essential for the code.
+from typing import Any, Callable, Dict, List, Optional
+
+# This module is the opt-in instrumentation of the Archicad API calls (see 'ArchicadSession' in 'archicad_session.py').
+#
+# The commands and utilities of the session are wrapped by an 'InstrumentedProxy' which records
+# every call: the name, the start time, the latency, the approximate size of the request and of the response
+# (the length of their JSON form) and the number of elements (the length of the first list argument
+# and of the result list). The local work of the scripts (e.g. 'cluster', 'fill workbook') can be recorded
+# as phases. The results are printed as a summary table and saved as a JSON trace.
+#
+# The sizes are estimated from the Python objects, not measured on the connection, so they are
+# close to the real HTTP payload but not exactly the same.
+
+
+# This function converts an Archicad type (or any object) to a JSON compatible form to estimate its size.
+# The Archicad types are converted by their attributes, the other objects (e.g. UUID) by their string form.
+def toJsonCompatible(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return [toJsonCompatible(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): toJsonCompatible(item) for key, item in value.items()}
+    if hasattr(value, '__dict__'):
+        return {key: toJsonCompatible(item) for key, item in vars(value).items() if not key.startswith('_')}
+    if hasattr(value, '__slots__'):
+        return {key: toJsonCompatible(getattr(value, key, None)) for key in value.__slots__}
+    return str(value)
+
+
+# This function returns the approximate size (bytes) of the JSON form of a value.
+def getPayloadSize(value: Any) -> int:
+    try:
+        return len(json.dumps(toJsonCompatible(value), separators=(',', ':')))
+    # A value which can not be converted is not counted.
+    except (TypeError, ValueError, RecursionError):
+        return 0
+
+
+# This function returns the number of elements of a call: the length of the first list argument
+# (e.g. the elements of 'GetPropertyValuesOfElements') or of the result list.
+def getElementCount(values) -> Optional[int]:
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            return len(value)
+    return None
+
+
+# This class collects the records of the calls and the phases.
+class Instrumentation:
+    def __init__(self, measurePayloads: bool = True):
+        # Estimating the payload sizes costs some time, it can be turned off.
+        self.measurePayloads = measurePayloads
+        self.records: List[Dict] = []
+        self._lock = Lock()
+        self._start = time.perf_counter()
+
+    # Add a record (from any thread).
+    def Record(self, kind: str, name: str, start: float, seconds: float, **details):
+        record = {'kind': kind, 'name': name, 'start': start - self._start, 'seconds': seconds}
+        record.update(details)
+        with self._lock:
+            self.records.append(record)
+
+    # Call a function and record the call.
+    def Call(self, kind: str, name: str, function: Callable, args, kwargs) -> Any:
+        start = time.perf_counter()
+        result = None
+        error = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        except Exception as exception:
+            error = repr(exception)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            details = {'requestElements': getElementCount(list(args) + list(kwargs.values())),
+                       'responseElements': getElementCount([result])}
+            if self.measurePayloads:
+                details['requestBytes'] = getPayloadSize([args, kwargs])
+                details['responseBytes'] = getPayloadSize(result)
+            if error:
+                details['error'] = error
+            self.Record(kind, name, start, seconds, **details)
+
+    # Record the local work in the 'with' block as a phase.
+    @contextmanager
+    def Phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.Record('phase', name, start, time.perf_counter() - start)
+
+    # Returns the summary of the records: (kind, name):{'calls', 'seconds', 'maxSeconds', ...}.
+    # The order is the order of the first call.
+    def Summary(self) -> Dict[tuple, Dict]:
+        summary = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            item = summary.setdefault((record['kind'], record['name']),
+                                      {'calls': 0, 'seconds': 0.0, 'maxSeconds': 0.0,
+                                       'requestBytes': 0, 'responseBytes': 0, 'elements': 0})
+            item['calls'] += 1
+            item['seconds'] += record['seconds']
+            item['maxSeconds'] = max(item['maxSeconds'], record['seconds'])
+            item['requestBytes'] += record.get('requestBytes') or 0
+            item['responseBytes'] += record.get('responseBytes') or 0
+            item['elements'] += record.get('requestElements') or record.get('responseElements') or 0
+        return summary
+
+    # Print the summary table to the console.
+    def PrintSummary(self):
+        print(f"{'kind':<8} {'name':<40} {'calls':>6} {'total s':>9} {'max ms':>9} {'req KB':>9} {'resp KB':>9} {'elements':>9}")
+        for (kind, name), item in self.Summary().items():
+            print(f"{kind:<8} {name[:40]:<40} {item['calls']:>6} {item['seconds']:>9.3f} {item['maxSeconds'] * 1000:>9.1f} "
+                  f"{item['requestBytes'] / 1024:>9.1f} {item['responseBytes'] / 1024:>9.1f} {item['elements']:>9}")
+
+    # Save all the records (the trace) into a JSON file.
+    def SaveTrace(self, path: str):
+        with self._lock:
+            records = list(self.records)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'records': records,
+                       'summary': [dict(kind=kind, name=name, **item) for (kind, name), item in self.Summary().items()]},
+                      file, indent=2)
+
+
+# This class wraps the commands or the utilities of the connection and records every call.
+# The other attributes (not callable) are given back as they are.
+class InstrumentedProxy:
+    def __init__(self, target, instrumentation: Instrumentation, kind: str):
+        self._target = target
+        self._instrumentation = instrumentation
+        self._kind = kind
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self._instrumentation.Call(self._kind, name, attribute, args, kwargs)
+        return call
@@ -0,0 +1,54 @@
+# Import typing not essential for the code.
+from typing import Callable, List
+
+# This module contains the navigator item tree helpers of the view map scripts.
+# The trees are walked with an explicit stack instead of recursion, so very deep
+# view maps do not reach the recursion limit of Python.
+
+
+# This function returns the children navigator items of a navigator item.
+# The 'children' of a 'NavigatorItem' are 'NavigatorItemArrayItem' wrappers (or None),
+# the navigator item itself is in their 'navigatorItem' attribute.
+def getChildren(item) -> List:
+    if not item.children:
+        return []
+    return [child.navigatorItem for child in item.children]
+
+
+# This function finds the topmost unused items of a navigator item tree.
+# Arguments: the root item of the tree,
+# isUsed: function returning True if the item itself is used (e.g. it is the source of a link),
+# isExcluded: function returning True if the item can not be listed as unused (e.g. our own folders),
+# the children of an excluded item are still checked.
+# An item is unused if neither the item nor any item below it is used.
+# Only the topmost unused items are returned (their children are not listed again),
+# in the same order as 'acu.FindInNavigatorItemTree' would list them.
+#
+# The tree is walked twice: once from the bottom to the top (post-order) to mark the subtrees
+# containing a used item, once from the top to stop at the first unused item of every branch.
+# Every item is visited twice, so the cost is linear in the size of the tree.
+def findTopmostUnusedItems(rootItem, isUsed: Callable, isExcluded: Callable) -> List:
+    # id of the item:True if the item or any item below it is used.
+    containsUsed = {}
+    # 1. Post-order walk: an item is marked after all of its children were marked.
+    stack = [(rootItem, False)]
+    while stack:
+        item, childrenMarked = stack.pop()
+        if not childrenMarked:
+            # Come back to this item when all its children are marked.
+            stack.append((item, True))
+            stack.extend((child, False) for child in getChildren(item))
+        else:
+            containsUsed[id(item)] = isUsed(item) or any(containsUsed[id(child)] for child in getChildren(item))
+
+    # 2. Pre-order walk: collect the first unused items from the top, do not go below them.
+    unusedItems = []
+    stack = [rootItem]
+    while stack:
+        item = stack.pop()
+        if not containsUsed[id(item)] and not isExcluded(item):
+            unusedItems.append(item)
+        else:
+            # Reversed, so the first child is taken from the stack first.
+            stack.extend(reversed(getChildren(item)))
+    return unusedItems
@@ -0,0 +1,154 @@
+# Import json to save the settings of the numbering with the state, os, tempfile and zipfile for the state file.
+import json, os, tempfile, zipfile
+# Import numpy for the vectorized comparison of the bounding boxes.
+# https://numpy.org/doc/stable/
+import numpy as np
+# Import typing not essential for the code.
+from typing import Callable, Dict, List, Optional
+
+# import the numpy bounding box array and the cluster ids of the stories
+from bounding_box_arrays import BoundingBoxArray, clusterIds
+# import the shared grouping engine to number the recomputed stories
+from grouping import numberStoriesAndRows
+
+# This module is the saved state of the zone numbering (see 'zone_numbering_explained.py').
+#
+# The numbering script groups every zone into stories and rows and numbers all of them on every run,
+# although between two runs usually only a few zones are added, deleted or moved.
+# The state keeps the bounding boxes, the stories and the numbers of the last run (by element guid),
+# and on the next run the new bounding boxes are compared with them on the whole arrays at once:
+# only the stories with an added, removed or moved zone (or with a changed story index) are grouped
+# and numbered again, the zones of the other stories keep their numbers and they are not written at all.
+#
+# The result is the same as the full numbering: a story is numbered only from its own zones,
+# so a story without any change gets the same numbers again.
+# The state is saved into a numpy .npz file, the settings of the numbering (limits, prefix, ...) are saved with it,
+# if they change the whole numbering is done again.
+
+
+# This function returns the lowercase guid string of an element (the archicad package and Archicad
+# do not use the same case).
+def getElementGuid(element) -> str:
+    return str(element.elementId.guid).lower()
+
+
+# This class is the numbering of the last run.
+# Arguments: guids (array of the lowercase guid strings), bounding boxes (number of zones x 6),
+# story index of every zone (-1 for the zones without bounding box), number of every zone ('' if there is none),
+# settings of the numbering (dictionary).
+class NumberingState:
+    def __init__(self, guids: np.ndarray, boxes: np.ndarray, storyIndices: np.ndarray, numbers: np.ndarray, settings: Dict):
+        self.guids = guids
+        self.boxes = boxes
+        self.storyIndices = storyIndices
+        self.numbers = numbers
+        self.settings = settings
+
+    # Save the state into a .npz file.
+    # The state is written into a temporary file in the same folder and then renamed to the path,
+    # so an interrupted save (Ctrl+C, killed batch worker) does not leave a truncated state file.
+    def Save(self, path: str):
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=folder, suffix='.tmp', delete=False) as file:
+            try:
+                np.savez(file, guids=self.guids.astype('S36'), boxes=self.boxes, storyIndices=self.storyIndices,
+                         numbers=self.numbers.astype(str), settings=np.array(json.dumps(self.settings, sort_keys=True)))
+            except BaseException:
+                file.close()
+                os.remove(file.name)
+                raise
+        os.replace(file.name, path)
+
+    # Load the state saved by 'Save'. Returns None if there is no state file or it can not be read.
+    @classmethod
+    def Load(cls, path: str) -> Optional['NumberingState']:
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data['guids'].astype(str), data['boxes'], data['storyIndices'], data['numbers'],
+                           json.loads(str(data['settings'])))
+        # An empty file raises EOFError, a truncated one BadZipFile.
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None
+
+
+# This class is the result of 'UpdateNumbering'.
+# numbers: the number of every zone ('' for the zones without bounding box),
+# recomputedIndices: the indices of the zones of the recomputed stories (their numbers have to be written),
+# recomputedStories / storyCount: the number of the recomputed stories and of all the stories,
+# state: the new state (to be saved after the write).
+class NumberingUpdate:
+    def __init__(self, numbers: np.ndarray, recomputedIndices: List[int], recomputedStories: int, storyCount: int, state: NumberingState):
+        self.numbers = numbers
+        self.recomputedIndices = recomputedIndices
+        self.recomputedStories = recomputedStories
+        self.storyCount = storyCount
+        self.state = state
+
+    def __str__(self) -> str:
+        return (f"Numbering: {self.recomputedStories} of {self.storyCount} stories recomputed, "
+                f"{len(self.recomputedIndices)} of {len(self.numbers)} zones renumbered")
+
+
+# This function returns True for the rows of the two arrays which are the same (NaN is equal to NaN).
+def sameRows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return ((a == b) | (np.isnan(a) & np.isnan(b))).all(axis=1)
+
+
+# This function numbers the zones, only the stories changed since the last run ('state') are grouped and numbered again.
+# Arguments: the guids of the zones (see 'getElementGuid'), their bounding boxes, the state of the last run (or None),
+# story and row tolerance limits, the function creating the number of a zone from the story index and the index
+# on the story (e.g. 'GeneratePropertyValueString'), settings of the numbering (if they are not the same as the
+# settings of the state the whole numbering is done again), alternateRows (see 'numberStoriesAndRows').
+# Returns a 'NumberingUpdate'.
+def UpdateNumbering(guids: List[str], boxes: BoundingBoxArray, state: Optional[NumberingState], storyLimit: float, rowLimit: float,
+                    numberFunction: Callable[[int, int], str], settings: Dict, alternateRows: bool = True) -> NumberingUpdate:
+    guids = np.array(guids, dtype=str)
+    valid = boxes.IsValid()
+    # The story index of every zone: the stories are the clusters of zMin, counted from the lowest one
+    # (the same stories as 'GroupIntoStoriesAndRows' gives).
+    storyIndices = np.full(len(guids), -1, dtype=np.int64)
+    storyIndices[valid] = clusterIds(boxes.Column('zMin')[valid], storyLimit)
+    storyCount = int(storyIndices.max()) + 1 if valid.any() else 0
+    numbers = np.full(len(guids), '', dtype=object)
+
+    # Without a usable state every story is recomputed.
+    if state is None or state.settings != json.loads(json.dumps(settings, sort_keys=True)):
+        changedStories = np.ones(storyCount, dtype=bool)
+    else:
+        # The row of every zone in the state (-1 for the new zones), found by sorting the guids of the state once.
+        order = np.argsort(state.guids)
+        positions = np.searchsorted(state.guids, guids, sorter=order).clip(0, max(len(order) - 1, 0))
+        oldRows = order[positions] if len(order) else np.zeros(len(guids), dtype=np.int64)
+        found = (state.guids[oldRows] == guids) if len(order) else np.zeros(len(guids), dtype=bool)
+        oldRows = np.where(found, oldRows, -1)
+        # A zone is changed if it is new, it was moved (or resized) or its story index is not the same.
+        keptRows = oldRows[found]
+        changed = ~found
+        changed[found] = ~sameRows(boxes.data[found], state.boxes[keptRows]) | (state.storyIndices[keptRows] != storyIndices[found])
+        changedStories = np.zeros(storyCount, dtype=bool)
+        changedStories[storyIndices[changed & valid]] = True
+        # A story is changed too if a zone was removed from it (deleted, or moved to another story):
+        # the zones of the old story are fewer now.
+        oldCounts = np.bincount(state.storyIndices[state.storyIndices >= 0], minlength=storyCount)[:storyCount]
+        keptCounts = np.bincount(storyIndices[valid & ~changed], minlength=storyCount)
+        changedStories |= oldCounts != keptCounts
+        # The numbers of the unchanged stories are the numbers of the state.
+        # (only the rows with a story index are looked up, 'changedStories' is empty if no zone has a bounding box).
+        unchanged = np.flatnonzero(valid & found)
+        unchanged = unchanged[~changedStories[storyIndices[unchanged]]]
+        numbers[unchanged] = state.numbers[oldRows[unchanged]]
+
+    # Group and number the zones of the changed stories only. The changed stories are separated by more than the
+    # story limit, so their zones are grouped into the same stories as they are in the whole project.
+    recomputedStoryIndices = np.flatnonzero(changedStories)
+    recomputedIndices = np.flatnonzero(valid)
+    recomputedIndices = recomputedIndices[changedStories[storyIndices[recomputedIndices]]]
+    stories = BoundingBoxArray(boxes.data[recomputedIndices]).GroupIntoStoriesAndRows(storyLimit, rowLimit)
+    for (index, storyIndex, elemIndex) in numberStoriesAndRows(stories, alternateRows):
+        numbers[recomputedIndices[index]] = numberFunction(int(recomputedStoryIndices[storyIndex]), elemIndex)
+
+    newState = NumberingState(guids, boxes.data.copy(), storyIndices, numbers.astype(str), settings)
+    return NumberingUpdate(numbers, recomputedIndices.tolist(), len(recomputedStoryIndices), storyCount, newState)
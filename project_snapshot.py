@@ -0,0 +1,588 @@
+# Import argparse for the command line options, json for the answers, os for the files,
+# threading for the lock and the server thread, time for the creation date, uuid for the created navigator items.
+import argparse, atexit, json, os, threading, time, uuid
+# Import the HTTP server of the standard library to answer the requests of the scripts from the snapshot.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# Import urllib to send the JSON API requests of the export and of the snapshot connection.
+from urllib.request import Request, urlopen
+# Import typing not essential for the code.
+from typing import Dict, List, Optional
+# import handle_dependencies to check the numpy module
+from archicad import handle_dependencies
+
+# Check if the numpy is importable (installed) if not returns an error
+handle_dependencies('numpy')
+
+# Import numpy for the columnar files of the snapshot.
+import numpy as np
+
+# This module saves a snapshot of the project into a folder and answers the Archicad commands from it,
+# so the read-only analysis of the scripts (element ID conflicts, room report, zone dimensions, unused views, ...)
+# can run without a running Archicad (e.g. on a build server), and it does not block the designers' Archicad.
+#
+# Export (Archicad must be running with the project):
+#   python project_snapshot.py export "Office A.snapshot" [--port 19723] [--properties General_ElementID ...]
+# Run a script on the snapshot:
+#   ARCHICAD_SNAPSHOT="Office A.snapshot" python elementID_conflict_explained.py
+#
+# The snapshot is columnar, one row per element:
+#   elements.npy       the element guids
+#   types.npy          the element types
+#   boxes3D.npy        xMin, yMin, zMin, xMax, yMax, zMax (NaN if there is no bounding box)
+#   boxes2D.npy        xMin, yMin, xMax, yMax
+#   classifications.npy  the classification item of every system (index into the items of the manifest, -1: none)
+#   property<n>.*.npy  the values of a property (JSON strings packed into one byte array with the offsets of the rows)
+#   zoneRelations.*.npy  the related elements of the zones (element rows with the offsets of the zones)
+#   manifest.json      the product info, the properties, the classification systems and trees, the navigator trees
+# The arrays are memory-mapped when the snapshot is loaded, only the rows used by the commands are read.
+#
+# The scripts connect with 'OpenSession' (see 'archicad_session.py'): if the 'ARCHICAD_SNAPSHOT' environment variable
+# is set, the commands of the archicad package are sent to the snapshot instead of Archicad (a local server of the
+# snapshot on a free port answers them the same way as Archicad does), so the scripts get the same objects
+# and they do not change.
+# The writes (property values, navigator items) are dry-runs: they succeed but nothing is written into Archicad,
+# the written property values are kept in the memory so the scripts read them back.
+
+################################ CONFIGURATION #################################
+# The properties saved into the snapshot by default (the properties used by the scripts).
+SNAPSHOT_PROPERTIES = [
+    {"type": "BuiltIn", "nonLocalizedName": "General_ElementID"},
+    {"type": "BuiltIn", "nonLocalizedName": "General_LibraryPartName"},
+    {"type": "BuiltIn", "nonLocalizedName": "General_Height"},
+    {"type": "BuiltIn", "nonLocalizedName": "General_Width"},
+    {"type": "BuiltIn", "nonLocalizedName": "General_Thickness"},
+    {"type": "BuiltIn", "nonLocalizedName": "General_NetVolume"},
+    {"type": "BuiltIn", "nonLocalizedName": "Zone_ZoneNumber"},
+    {"type": "BuiltIn", "nonLocalizedName": "Zone_ZoneName"},
+    {"type": "BuiltIn", "nonLocalizedName": "Zone_ZoneCategoryCode"},
+    {"type": "BuiltIn", "nonLocalizedName": "Zone_NetArea"},
+    {"type": "UserDefined", "localizedName": ["ZONES", "Zone Overall"]},
+    {"type": "UserDefined", "localizedName": ["ZONES", "Temperature Requirement"]},
+    {"type": "UserDefined", "localizedName": ["ZONES", "Illuminance Requirement"]},
+    {"type": "UserDefined", "localizedName": ["WINDOW RATE (Expression)", "Window rate calculated"]},
+]
+# The element types requested one by one if the 'GetAllElements' command is not available.
+ELEMENT_TYPES = ['Wall', 'Column', 'Beam', 'Window', 'Door', 'Object', 'Lamp', 'Slab', 'Roof', 'Mesh', 'Zone',
+                 'CurtainWall', 'Shell', 'Skylight', 'Morph', 'Stair', 'Railing', 'Opening']
+# The number of elements sent in one request of the export.
+CHUNK_SIZE = 5000
+# The time limit (seconds) of a request of the export.
+REQUEST_TIMEOUT = 600
+# The error code of the answers for the items not in the snapshot.
+SNAPSHOT_ERROR_CODE = 4001
+################################################################################
+
+
+# ----------------------------------------- Columns -----------------------------------------
+
+# This function saves a list of strings as a column: the UTF-8 bytes of the strings in one array
+# and the offsets of the strings (the string of row i is data[offsets[i]:offsets[i + 1]]).
+def saveStringColumn(folder: str, name: str, strings: List[str]):
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    np.save(os.path.join(folder, name + '.offsets.npy'), offsets)
+    np.save(os.path.join(folder, name + '.data.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+
+# This function loads an array memory-mapped (an empty array can not be mapped, it is loaded).
+def loadArray(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        return np.load(path)
+
+
+# This class is a column saved by 'saveStringColumn', the strings are decoded when they are used.
+class StringColumn:
+    def __init__(self, folder: str, name: str):
+        self.offsets = loadArray(os.path.join(folder, name + '.offsets.npy'))
+        self.data = loadArray(os.path.join(folder, name + '.data.npy'))
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode('utf-8')
+
+
+# This function returns the comparable key of a property user id (JSON form): ('BuiltIn', name) or ('UserDefined', group, name).
+def getPropertyUserIdKey(propertyUserId: Dict) -> tuple:
+    if propertyUserId.get('type') == 'BuiltIn':
+        return ('BuiltIn', propertyUserId.get('nonLocalizedName'))
+    return ('UserDefined',) + tuple(propertyUserId.get('localizedName') or ())
+
+
+# This function returns an error item of the answers.
+def snapshotError(message: str) -> Dict:
+    return {"error": {"code": SNAPSHOT_ERROR_CODE, "message": message}}
+
+
+# ----------------------------------------- Export -----------------------------------------
+
+# This function sends a JSON API command to the Archicad on the port and returns the 'result' of the answer.
+# An unsuccessful command raises a RuntimeError with the error of the answer.
+def sendCommand(port: int, command: str, parameters: Optional[Dict] = None) -> Dict:
+    request = Request(f"http://127.0.0.1:{port}", headers={'Content-Type': 'application/json'})
+    body = {"command": command}
+    if parameters is not None:
+        body["parameters"] = parameters
+    with urlopen(request, json.dumps(body).encode('utf-8'), timeout=REQUEST_TIMEOUT) as response:
+        answer = json.loads(response.read())
+    if not answer.get("succeeded"):
+        raise RuntimeError(f"{command}: {answer.get('error')}")
+    return answer.get("result") or {}
+
+
+# This function sends a command with the elements in chunks and returns the joined list of the results.
+# Arguments: port, command, name of the elements parameter, the elements, name of the result list, other parameters.
+def sendInChunks(port: int, command: str, elementsName: str, elements: List, resultName: str, **parameters) -> List:
+    results = []
+    for start in range(0, len(elements), CHUNK_SIZE):
+        results.extend(sendCommand(port, command, dict(parameters, **{elementsName: elements[start:start + CHUNK_SIZE]}))[resultName])
+    return results
+
+
+# This function returns the port of the Archicad: the given one, the 'ARCHICAD_PORT' environment variable
+# or the first running Archicad.
+def findPort(port: Optional[int] = None) -> int:
+    if port or os.environ.get('ARCHICAD_PORT'):
+        return port or int(os.environ['ARCHICAD_PORT'])
+    for candidate in range(19723, 19744):
+        try:
+            sendCommand(candidate, "API.IsAlive")
+            return candidate
+        except (OSError, RuntimeError):
+            continue
+    raise ConnectionError("There is no running Archicad")
+
+
+# This function saves the snapshot of the project open in Archicad into the folder.
+# Arguments: the folder, the port of the Archicad (optional), the property user ids (JSON form) of the saved properties.
+def ExportSnapshot(folder: str, port: Optional[int] = None, propertyUserIds: Optional[List[Dict]] = None):
+    port = findPort(port)
+    propertyUserIds = SNAPSHOT_PROPERTIES if propertyUserIds is None else propertyUserIds
+    os.makedirs(folder, exist_ok=True)
+    manifest = {"format": 1, "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "productInfo": sendCommand(port, "API.GetProductInfo")}
+    # The project info is available with the Tapir add-on only.
+    try:
+        manifest["projectInfo"] = sendCommand(port, "API.ExecuteAddOnCommand", {
+            "addOnCommandId": {"commandNamespace": "TapirCommand", "commandName": "GetProjectInfo"},
+            "addOnCommandParameters": {}}).get("addOnCommandResponse")
+    except RuntimeError:
+        manifest["projectInfo"] = None
+
+    # The elements and their types.
+    try:
+        elements = sendCommand(port, "API.GetAllElements")["elements"]
+    except RuntimeError:
+        elements = [element for elementType in ELEMENT_TYPES
+                    for element in sendCommand(port, "API.GetElementsByType", {"elementType": elementType})["elements"]]
+    guids = [element["elementId"]["guid"].lower() for element in elements]
+    rowOfGuid = {guid: row for row, guid in enumerate(guids)}
+    manifest["elementCount"] = len(guids)
+    np.save(os.path.join(folder, 'elements.npy'), np.array(guids, dtype='S36'))
+    types = sendInChunks(port, "API.GetTypesOfElements", "elements", elements, "typesOfElements")
+    np.save(os.path.join(folder, 'types.npy'), np.array([item.get("typeOfElement", {}).get("elementType", "") for item in types], dtype='S32'))
+
+    # The bounding boxes, NaN for the elements without bounding box.
+    boxes3D = sendInChunks(port, "API.Get3DBoundingBoxes", "elements", elements, "boundingBoxes3D")
+    np.save(os.path.join(folder, 'boxes3D.npy'), np.array(
+        [[box[key] for key in ('xMin', 'yMin', 'zMin', 'xMax', 'yMax', 'zMax')] if box else [np.nan] * 6
+         for box in (item.get("boundingBox3D") for item in boxes3D)], dtype=np.float64).reshape(-1, 6))
+    boxes2D = sendInChunks(port, "API.Get2DBoundingBoxes", "elements", elements, "boundingBoxes2D")
+    np.save(os.path.join(folder, 'boxes2D.npy'), np.array(
+        [[box[key] for key in ('xMin', 'yMin', 'xMax', 'yMax')] if box else [np.nan] * 4
+         for box in (item.get("boundingBox2D") for item in boxes2D)], dtype=np.float64).reshape(-1, 4))
+
+    # The classification systems, their trees and the classification of the elements in every system.
+    systems = sendCommand(port, "API.GetAllClassificationSystems")["classificationSystems"]
+    manifest["classificationSystems"] = systems
+    manifest["classificationTrees"] = {
+        system["classificationSystemId"]["guid"].lower(): sendCommand(port, "API.GetAllClassificationsInSystem", {
+            "classificationSystemId": system["classificationSystemId"]})["classificationItems"] for system in systems}
+    itemGuids = []
+    classifications = np.full((len(guids), len(systems)), -1, dtype=np.int32)
+    if systems:
+        elementClassifications = sendInChunks(port, "API.GetClassificationsOfElements", "elements", elements, "elementClassifications",
+                                              classificationSystemIds=[{"classificationSystemId": system["classificationSystemId"]} for system in systems])
+        indexOfItem = {}
+        for row, item in enumerate(elementClassifications):
+            for column, classification in enumerate(item.get("classificationIds") or []):
+                itemId = (classification.get("classificationId") or {}).get("classificationItemId")
+                if itemId:
+                    classifications[row, column] = indexOfItem.setdefault(itemId["guid"].lower(), len(indexOfItem))
+        itemGuids = list(indexOfItem)
+    manifest["classificationItems"] = itemGuids
+    np.save(os.path.join(folder, 'classifications.npy'), classifications)
+
+    # The properties: the property ids, their details and the values of every element (one column per property).
+    propertyIds = sendCommand(port, "API.GetPropertyIds", {"properties": propertyUserIds})["properties"]
+    properties = [(userId, item["propertyId"]) for userId, item in zip(propertyUserIds, propertyIds) if "propertyId" in item]
+    definitions = sendCommand(port, "API.GetDetailsOfProperties", {"properties": [{"propertyId": propertyId} for _, propertyId in properties]})["propertyDefinitions"] if properties else []
+    propertyValues = sendInChunks(port, "API.GetPropertyValuesOfElements", "elements", elements, "propertyValuesForElements",
+                                  properties=[{"propertyId": propertyId} for _, propertyId in properties]) if properties else []
+    manifest["properties"] = []
+    for column, ((userId, propertyId), definition) in enumerate(zip(properties, definitions)):
+        saveStringColumn(folder, f'property{column}', [
+            json.dumps(item["propertyValues"][column] if "propertyValues" in item else {"error": item.get("error")}, separators=(',', ':'))
+            for item in propertyValues])
+        manifest["properties"].append({"userId": userId, "propertyId": {"guid": propertyId["guid"].lower()},
+                                       "definition": definition, "column": f'property{column}'})
+
+    # The related elements of the zones (all types, the types are filtered when they are requested).
+    zoneRows = [row for row, item in enumerate(types) if item.get("typeOfElement", {}).get("elementType") == 'Zone']
+    relatedElements = sendInChunks(port, "API.GetElementsRelatedToZones", "zones", [elements[row] for row in zoneRows], "elementsRelatedToZones")
+    relatedRows = [[rowOfGuid[element["elementId"]["guid"].lower()] for element in item.get("elements") or []
+                    if element["elementId"]["guid"].lower() in rowOfGuid] for item in relatedElements]
+    np.save(os.path.join(folder, 'zoneRelations.zones.npy'), np.array(zoneRows, dtype=np.int64))
+    offsets = np.zeros(len(relatedRows) + 1, dtype=np.int64)
+    np.cumsum([len(rows) for rows in relatedRows], out=offsets[1:])
+    np.save(os.path.join(folder, 'zoneRelations.offsets.npy'), offsets)
+    np.save(os.path.join(folder, 'zoneRelations.elements.npy'), np.array([row for rows in relatedRows for row in rows], dtype=np.int64))
+
+    # The navigator trees (the trees not available in the version are left out).
+    try:
+        manifest["publisherSetNames"] = sendCommand(port, "API.GetPublisherSetNames")["publisherSetNames"]
+    except RuntimeError:
+        manifest["publisherSetNames"] = []
+    manifest["navigatorTrees"] = []
+    for treeId in [{"type": "ProjectMap"}, {"type": "ViewMap"}, {"type": "LayoutBook"}] + \
+                  [{"type": "PublisherSets", "name": name} for name in manifest["publisherSetNames"]]:
+        try:
+            manifest["navigatorTrees"].append({"navigatorTreeId": treeId,
+                                               "navigatorTree": sendCommand(port, "API.GetNavigatorItemTree", {"navigatorTreeId": treeId})["navigatorTree"]})
+        except RuntimeError:
+            continue
+
+    with open(os.path.join(folder, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+    return manifest
+
+
+# ----------------------------------------- Replay -----------------------------------------
+
+# This class is a loaded snapshot, it answers the JSON API commands (the same requests and answers as Archicad).
+class ProjectSnapshot:
+    def __init__(self, folder: str):
+        self.folder = folder
+        with open(os.path.join(folder, 'manifest.json'), encoding='utf-8') as file:
+            self.manifest = json.load(file)
+        self.guids = loadArray(os.path.join(folder, 'elements.npy'))
+        self.types = loadArray(os.path.join(folder, 'types.npy'))
+        self.boxes3D = loadArray(os.path.join(folder, 'boxes3D.npy'))
+        self.boxes2D = loadArray(os.path.join(folder, 'boxes2D.npy'))
+        self.classifications = loadArray(os.path.join(folder, 'classifications.npy'))
+        self.zoneRows = loadArray(os.path.join(folder, 'zoneRelations.zones.npy'))
+        self.zoneOffsets = loadArray(os.path.join(folder, 'zoneRelations.offsets.npy'))
+        self.zoneElements = loadArray(os.path.join(folder, 'zoneRelations.elements.npy'))
+        # property guid:(property, column).
+        self.properties = {item["propertyId"]["guid"]: (item, StringColumn(folder, item["column"])) for item in self.manifest["properties"]}
+        self.propertyOfUserId = {getPropertyUserIdKey(item["userId"]): item for item in self.manifest["properties"]}
+        self.systemColumns = {system["classificationSystemId"]["guid"].lower(): column
+                              for column, system in enumerate(self.manifest["classificationSystems"])}
+        self.indexOfItem = {guid: index for index, guid in enumerate(self.manifest["classificationItems"])}
+        self.navigatorTrees = {json.dumps(item["navigatorTreeId"], sort_keys=True): item["navigatorTree"] for item in self.manifest["navigatorTrees"]}
+        # The dictionaries built at the first use (see 'rowOfGuid' and 'classificationItemDetails').
+        self._rowOfGuid = None
+        self._classificationItemDetails = None
+        self._lock = threading.Lock()
+        # The dry-run writes: (row, property guid):property value item, and the number of the writes by command.
+        self.writtenValues: Dict[tuple, Dict] = {}
+        self.dryRunWrites: Dict[str, int] = {}
+
+    # Returns the dictionary of element guid:row (built at the first use).
+    def rowOfGuid(self) -> Dict[str, int]:
+        with self._lock:
+            if self._rowOfGuid is None:
+                self._rowOfGuid = {guid.decode('ascii'): row for row, guid in enumerate(self.guids.tolist())}
+        return self._rowOfGuid
+
+    # Returns the rows of the elements (JSON form), None for the elements not in the snapshot.
+    def rowsOfElements(self, elements: List[Dict]) -> List[Optional[int]]:
+        rowOfGuid = self.rowOfGuid()
+        return [rowOfGuid.get(element["elementId"]["guid"].lower()) for element in elements]
+
+    # Returns the elements (JSON form) of the rows.
+    def elementsOfRows(self, rows) -> List[Dict]:
+        return [{"elementId": {"guid": self.guids[row].decode('ascii')}} for row in rows]
+
+    # Returns the dictionary of classification item guid:details (without the children, built at the first use).
+    def classificationItemDetails(self) -> Dict[str, Dict]:
+        with self._lock:
+            if self._classificationItemDetails is None:
+                details = {}
+                stack = [item["classificationItem"] for items in self.manifest["classificationTrees"].values() for item in items]
+                while stack:
+                    item = stack.pop()
+                    details[item["classificationItemId"]["guid"].lower()] = {key: value for key, value in item.items() if key != 'children'}
+                    stack.extend(child["classificationItem"] for child in item.get("children") or [])
+                self._classificationItemDetails = details
+        return self._classificationItemDetails
+
+    # Count a dry-run write.
+    def _recordDryRun(self, command: str, count: int = 1):
+        with self._lock:
+            self.dryRunWrites[command] = self.dryRunWrites.get(command, 0) + count
+
+    # Returns the answer of a JSON API request: {"succeeded": True, "result": ...} or {"succeeded": False, "error": ...}.
+    # Every command is answered by the 'answer<command name>' function.
+    def Answer(self, request: Dict) -> Dict:
+        command = request.get("command") or ''
+        function = getattr(self, 'answer' + command[len('API.'):], None) if command.startswith('API.') else None
+        if function is None:
+            return {"succeeded": False, "error": snapshotError(f"The command is not available in the snapshot: {command}")["error"]}
+        try:
+            return {"succeeded": True, "result": function(request.get("parameters") or {})}
+        # A missing item of the snapshot (e.g. a navigator tree which was not saved) is an unsuccessful command.
+        except (KeyError, IndexError) as error:
+            return {"succeeded": False, "error": snapshotError(f"Not in the snapshot: {error}")["error"]}
+        # Any other failure of the answer (e.g. parameters the snapshot can not handle) is an unsuccessful command too,
+        # the script gets it as an error of the command instead of a broken connection.
+        except Exception as error:
+            return {"succeeded": False, "error": snapshotError(f"The snapshot could not answer {command}: {error!r}")["error"]}
+
+    def answerIsAlive(self, parameters):
+        return {"isAlive": True}
+
+    def answerGetProductInfo(self, parameters):
+        return self.manifest["productInfo"]
+
+    def answerExecuteAddOnCommand(self, parameters):
+        commandId = parameters.get("addOnCommandId") or {}
+        if commandId.get("commandName") == 'GetProjectInfo' and self.manifest.get("projectInfo"):
+            return {"addOnCommandResponse": self.manifest["projectInfo"]}
+        raise KeyError(commandId)
+
+    def answerGetAllElements(self, parameters):
+        return {"elements": self.elementsOfRows(range(len(self.guids)))}
+
+    def answerGetElementsByType(self, parameters):
+        return {"elements": self.elementsOfRows(np.flatnonzero(self.types == parameters["elementType"].encode('ascii')))}
+
+    def answerGetElementsByClassification(self, parameters):
+        index = self.indexOfItem.get(parameters["classificationItemId"]["guid"].lower())
+        rows = np.flatnonzero((self.classifications == index).any(axis=1)) if index is not None else []
+        return {"elements": self.elementsOfRows(rows)}
+
+    def answerGetTypesOfElements(self, parameters):
+        return {"typesOfElements": [{"typeOfElement": {"elementType": self.types[row].decode('ascii')}} if row is not None
+                                    else snapshotError("The element is not in the snapshot")
+                                    for row in self.rowsOfElements(parameters["elements"])]}
+
+    def answerGet3DBoundingBoxes(self, parameters):
+        boxes = []
+        for row in self.rowsOfElements(parameters["elements"]):
+            if row is None or np.isnan(self.boxes3D[row]).any():
+                boxes.append(snapshotError("There is no bounding box of the element"))
+            else:
+                boxes.append({"boundingBox3D": dict(zip(('xMin', 'yMin', 'zMin', 'xMax', 'yMax', 'zMax'), self.boxes3D[row].tolist()))})
+        return {"boundingBoxes3D": boxes}
+
+    def answerGet2DBoundingBoxes(self, parameters):
+        boxes = []
+        for row in self.rowsOfElements(parameters["elements"]):
+            if row is None or np.isnan(self.boxes2D[row]).any():
+                boxes.append(snapshotError("There is no bounding box of the element"))
+            else:
+                boxes.append({"boundingBox2D": dict(zip(('xMin', 'yMin', 'xMax', 'yMax'), self.boxes2D[row].tolist()))})
+        return {"boundingBoxes2D": boxes}
+
+    def answerGetPropertyIds(self, parameters):
+        properties = []
+        for propertyUserId in parameters["properties"]:
+            property = self.propertyOfUserId.get(getPropertyUserIdKey(propertyUserId))
+            properties.append({"propertyId": property["propertyId"]} if property else snapshotError("The property is not in the snapshot"))
+        return {"properties": properties}
+
+    def answerGetDetailsOfProperties(self, parameters):
+        return {"propertyDefinitions": [self.properties[item["propertyId"]["guid"].lower()][0]["definition"]
+                                        if item["propertyId"]["guid"].lower() in self.properties
+                                        else snapshotError("The property is not in the snapshot") for item in parameters["properties"]]}
+
+    def answerGetPropertyValuesOfElements(self, parameters):
+        propertyGuids = [item["propertyId"]["guid"].lower() for item in parameters["properties"]]
+        results = []
+        for row in self.rowsOfElements(parameters["elements"]):
+            if row is None:
+                results.append(snapshotError("The element is not in the snapshot"))
+                continue
+            values = []
+            for propertyGuid in propertyGuids:
+                written = self.writtenValues.get((row, propertyGuid))
+                if written is not None:
+                    values.append(written)
+                elif propertyGuid in self.properties:
+                    values.append(json.loads(self.properties[propertyGuid][1][row]))
+                else:
+                    values.append(snapshotError("The property is not in the snapshot"))
+            results.append({"propertyValues": values})
+        return {"propertyValuesForElements": results}
+
+    def answerGetAllClassificationSystems(self, parameters):
+        return {"classificationSystems": self.manifest["classificationSystems"]}
+
+    def answerGetAllClassificationsInSystem(self, parameters):
+        return {"classificationItems": self.manifest["classificationTrees"].get(parameters["classificationSystemId"]["guid"].lower(), [])}
+
+    def answerGetClassificationsOfElements(self, parameters):
+        systemIds = [item["classificationSystemId"] for item in parameters["classificationSystemIds"]]
+        results = []
+        for row in self.rowsOfElements(parameters["elements"]):
+            if row is None:
+                results.append(snapshotError("The element is not in the snapshot"))
+                continue
+            classificationIds = []
+            for systemId in systemIds:
+                column = self.systemColumns.get(systemId["guid"].lower())
+                if column is None:
+                    classificationIds.append(snapshotError("The classification system is not in the snapshot"))
+                    continue
+                classificationId = {"classificationSystemId": systemId}
+                if self.classifications[row, column] >= 0:
+                    classificationId["classificationItemId"] = {"guid": self.manifest["classificationItems"][self.classifications[row, column]]}
+                classificationIds.append({"classificationId": classificationId})
+            results.append({"classificationIds": classificationIds})
+        return {"elementClassifications": results}
+
+    def answerGetDetailsOfClassificationItems(self, parameters):
+        details = self.classificationItemDetails()
+        return {"classificationItems": [{"classificationItem": details[guid]} if guid in details
+                                        else snapshotError("The classification item is not in the snapshot")
+                                        for guid in (item["classificationItemId"]["guid"].lower() for item in parameters["classificationItemIds"])]}
+
+    def answerGetElementsRelatedToZones(self, parameters):
+        elementTypes = set(elementType.encode('ascii') for elementType in parameters.get("elementTypes") or [])
+        zoneIndexOfRow = {row: index for index, row in enumerate(self.zoneRows.tolist())}
+        results = []
+        for row in self.rowsOfElements(parameters["zones"]):
+            if row not in zoneIndexOfRow:
+                results.append(snapshotError("The zone is not in the snapshot"))
+                continue
+            index = zoneIndexOfRow[row]
+            rows = self.zoneElements[self.zoneOffsets[index]:self.zoneOffsets[index + 1]]
+            if elementTypes:
+                rows = [related for related in rows if self.types[related] in elementTypes]
+            results.append({"elements": self.elementsOfRows(rows)})
+        return {"elementsRelatedToZones": results}
+
+    def answerGetNavigatorItemTree(self, parameters):
+        return {"navigatorTree": self.navigatorTrees[json.dumps(parameters["navigatorTreeId"], sort_keys=True)]}
+
+    def answerGetPublisherSetNames(self, parameters):
+        return {"publisherSetNames": self.manifest["publisherSetNames"]}
+
+    # The writes are dry-runs: the property values are kept in the memory (the scripts read them back),
+    # the navigator item changes are only counted.
+    def answerSetPropertyValuesOfElements(self, parameters):
+        values = parameters["elementPropertyValues"]
+        results = []
+        for row, value in zip(self.rowsOfElements(values), values):
+            if row is None:
+                results.append({"success": False, **snapshotError("The element is not in the snapshot")})
+                continue
+            with self._lock:
+                self.writtenValues[(row, value["propertyId"]["guid"].lower())] = {"propertyValue": dict(value["propertyValue"], status='normal')}
+            results.append({"success": True})
+        self._recordDryRun('SetPropertyValuesOfElements', len(values))
+        return {"executionResults": results}
+
+    def answerRenameNavigatorItem(self, parameters):
+        self._recordDryRun('RenameNavigatorItem')
+        return {}
+
+    def answerMoveNavigatorItem(self, parameters):
+        self._recordDryRun('MoveNavigatorItem')
+        return {}
+
+    def answerDeleteNavigatorItems(self, parameters):
+        self._recordDryRun('DeleteNavigatorItems', len(parameters.get("navigatorItemIds") or []))
+        return {}
+
+    def answerCreateViewMapFolder(self, parameters):
+        self._recordDryRun('CreateViewMapFolder')
+        return {"createdFolderNavigatorItemId": {"guid": str(uuid.uuid4())}}
+
+    # Print the number of the dry-run writes (nothing was written into Archicad).
+    def PrintDryRunSummary(self):
+        if self.dryRunWrites:
+            print("Snapshot dry run, not written into Archicad: " +
+                  ", ".join(f"{command} {count}" for command, count in self.dryRunWrites.items()))
+
+
+# This function creates the request handler class of the server of a snapshot.
+def createSnapshotRequestHandler(snapshot: ProjectSnapshot):
+    class SnapshotRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            body = json.dumps(snapshot.Answer(request)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # The requests are not logged to the console.
+        def log_message(self, format, *args):
+            pass
+
+    return SnapshotRequestHandler
+
+
+# This class is used instead of the 'ACConnection' of the archicad package: it has the same commands,
+# types and utilities, but they are answered from the snapshot.
+# The snapshot is answered by a local server on a free port (like the JSON API of Archicad), the requests
+# of the commands are sent to it with the usual urllib, nothing of the script's urllib is changed.
+# The commands, types and utilities are the public ones of the archicad package ('archicad.Commands', ...),
+# they are the latest version of the package and they can send the commands of every Archicad version of the snapshots.
+class SnapshotConnection:
+    def __init__(self, folder: str):
+        from archicad import Commands, Types, Utilities
+        self.snapshot = ProjectSnapshot(folder)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), createSnapshotRequestHandler(self.snapshot))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        productInfo = self.snapshot.manifest["productInfo"]
+        self.port = None
+        self.version, self.build, self.lang = productInfo["version"], productInfo["buildNumber"], productInfo["languageCode"]
+        self.request = Request(f"http://127.0.0.1:{self._server.server_address[1]}", headers={'Content-Type': 'application/json'})
+        self.commands = Commands(self.request)
+        self.types = Types()
+        self.utilities = Utilities(self.types, self.commands)
+        # Tell the user at the end of the script that the writes were not done.
+        atexit.register(self.snapshot.PrintDryRunSummary)
+
+    # Stop the server of the snapshot.
+    def Close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Save a snapshot of the project open in Archicad, or print the content of a snapshot.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    exportParser = subparsers.add_parser("export", help="save the snapshot of the project open in Archicad")
+    exportParser.add_argument("folder")
+    exportParser.add_argument("--port", type=int, help="the port of the Archicad (default: the first running Archicad)")
+    exportParser.add_argument("--properties", nargs="*", help="built-in property names (default: the properties used by the scripts)")
+    exportParser.add_argument("--user-properties", nargs="*", default=[], help="user defined properties as 'GROUP::NAME'")
+    infoParser = subparsers.add_parser("info", help="print the content of a snapshot")
+    infoParser.add_argument("folder")
+    arguments = parser.parse_args()
+
+    if arguments.action == "export":
+        propertyUserIds = None
+        if arguments.properties is not None or arguments.user_properties:
+            propertyUserIds = [{"type": "BuiltIn", "nonLocalizedName": name} for name in arguments.properties or []] + \
+                              [{"type": "UserDefined", "localizedName": name.split("::", 1)} for name in arguments.user_properties]
+        start = time.perf_counter()
+        manifest = ExportSnapshot(arguments.folder, arguments.port, propertyUserIds)
+        print(f"Saved the snapshot of {manifest['elementCount']} elements into '{arguments.folder}' ({time.perf_counter() - start:.1f} s)")
+    else:
+        snapshot = ProjectSnapshot(arguments.folder)
+        manifest = snapshot.manifest
+        print(f"Created: {manifest['created']}, Archicad {manifest['productInfo']['version']} ({manifest['productInfo']['buildNumber']})")
+        print(f"Elements: {manifest['elementCount']}")
+        for elementType, count in zip(*np.unique(snapshot.types, return_counts=True)):
+            print(f"    {elementType.decode('ascii')}: {count}")
+        print(f"Properties: {', '.join(' / '.join(getPropertyUserIdKey(item['userId'])[1:]) for item in manifest['properties'])}")
+        print(f"Classification systems: {', '.join(system['name'] for system in manifest['classificationSystems'])}")
+        print(f"Navigator trees: {', '.join(item['navigatorTreeId']['type'] + (' ' + item['navigatorTreeId']['name'] if 'name' in item['navigatorTreeId'] else '') for item in manifest['navigatorTrees'])}")
@@ -0,0 +1,188 @@
+# Import the guid helpers of the shared session module.
+from archicad_session import getElementGuid, getPropertyGuid
+# Import random to select the sample of the 'sampled' verification, sys to print the report in one write.
+import random, sys
+# Import typing not essential for the code.
+from typing import Any, Dict, List, Optional, Tuple
+
+# This module is the shared 'diff' stage of the scripts writing property values
+# (numbering scripts, zone overall dimensions, excel import).
+#
+# Writing a property value which is already the same in Archicad still recalculates the element
+# and adds a step to the undo history. On a second run most of the values are not changing,
+# so the new values are compared with the current ones first and only the real changes are written.
+#
+# After the write the values can be verified (see 'VerifyWrittenValues'). Reading back the values of every
+# element doubles the API traffic, so the verification has more modes:
+#   "none":             nothing is checked.
+#   "fromWriteResults": the success/error results of the 'SetPropertyValuesOfElements' command are checked (no extra request).
+#   "sampled":          a random sample of the written values is read back and compared.
+#   "full":             every written value is read back and compared.
+
+# The verification modes.
+VERIFICATION_MODES = ('none', 'fromWriteResults', 'sampled', 'full')
+
+
+# This function converts a property value to a comparable form.
+# The simple values (strings, numbers, booleans) are compared directly,
+# the Archicad types (e.g. enum value ids) are compared by their attributes.
+def getComparableValue(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return [getComparableValue(item) for item in value]
+    if hasattr(value, '__dict__'):
+        return {key: getComparableValue(item) for key, item in vars(value).items()}
+    return value
+
+
+# This function returns True if the new property value is the same as the current one.
+# Arguments: current property value (the 'propertyValue' of the GetPropertyValuesOfElements result),
+# new property value (the 'propertyValue' of an 'ElementPropertyValue').
+def isUnchangedValue(currentPropertyValue, newPropertyValue) -> bool:
+    # A missing value or a value with 'notAvailable'/'userUndefined' status must be written.
+    if currentPropertyValue is None or getattr(currentPropertyValue, 'status', 'normal') != 'normal':
+        return False
+    return getComparableValue(currentPropertyValue.value) == getComparableValue(newPropertyValue.value)
+
+
+# This class is the summary of a write: how many values were changed and unchanged,
+# and the results of the 'SetPropertyValuesOfElements' command for the changed values.
+class WriteSummary:
+    def __init__(self, changedValues: List, unchangedCount: int, results: List):
+        self.changedValues = changedValues
+        self.changedCount = len(changedValues)
+        self.unchangedCount = unchangedCount
+        self.results = results
+
+    def __str__(self) -> str:
+        return (f"Property values: {self.changedCount} changed, {self.unchangedCount} unchanged "
+                f"(of {self.changedCount + self.unchangedCount})")
+
+
+# This function requests the current values of the elements and properties of the element property values.
+# Returns a dictionary with (element guid, property guid):current property value key:value pairs.
+def getCurrentPropertyValues(commands, elemPropertyValues: List) -> Dict[Tuple[str, str], Any]:
+    # Every element and property only once, in the order of their first occurrence.
+    elementIds = {getElementGuid(v.elementId): v.elementId for v in elemPropertyValues}
+    propertyIds = {getPropertyGuid(v.propertyId): v.propertyId for v in elemPropertyValues}
+    currentValues = {}
+    if not elementIds:
+        return currentValues
+    propertyValuesOfElements = commands.GetPropertyValuesOfElements(list(elementIds.values()), list(propertyIds.values()))
+    for elementGuid, propertyValues in zip(elementIds, propertyValuesOfElements):
+        # If there is no 'propertyValues' attribute the element has an 'error' instead.
+        for propertyGuid, item in zip(propertyIds, getattr(propertyValues, 'propertyValues', None) or []):
+            currentValues[(elementGuid, propertyGuid)] = getattr(item, 'propertyValue', None)
+    return currentValues
+
+
+# This function selects the element property values which are different from the current values.
+# Arguments: element property values, dictionary returned by the 'getCurrentPropertyValues' function.
+# Returns the list of the changed element property values and the number of the unchanged ones.
+def selectChangedPropertyValues(elemPropertyValues: List, currentValues: Dict[Tuple[str, str], Any]) -> Tuple[List, int]:
+    changedValues = []
+    unchangedCount = 0
+    for value in elemPropertyValues:
+        key = (getElementGuid(value.elementId), getPropertyGuid(value.propertyId))
+        if isUnchangedValue(currentValues.get(key), value.propertyValue):
+            unchangedCount += 1
+        else:
+            changedValues.append(value)
+    return changedValues, unchangedCount
+
+
+# This function writes only the changed property values.
+# Arguments: the session (see 'archicad_session.py'), the element property values to write,
+# currentValues (optional): the dictionary of the current values if the script already has them
+# (see 'getCurrentPropertyValues'), else they are requested here.
+# Returns a 'WriteSummary'.
+def WriteChangedPropertyValues(session, elemPropertyValues: List, currentValues: Optional[Dict[Tuple[str, str], Any]] = None) -> WriteSummary:
+    if currentValues is None:
+        currentValues = getCurrentPropertyValues(session.commands, elemPropertyValues)
+    changedValues, unchangedCount = selectChangedPropertyValues(elemPropertyValues, currentValues)
+    # Nothing to write, do not send an empty command.
+    results = session.SetPropertyValuesOfElements(changedValues) if changedValues else []
+    return WriteSummary(changedValues, unchangedCount, results)
+
+
+# This function returns the simple value of a property value for the report (e.g. the string of a 'NormalStringPropertyValue').
+def getReportValue(propertyValue) -> Any:
+    return getattr(propertyValue, 'value', None)
+
+
+# This class is the buffered report of a verification: one (element guid, value, status) entry per checked value.
+# The status is "ok", "failed: <error message>" or "mismatch: <read back value>".
+# Nothing is printed until 'Print' or 'Save' is called, the entries are written in one step sorted by the values.
+class VerificationReport:
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.entries: List[Tuple[str, Any, str]] = []
+
+    def Add(self, elementGuid: str, value: Any, status: str = 'ok'):
+        self.entries.append((elementGuid, value, status))
+
+    # Returns the entries which are not "ok".
+    def Problems(self) -> List[Tuple[str, Any, str]]:
+        return [entry for entry in self.entries if entry[2] != 'ok']
+
+    def __str__(self) -> str:
+        if self.mode == 'none':
+            return "Verification: skipped"
+        return f"Verification ({self.mode}): {len(self.entries)} checked, {len(self.Problems())} problems"
+
+    # Returns the lines of the report: (element guid, value) sorted by the values, the status is added if it is not "ok".
+    # Arguments: onlyProblems: only the values which are not "ok".
+    def Lines(self, onlyProblems: bool = False) -> List[str]:
+        entries = self.Problems() if onlyProblems else self.entries
+        return [str((elementGuid, value)) + ('' if status == 'ok' else f" {status}")
+                for elementGuid, value, status in sorted(entries, key=lambda entry: str(entry[1]))]
+
+    # Print the report to the console (or to a file object).
+    def Print(self, onlyProblems: bool = False, file=None):
+        (file or sys.stdout).write(''.join(line + '\n' for line in self.Lines(onlyProblems)))
+
+    # Save the report into a text file.
+    def Save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            self.Print(file=file)
+
+
+# This function checks the results of the 'SetPropertyValuesOfElements' command of the changed values.
+# The unchanged values were compared with the current values before the write, they are "ok".
+def verifyFromWriteResults(report: VerificationReport, writeSummary: WriteSummary, elemPropertyValues: List):
+    changedIds = set(id(value) for value in writeSummary.changedValues)
+    for value in elemPropertyValues:
+        if id(value) not in changedIds:
+            report.Add(getElementGuid(value.elementId), getReportValue(value.propertyValue))
+    for value, result in zip(writeSummary.changedValues, writeSummary.results):
+        # A failed execution result has 'success' False and an 'error' with the message.
+        status = 'ok' if getattr(result, 'success', True) else f"failed: {getattr(getattr(result, 'error', None), 'message', result)}"
+        report.Add(getElementGuid(value.elementId), getReportValue(value.propertyValue), status)
+
+
+# This function reads back the values and compares them with the written ones.
+def verifyByReadBack(report: VerificationReport, session, elemPropertyValues: List):
+    currentValues = getCurrentPropertyValues(session.commands, elemPropertyValues)
+    for value in elemPropertyValues:
+        currentValue = currentValues.get((getElementGuid(value.elementId), getPropertyGuid(value.propertyId)))
+        status = 'ok' if isUnchangedValue(currentValue, value.propertyValue) else f"mismatch: {getReportValue(currentValue)}"
+        report.Add(getElementGuid(value.elementId), getReportValue(value.propertyValue), status)
+
+
+# This function verifies the written property values.
+# Arguments: the session, the 'WriteSummary' of the write, all the element property values given to the write
+# (see 'WriteChangedPropertyValues'), verification mode (see 'VERIFICATION_MODES'),
+# sampleSize: the number of the values read back in the "sampled" mode, rng (optional): random generator of the sample.
+# Returns a 'VerificationReport' (it is not printed here).
+def VerifyWrittenValues(session, writeSummary: WriteSummary, elemPropertyValues: List, mode: str = 'fromWriteResults',
+                        sampleSize: int = 100, rng: Optional[random.Random] = None) -> VerificationReport:
+    if mode not in VERIFICATION_MODES:
+        raise ValueError(f"Unknown verification mode: {mode} (use one of {', '.join(VERIFICATION_MODES)})")
+    report = VerificationReport(mode)
+    if mode == 'fromWriteResults':
+        verifyFromWriteResults(report, writeSummary, elemPropertyValues)
+    elif mode == 'sampled':
+        sample = (rng or random).sample(elemPropertyValues, min(sampleSize, len(elemPropertyValues)))
+        verifyByReadBack(report, session, sample)
+    elif mode == 'full':
+        verifyByReadBack(report, session, elemPropertyValues)
+    return report
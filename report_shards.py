@@ -0,0 +1,163 @@
+# Import os, sys and subprocess to run the shard workers as separate Python processes,
+# pickle and tempfile to hand over the sheets of the shards to the workers.
+import os, sys, subprocess, pickle, tempfile
+# Import copy to copy the styles and the layout objects between the workbooks.
+from copy import copy
+# Import ThreadPoolExecutor to keep 'workers' worker processes running at the same time.
+from concurrent.futures import ThreadPoolExecutor
+# Import typing not essential for the code.
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+# Import load_workbook from openpyxl for excel file operations.
+# https://openpyxl.readthedocs.io/en/stable/index.html
+from openpyxl import load_workbook
+
+# Import the compiled template renderer.
+from report_template import CompiledTemplate
+
+# This module writes the room report into more workbooks (shards) in parallel.
+#
+# The room data is requested from Archicad only once by the room report script, then the sheets
+# (title and values of every room) are split into shards (by story, by zone category or into N-room chunks)
+# and every shard is rendered and saved by its own worker process, so all the cores are used
+# and no workbook is too big. The shards can be merged into one workbook at the end.
+#
+# The workers are started as 'python report_shards.py <shard file>' and not with the multiprocessing
+# module, because multiprocessing would import the main script again in every worker on Windows
+# (and the room report script connects to Archicad when it is imported).
+
+# The type of the sheets: list of (title, {(row, column):value}) tuples.
+Sheets = List[Tuple[str, Dict[Tuple[int, int], Any]]]
+
+
+# This function creates the shard keys of the N-room chunks.
+# Arguments: number of rooms (in the order of the report), number of rooms in a chunk.
+# Returns a list with the shard key of every room, e.g. '001-200'.
+def chunkShardKeys(roomCount: int, chunkSize: int) -> List[str]:
+    # The numbers are padded with zeros so the file names are in the right order.
+    width = len(str(roomCount))
+    shardKeys = []
+    for index in range(roomCount):
+        start = index - index % chunkSize
+        shardKeys.append(f"{start + 1:0{width}d}-{min(start + chunkSize, roomCount):0{width}d}")
+    return shardKeys
+
+
+# This function groups the sheets by their shard keys.
+# Arguments: the sheets, shard key of every sheet (same order).
+# Returns a dictionary with shard key:sheets key:value pairs, in the order of the first occurrence of the keys.
+def groupSheetsIntoShards(sheets: Sheets, shardKeys: Sequence[Hashable]) -> Dict[Hashable, Sheets]:
+    shards = {}
+    for sheet, shardKey in zip(sheets, shardKeys):
+        shards.setdefault(shardKey, []).append(sheet)
+    return shards
+
+
+# This function creates the output path of a shard: 'Room Report.xlsx' -> 'Room Report - <shard key>.xlsx'.
+# The characters which are not allowed in file names are replaced.
+def getShardPath(outputPath: str, shardKey: Hashable) -> str:
+    base, extension = os.path.splitext(outputPath)
+    name = "".join("-" if c in '<>:"/\\|?*' else c for c in str(shardKey))
+    return f"{base} - {name}{extension}"
+
+
+# This function creates the output paths of the shards (see 'getShardPath').
+# Two shard keys can give the same file name (e.g. 'A/B' and 'A:B', or 'a' and 'A' on Windows),
+# then the index of the shard is added to the name, so a shard does not overwrite the other one.
+# Arguments: path of the report, shard keys. Returns the list of the paths (same order as the shard keys).
+def getShardPaths(outputPath: str, shardKeys: Sequence[Hashable]) -> List[str]:
+    paths = []
+    usedPaths = set()
+    for index, shardKey in enumerate(shardKeys, start=1):
+        path = getShardPath(outputPath, shardKey)
+        suffix = index
+        while os.path.normcase(path).lower() in usedPaths:
+            path = getShardPath(outputPath, f"{shardKey} ({suffix})")
+            suffix += 1
+        usedPaths.add(os.path.normcase(path).lower())
+        paths.append(path)
+    return paths
+
+
+# This function renders the sheets from the template into a new workbook and saves it.
+# This is the work of one worker process.
+# Arguments: path of the template workbook, path of the output workbook, the sheets.
+def RenderShard(templatePath: str, outputPath: str, sheets: Sheets):
+    workbook = load_workbook(templatePath)
+    # The workbook will not be a template.
+    workbook.template = False
+    base = workbook.active
+    template = CompiledTemplate(base)
+    for title, values in sheets:
+        template.Render(workbook, title, values)
+    # Remove the template worksheet from the file.
+    workbook.remove(base)
+    workbook.save(outputPath)
+
+
+# This function renders the shards in parallel worker processes.
+# Arguments: path of the template workbook, dictionary with output path:sheets key:value pairs,
+# number of the worker processes running at the same time.
+# Returns the list of the saved output paths (same order as the shards).
+def RenderShards(templatePath: str, shards: Dict[str, Sheets], workers: int) -> List[str]:
+    # This function runs one worker process and waits for it.
+    def runWorker(outputPath: str, sheets: Sheets):
+        # The sheets are handed over in a temporary pickle file.
+        with tempfile.NamedTemporaryFile(suffix=".pickle", delete=False) as file:
+            pickle.dump((templatePath, outputPath, sheets), file, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), file.name], check=True)
+        finally:
+            os.remove(file.name)
+        return outputPath
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(runWorker, outputPath, sheets) for outputPath, sheets in shards.items()]
+        # Result() raises the error of the failed worker.
+        return [future.result() for future in futures]
+
+
+# This function merges the shard workbooks into one workbook.
+# The first shard is the base of the merged workbook, the sheets of the other shards are copied into it
+# with their values, styles, hyperlinks, comments, dimensions, merged cells and page setup.
+# Arguments: paths of the shard workbooks, path of the merged workbook.
+def MergeWorkbooks(paths: Sequence[str], outputPath: str):
+    workbook = load_workbook(paths[0])
+    for path in paths[1:]:
+        for source in load_workbook(path).worksheets:
+            target = workbook.create_sheet(source.title)
+            for (row, column), sourceCell in source._cells.items():
+                targetCell = target.cell(row=row, column=column)
+                targetCell._value = sourceCell._value
+                targetCell.data_type = sourceCell.data_type
+                # The styles are stored in the workbook, so they are copied by their values
+                # (the target workbook registers them in its own style tables).
+                if sourceCell.has_style:
+                    targetCell.font = copy(sourceCell.font)
+                    targetCell.border = copy(sourceCell.border)
+                    targetCell.fill = copy(sourceCell.fill)
+                    targetCell.number_format = sourceCell.number_format
+                    targetCell.protection = copy(sourceCell.protection)
+                    targetCell.alignment = copy(sourceCell.alignment)
+                # The same as the rendered cells of the template (see 'CompiledTemplate.Render').
+                if sourceCell.hyperlink:
+                    targetCell._hyperlink = copy(sourceCell.hyperlink)
+                if sourceCell.comment:
+                    targetCell.comment = copy(sourceCell.comment)
+            for key, dimension in source.row_dimensions.items():
+                target.row_dimensions[key].height = dimension.height
+            for key, dimension in source.column_dimensions.items():
+                target.column_dimensions[key].width = dimension.width
+            for mergedRange in source.merged_cells.ranges:
+                target.merge_cells(str(mergedRange))
+            target.sheet_format = copy(source.sheet_format)
+            target.page_margins = copy(source.page_margins)
+            target.page_setup = copy(source.page_setup)
+            target.print_options = copy(source.print_options)
+    workbook.save(outputPath)
+
+
+# The worker process: 'python report_shards.py <shard file>'.
+if __name__ == "__main__":
+    with open(sys.argv[1], "rb") as shardFile:
+        RenderShard(*pickle.load(shardFile))
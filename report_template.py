@@ -0,0 +1,108 @@
+# Import copy to give every new worksheet its own copy of the template's style and layout objects.
+from copy import copy
+# Import typing not essential for the code.
+from typing import Any, Dict, Hashable, Iterable, Tuple
+
+# Import the Cell class and the address converter of openpyxl.
+# https://openpyxl.readthedocs.io/en/stable/api/openpyxl.cell.cell.html
+from openpyxl.cell.cell import Cell
+from openpyxl.utils.cell import coordinate_to_tuple
+
+# This module is the compiled template renderer of the room report.
+#
+# 'workbook.copy_worksheet(template)' reads every cell object of the template worksheet again
+# for every room (value, style, hyperlink, comment) through the generic worksheet API,
+# then the values of the room are written cell by cell by their addresses ('C4', 'G20', ...).
+# Here the template is analysed only once: its cells are kept as a plain list of
+# (row, column, value, data type, style) tuples and the layout (dimensions, merged cells,
+# page setup) is kept as it is. The cell addresses are converted to (row, column) tuples once too.
+# Rendering a room sheet creates the cells of the template directly and writes only the values of the room.
+# The result is the same worksheet as the one created by 'copy_worksheet' and filled by the addresses.
+
+
+# This function converts the cell addresses of a values dictionary to (row, column) tuples.
+# Arguments: dictionary with cell address ('C4'):value key:value pairs.
+def compileCellValues(cellValues: Dict[str, Any]) -> Dict[Tuple[int, int], Any]:
+    return {coordinate_to_tuple(cellAddress): value for cellAddress, value in cellValues.items()}
+
+
+# This function collects the values of every room in one pass from the tables of the report.
+# Arguments: dictionary with cell address:{room:value} key:value pairs (single values),
+# dictionary with (tuple of cell addresses):{room:[list of values]} key:value pairs (value ranges),
+# the rooms.
+# Returns a dictionary with room:{(row, column):value} key:value pairs.
+# The values of a room are in the same order as the tables and the addresses.
+# Note: Zip function is zipping till the last element of the shortest list, the same as before.
+def collectRoomValues(cellValuesForRoom: Dict[str, Dict[Hashable, Any]],
+                      cellValueRangeForRoom: Dict[Tuple[str, ...], Dict[Hashable, Iterable]],
+                      rooms: Iterable[Hashable]) -> Dict[Hashable, Dict[Tuple[int, int], Any]]:
+    roomValues = {room: {} for room in rooms}
+    for cellAddress, valuesOfRooms in cellValuesForRoom.items():
+        position = coordinate_to_tuple(cellAddress)
+        for room, value in valuesOfRooms.items():
+            if room in roomValues:
+                roomValues[room][position] = value
+    for cellAddresses, valuesOfRooms in cellValueRangeForRoom.items():
+        positions = [coordinate_to_tuple(cellAddress) for cellAddress in cellAddresses]
+        for room, values in valuesOfRooms.items():
+            if room in roomValues:
+                roomValues[room].update(zip(positions, values))
+    return roomValues
+
+
+# This class is the analysed (compiled) template worksheet.
+class CompiledTemplate:
+    # Analyse the template worksheet (it must be in the same workbook as the rendered worksheets,
+    # because the styles are stored in the workbook).
+    def __init__(self, templateWorksheet):
+        # (row, column, value, data type, style array or None, hyperlink or None, comment or None) of every cell.
+        self.cells = [(row, column, cell._value, cell.data_type, cell._style if cell.has_style else None,
+                       cell.hyperlink, cell.comment)
+                      for (row, column), cell in templateWorksheet._cells.items()]
+        self.rowDimensions = dict(templateWorksheet.row_dimensions)
+        self.columnDimensions = dict(templateWorksheet.column_dimensions)
+        self.sheetFormat = templateWorksheet.sheet_format
+        self.sheetProperties = templateWorksheet.sheet_properties
+        self.mergedCells = templateWorksheet.merged_cells
+        self.pageMargins = templateWorksheet.page_margins
+        self.pageSetup = templateWorksheet.page_setup
+        self.printOptions = templateWorksheet.print_options
+
+    # Create a new worksheet from the template and write the values into it.
+    # Arguments: workbook, title of the new worksheet,
+    # dictionary with (row, column):value key:value pairs (see 'compileCellValues' and 'collectRoomValues').
+    # Returns the new worksheet.
+    def Render(self, workbook, title: str, values: Dict[Tuple[int, int], Any]):
+        worksheet = workbook.create_sheet(title)
+        cells = worksheet._cells
+        # The cells of the template.
+        for row, column, value, dataType, style, hyperlink, comment in self.cells:
+            # The Cell class makes its own copy of the style array.
+            cell = Cell(worksheet, row=row, column=column, style_array=style)
+            cell._value = value
+            cell.data_type = dataType
+            if hyperlink:
+                cell._hyperlink = copy(hyperlink)
+            if comment:
+                cell.comment = copy(comment)
+            cells[(row, column)] = cell
+        # The values (the cells not in the template are created by the worksheet).
+        for (row, column), value in values.items():
+            cell = cells.get((row, column))
+            if cell is None:
+                cell = worksheet.cell(row=row, column=column)
+            cell.value = value
+        # The layout of the template.
+        for key, dimension in self.rowDimensions.items():
+            worksheet.row_dimensions[key] = copy(dimension)
+            worksheet.row_dimensions[key].worksheet = worksheet
+        for key, dimension in self.columnDimensions.items():
+            worksheet.column_dimensions[key] = copy(dimension)
+            worksheet.column_dimensions[key].worksheet = worksheet
+        worksheet.sheet_format = copy(self.sheetFormat)
+        worksheet.sheet_properties = copy(self.sheetProperties)
+        worksheet.merged_cells = copy(self.mergedCells)
+        worksheet.page_margins = copy(self.pageMargins)
+        worksheet.page_setup = copy(self.pageSetup)
+        worksheet.print_options = copy(self.printOptions)
+        return worksheet
@@ -0,0 +1,74 @@
+# Import typing not essential for the code.
+from typing import Dict, Hashable, Iterable, List, Sequence
+
+# This module contains the room (zone) relation helpers of the room report.
+# The functions work on plain dictionaries and lists, so they do not need the Archicad connection.
+
+
+# This function prepares the adjacent rooms dictionary
+# with the room:[List of the adjacent rooms] key:value pairs.
+# Two rooms are adjacent if they have at least one common boundary wall.
+# Arguments: rooms list, dictionary with room:[list of its boundary walls' guids] key:value pairs.
+#
+# Instead of comparing every room with every other room an inverted index is created first:
+# wall guid:[list of the rooms touching the wall]. Every room is adjacent to the other rooms
+# in the lists of its walls, so the cost depends on the number of wall/room connections
+# and not on the square of the number of rooms.
+# The adjacent rooms are listed in the same order as in the 'rooms' list.
+def getAdjacentRoomsFromBoundaries(rooms: Sequence[Hashable], boundaryObjectsIds: Dict[Hashable, Iterable[str]]) -> Dict[Hashable, List[Hashable]]:
+    # Create the inverted index: wall guid:[indices of the rooms touching the wall].
+    roomsOfWall = {}
+    for roomIndex, room in enumerate(rooms):
+        # A set is used because a wall can be listed more than once for the same room.
+        for wallId in set(boundaryObjectsIds[room]):
+            roomsOfWall.setdefault(wallId, []).append(roomIndex)
+
+    # Collect the indices of the adjacent rooms for every room.
+    adjacentRoomIndices = [set() for _ in rooms]
+    for roomIndices in roomsOfWall.values():
+        # A wall with one room only does not connect anything.
+        if len(roomIndices) > 1:
+            for roomIndex in roomIndices:
+                adjacentRoomIndices[roomIndex].update(roomIndices)
+
+    # Create the adjacent rooms dictionary, the room itself is not adjacent to itself.
+    return {room: [rooms[i] for i in sorted(adjacentRoomIndices[roomIndex]) if i != roomIndex]
+            for roomIndex, room in enumerate(rooms)}
+
+
+# This function is getting the guid (string) out of an element (ElementIdArrayItem).
+def getGuid(elementIdArrayItem) -> str:
+    return str(elementIdArrayItem.elementId.guid)
+
+
+# This function prepares 1 list containing every element of the lists only once.
+# Arguments: lists of elements (e.g. the related elements of the rooms).
+# An element (e.g. a door between two rooms) can be related to more rooms, the guids are used
+# to keep only its first occurrence. The list is built in linear time
+# (summing the lists with 'sum(lists, [])' would copy the result list again and again).
+def getUniqueElements(elementLists: Iterable[List]) -> List:
+    uniqueElements = {}
+    for elements in elementLists:
+        for element in elements:
+            uniqueElements.setdefault(getGuid(element), element)
+    return list(uniqueElements.values())
+
+
+# This function splits the related elements of the rooms by the element types.
+# Arguments: dictionary with room:[list of related elements] key:value pairs,
+# dictionary with element guid:element type (e.g. 'Wall', 'Door') key:value pairs,
+# dictionary with group name:[list of element types] key:value pairs, e.g. {"openings": ["Door", "Window"]}.
+# Returns a dictionary with group name:{room:[list of the elements of the group]} key:value pairs.
+# The elements keep their order inside the rooms.
+def splitRoomElementsByType(roomElements: Dict[Hashable, List], elementTypes: Dict[str, str],
+                            typeGroups: Dict[str, Iterable[str]]) -> Dict[str, Dict[Hashable, List]]:
+    # element type:group name lookup table.
+    groupOfType = {elementType: group for group, types in typeGroups.items() for elementType in types}
+    result = {group: {room: [] for room in roomElements} for group in typeGroups}
+    for room, elements in roomElements.items():
+        for element in elements:
+            group = groupOfType.get(elementTypes.get(getGuid(element)))
+            # Elements with other types (or unknown type) are not needed.
+            if group is not None:
+                result[group][room].append(element)
+    return result
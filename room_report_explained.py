@@ -1,8 +1,14 @@
-# Import archicad connection (required), handle_dependencies is not necessary.
-from archicad import ACConnection, handle_dependencies
-# Import os for file operations, sys is unused, uuid for uuid generation.
+# Import handle_dependencies to check the openpyxl module.
+from archicad import handle_dependencies
+# Import the shared session module (required).
+from archicad_session import OpenSession
+# Import the grouping engine to group the rooms by stories (for the sharded report).
+from grouping import sweepClusters
+# Import the room relation helpers (adjacent rooms, splitting the related elements by type).
+from room_relations import getAdjacentRoomsFromBoundaries, getGuid, getUniqueElements, splitRoomElementsByType
+# Import os for file operations, sys is unused.
 # Note: sys is not used in this code. 
-import os, sys, uuid
+import os, sys
 
 # Check if the importable (installed) if not returns an error
 handle_dependencies('openpyxl')
@@ -11,18 +17,24 @@ handle_dependencies('openpyxl')
 # https://openpyxl.readthedocs.io/en/stable/index.html
 # Note: Workbook class is not used in this code.
 from openpyxl import Workbook, load_workbook
+# Import the compiled template renderer (the template worksheet is analysed once, see 'report_template.py').
+from report_template import CompiledTemplate, collectRoomValues
+# Import the concurrent runner of the session from 'archicad_async.py'.
+from archicad_async import RunConcurrently
+# Import the sharded report helpers (more workbooks rendered in parallel worker processes).
+from report_shards import MergeWorkbooks, RenderShards, chunkShardKeys, getShardPaths, groupSheetsIntoShards
 
 # Establish the connection with the Archicad software, Archicad must be open and the pln file must be open too.
 #
 # We can use the acu.OpenFile() utility but we need an established connection first so we need to open Archicad and a new plan
 # as a minimum because all utilities use the connection.
-conn = ACConnection.connect()
-assert conn
+# The shared session module is doing the connection and it can send independent commands together.
+session = OpenSession()
 
 # Create shorts of the commands, types and utilities.
-acc = conn.commands
-act = conn.types
-acu = conn.utilities
+acc = session.commands
+act = session.types
+acu = session.utilities
 
 # Getting the actual dirname as scriptFolder variable.
 # The use of realpath is to get the canonical path adn ignore symbolic links.
@@ -64,6 +76,29 @@ insertEquipmentQuantitiesTo = ["D" + str(row) for row in range(20, 57)]
 insertOpeningNamesTo = ["F" + str(row) for row in range(20, 57)]
 # G20-G57 opening element ids
 insertOpeningElementIDsTo = ["G" + str(row) for row in range(20, 57)]
+# The element types related to the rooms which are needed for the report.
+# All of them are requested from Archicad in one 'GetElementsRelatedToZones' command.
+relatedElementTypes = {
+    "walls": ["Wall"],
+    "objects": ["Object"],
+    "openings": ["Door", "Window", "Skylight", "Opening"]
+}
+# Print every written cell to the console (slow with thousands of rooms).
+printCellValues = True
+# Sharded report: the rooms are written into more workbooks ('Room Report - <shard>.xlsx')
+# by parallel worker processes. None means one workbook, "story" one workbook per story,
+# "category" one workbook per zone category, "chunk" one workbook per 'shardRoomCount' rooms.
+shardBy = None
+shardRoomCount = 200
+# The tolerance of the z coordinate of the rooms on the same story (the same as in the zone numbering).
+STORY_GROUPING_LIMIT = 1
+# The number of the worker processes running at the same time.
+shardWorkers = os.cpu_count() or 1
+# Merge the shards into one workbook ('outputFileName') after they were saved.
+mergeShards = False
+# Run the independent queries of the report (property values, classifications, related elements)
+# concurrently on the thread pool of the session (see 'archicad_async.py'). False runs them one after the other.
+concurrentQueries = True
 # original comment -> ################################################################################
 
 # This functions returns a dictionary with the elements guids : elements' details' ids, key:value pairs.
@@ -71,27 +106,30 @@ insertOpeningElementIDsTo = ["G" + str(row) for row in range(20, 57)]
 def getElementsClassificationDictionary(elements):
     # Getting the guids of the elements (zones) classification
     classificationIdObjects = acc.GetClassificationsOfElements(
-        elements, [acu.FindClassificationSystem(classificationSystemName)])
+        elements, [session.FindClassificationSystem(classificationSystemName)])
 
     # This function takes out the element's classification id from the ClassificationIdsOrErrorsWrapper object.
     def unwrapId(classification):
         if classification.classificationIds[0].classificationId.classificationItemId:
             return classification.classificationIds[0].classificationId.classificationItemId
-        # If there is no id it generates one.
+        # If there is no id the element is not classified.
         else:
-            return act.ClassificationItemId(uuid.uuid1())
+            return None
 
     # List with the elements' classification ids (in our case these are the same for all three elements)
     classificationItemIds = [unwrapId(c) for c in classificationIdObjects]
     # Get the details of the classifications (guid, id, name, description).
-    classificationDetails = acc.GetDetailsOfClassificationItems(classificationItemIds)
+    # The details are taken from the classification index of the session (the tree is requested once),
+    # the same classification of many rooms is not requested again and again (see 'classification_index.py').
+    classificationDetails = session.GetClassificationIndex(classificationSystemName).GetDetailsOfClassificationItems(
+        classificationItemIds, acc)
 
     # Getting the classification id from the classification details.
     def unwrapDetail(details):
-        # If there is no attribute, meaning there is an 'error' attribute, use "<Unclassified>" id.
-        if hasattr(details, "error"):
+        # If there are no details (not classified or the item does not exist), use "<Unclassified>" id.
+        if details is None:
             return "<Unclassified>"
-        return details.classificationItem.id
+        return details.id
 
     return dict(zip(elements, [unwrapDetail(c) for c in classificationDetails]))
 
@@ -99,76 +137,69 @@ def getElementsClassificationDictionary(elements):
 def unwrapElements(elementsWrapper):
     return elementsWrapper.elements
 
+# This function is getting all the related elements of the rooms needed for the report at once.
+# Returns a dictionary with 'walls', 'objects', 'openings' (see 'relatedElementTypes') as keys
+# and room:[List of the related elements of that type] dictionaries as values.
+def getRelatedElementsOfRooms(rooms):
+    # Get the all the related elements of all the types in the rooms with one command.
+    rawRelatedElements = acc.GetElementsRelatedToZones(rooms, [t for types in relatedElementTypes.values() for t in types])
+    # Creating a dictionary with the room ElementIdArrayItem (guid): List of the related elements in the room key:value pairs.
+    roomElements = dict(zip(rooms, map(unwrapElements, rawRelatedElements)))
+    # Every element only once (e.g. a door is related to the rooms on both sides).
+    uniqueElements = getUniqueElements(roomElements.values())
+
+    # Getting the types of the related elements to split them locally.
+    # If there is no attribute, meaning there is an 'error' attribute, the element has no type.
+    elementTypes = {getGuid(e): t.typeOfElement.elementType
+                    for e, t in zip(uniqueElements, acc.GetTypesOfElements(uniqueElements)) if not hasattr(t, "error")}
+    return splitRoomElementsByType(roomElements, elementTypes, relatedElementTypes)
+
+# This function is getting the library part names and the General_ElementIDs of the objects and openings
+# in one property request.
+# Arguments: dictionary returned by the 'getRelatedElementsOfRooms' function.
+# Returns a dictionary with element guid:{'General_LibraryPartName': name, 'General_ElementID': id} key:value pairs.
+def getLibPartNamesAndElementIds(relatedElements):
+    # Getting the guid of the 'General_LibraryPartName' and the 'General_ElementID' together.
+    with session.Batch():
+        libPartNamePropertyId = session.Queue(session.GetBuiltInPropertyId, 'General_LibraryPartName')
+        elementIdPropertyId = session.Queue(session.GetBuiltInPropertyId, 'General_ElementID')
+    libPartNamePropertyId = libPartNamePropertyId.Result()
+    elementIdPropertyId = elementIdPropertyId.Result()
+    # The objects and the openings of all the rooms, every element only once.
+    elements = getUniqueElements(list(relatedElements["objects"].values()) + list(relatedElements["openings"].values()))
+    # Getting the property values ('General_LibraryPartName' and 'General_ElementID') of all the items in all the rooms.
+    propertyValuesDictionary = acu.GetPropertyValuesDictionary(elements, [libPartNamePropertyId, elementIdPropertyId])
+    return {getGuid(e): {'General_LibraryPartName': values.get(libPartNamePropertyId),
+                         'General_ElementID': values.get(elementIdPropertyId)}
+            for e, values in propertyValuesDictionary.items()}
+
 # This function preapres the adjacent rooms dictionary
 # with the room guid:[List of the adjacent rooms guid] key:value pairs
-def getAdjacentRooms(rooms):
-    # Getting the adjacent elements (walls) of the zones.
-    rawBoundaryObjects = acc.GetElementsRelatedToZones(rooms, ["Wall"])
-    # Creating a dictionary of the rooms (guids) and their adjacent walls.
-    # We are using the 'map' method to map (convert) the 'ElementsWrapper' to the 'unwrapElements' function
-    # in order to get the elements (containing the guids). 
-    boundaryObjects = dict(zip(rooms, list(map(unwrapElements, rawBoundaryObjects))))
-
-    # This function is getting the guids out of the elements created above.
-    def getGuid(elementIdArrayItem: act.ElementIdArrayItem) -> str:
-        return str(elementIdArrayItem.elementId.guid)
-
+# Arguments: rooms, dictionary with room:[List of its walls] key:value pairs.
+def getAdjacentRooms(rooms, wallsOfRooms):
     # Creating a dictionary of the rooms and a list of its adjacent walls ids as key:value pairs.
-    # This step could be handled directly in the unwrapElements function
-    # to return 'elementsWrapper.elements[i].elementId.guid' using list comprehension or dict comprehension.
-    boundaryObjectsIds = dict({k: list(map(getGuid, v))
-                                for k, v in boundaryObjects.items()})
+    boundaryObjectsIds = {room: list(map(getGuid, wallsOfRooms[room])) for room in rooms}
     # Create adjacent rooms dictionary.
-    adjacentRooms = {}
-    # This loop is checking all the rooms if they are adjacent:
-    # 1. Taking the first room.
-    # 2. Preparing an empty list in the adjacentRooms list for this room adjacent rooms.
-    # 3. Taking all the rooms except the same as room1 of the rooms
-    # 4. With the set.instercetion method checking all the two actual room boundary walls if there is any parity
-    # 5. If yes the two rooms are adjacent so append room 2 to the room1 adjacent rooms list
-    # 6. Go to next room in the rooms list
-    for room1 in rooms:
-        adjacentRooms[room1] = []
-        for room2 in rooms:
-            if room1 is not room2 and set(boundaryObjectsIds[room2]).intersection(set(boundaryObjectsIds[room1])):
-                adjacentRooms[room1].append(room2)
-
-    return adjacentRooms
+    # Two rooms are adjacent if they have a common boundary wall. Instead of comparing every room
+    # with every other room the 'getAdjacentRoomsFromBoundaries' function (see 'room_relations.py')
+    # creates a wall guid:[rooms touching the wall] index and takes the adjacent rooms from it.
+    return getAdjacentRoomsFromBoundaries(rooms, boundaryObjectsIds)
 
 # This function is getting all the library parts' names in every room.
+# Arguments: rooms, dictionary with room:[List of its objects] key:value pairs,
+# the dictionary returned by the 'getLibPartNamesAndElementIds' function.
 # Returns a dictionary with room ElementIdArrayItem (guid): List of the library parts' names in the room key:value pairs.
-def getObjectLibPartsInRooms(rooms):
-    # Get the all the elements in the room.
-    elementInRooms = acc.GetElementsRelatedToZones(rooms, ["Object"])
-    # Creating a dictionary with the room ElementIdArrayItem (guid): List of the library parts' guids in the room key:value pairs.
-    roomElements = dict(zip(rooms, list(map(unwrapElements, elementInRooms))))
-    # Getting the guid of the 'General_LibraryPartName'.
-    libPartNamePropertyId = acu.GetBuiltInPropertyId('General_LibraryPartName')
-    # Getting the property values ('General_LibraryPartName') of all the items in all the rooms.
-    # Note: Prepare 1 list containing all the elements of a nested list
-    # we can sum all the nested lists with an empty list.
-    propertyValuesDictionary = acu.GetPropertyValuesDictionary(sum(roomElements.values(), []), [libPartNamePropertyId])
-    return dict({room: [propertyValuesDictionary[e][libPartNamePropertyId] for e in roomElements[room]] for room in rooms})
+def getObjectLibPartsInRooms(rooms, objectsOfRooms, elementProperties):
+    return {room: [elementProperties[getGuid(e)]['General_LibraryPartName'] for e in objectsOfRooms[room]] for room in rooms}
 
 # This function is getting all the openings' names in every room.
+# Arguments: rooms, dictionary with room:[List of its openings] key:value pairs,
+# the dictionary returned by the 'getLibPartNamesAndElementIds' function.
 # Returns a dictionary with room ElementIdArrayItem (guid): [List of the openings' names, General elementID zipped as tuples]
 # in the room key:value pairs.
-def getOpeningsInRooms(rooms):
-    # Get the all the elements in the room.
-    elementInRooms = acc.GetElementsRelatedToZones(rooms, ["Door", "Window", "Skylight", "Opening"])
-    # Creating a dictionary with the room ElementIdArrayItem (guid): List of the openings' guids in the room key:value pairs.
-    roomElements = dict(zip(rooms, list(map(unwrapElements, elementInRooms))))
-    # Getting the guid of the 'General_LibraryPartName'.
-    libPartNamePropertyId = acu.GetBuiltInPropertyId('General_LibraryPartName')
-    # Getting the guid of the 'General_ElementID'.
-    elementIdPropertyId = acu.GetBuiltInPropertyId('General_ElementID')
-    # Getting the property values ('General_LibraryPartName' and 'General_ElementID') of all the items in all the rooms.
-    # Note: Prepare 1 list containing all the elements of a nested list
-    # we can sum all the nested lists with an empty list.
-    propertyValuesDictionary = acu.GetPropertyValuesDictionary(sum(roomElements.values(), []), [libPartNamePropertyId, elementIdPropertyId])
-    return dict({room: list(zip([propertyValuesDictionary[e][libPartNamePropertyId] for e in roomElements[room]],
-                                [propertyValuesDictionary[e][elementIdPropertyId] for e in roomElements[room]]))
-                            for room in rooms})
+def getOpeningsInRooms(rooms, openingsOfRooms, elementProperties):
+    return {room: [(elementProperties[getGuid(e)]['General_LibraryPartName'], elementProperties[getGuid(e)]['General_ElementID'])
+                   for e in openingsOfRooms[room]] for room in rooms}
 
 # Create the WorkBookFiller class which will be handling all the excel file operations.
 class WorkBookFiller:
@@ -180,54 +211,83 @@ class WorkBookFiller:
         self.cellValuesForRoom = {}
         # Create the 'cellValueRangeForRoom' dictionary to write all list type details of the room. e.g. {['C6'-'C15']]{room:[list of adjacent rooms]}}
         self.cellValueRangeForRoom = {}
-        self.zoneNumberPropertyId = acu.GetBuiltInPropertyId('Zone_ZoneNumber')
-        self.zoneNamePropertyId = acu.GetBuiltInPropertyId('Zone_ZoneName')
+        # The two property ids are independent so they are sent together.
+        with session.Batch():
+            zoneNumberPropertyId = session.Queue(session.GetBuiltInPropertyId, 'Zone_ZoneNumber')
+            zoneNamePropertyId = session.Queue(session.GetBuiltInPropertyId, 'Zone_ZoneName')
+        self.zoneNumberPropertyId = zoneNumberPropertyId.Result()
+        self.zoneNamePropertyId = zoneNamePropertyId.Result()
         self.propertyValuesDictionary = acu.GetPropertyValuesDictionary(self.rooms, [self.zoneNumberPropertyId, self.zoneNamePropertyId])
         self.rooms = sorted(self.rooms, key=lambda r: self.propertyValuesDictionary[r][self.zoneNumberPropertyId])
+        # The related elements (walls, objects, openings) of the rooms and the properties of the objects and openings.
+        # They are requested once by 'FetchRelatedElements' before the Insert functions using them.
+        self.relatedElements = None
+        self.relatedElementProperties = None
+
+    # This function requests the related elements of the rooms and the properties of the objects and openings
+    # for the 'InsertRelatedZonesTo', 'InsertObjectLibPartsTo' and 'InsertOpeningsTo' functions.
+    def FetchRelatedElements(self):
+        self.relatedElements = getRelatedElementsOfRooms(self.rooms)
+        self.relatedElementProperties = getLibPartNamesAndElementIds(self.relatedElements)
+
+    # This function adds the cells returned by the Insert functions to the 'cellValuesForRoom' and
+    # 'cellValueRangeForRoom' dictionaries.
+    # Arguments: list of (single cells dictionary, cell ranges dictionary) tuples, they are added in the order of the list.
+    def AddCells(self, insertedCells):
+        for cellValues, cellValueRanges in insertedCells:
+            self.cellValuesForRoom.update(cellValues)
+            self.cellValueRangeForRoom.update(cellValueRanges)
     
     # This function does all the excel file operations using the openpyxl module.
     def SaveWorkbook(self, outputPath):
         # Initialise the  workbook.
         workbook = self._initWorkBook()
         # Fill out the cells in the workbook
-        self._fillWorkbook(workbook)
+        # (recorded as a phase if the instrumentation is on, see 'archicad_session.py').
+        with session.Phase('fill workbook'):
+            self._fillWorkbook(workbook)
         # Save the workbook to the outputPath
-        workbook.save(outputPath)
+        with session.Phase('save workbook'):
+            workbook.save(outputPath)
 
     # This function prepares every celladdress data with all the rooms related property.
     # Arguments: dictionary of celladdresses as keys and propertyids as values. 
+    # The Insert functions return their cells as a (single cells dictionary, cell ranges dictionary) tuple
+    # to be added with 'AddCells' (the functions running concurrently are not writing the same dictionaries).
     def InsertPropertyValuesTo(self, cellAddressPropertyIdTable):
         # Create a dictionary with room: all celladdress property ids key:value pairs.
         propertyValuesDictionary = acu.GetPropertyValuesDictionary(self.rooms, list(cellAddressPropertyIdTable.values()))
-        # Take each celladdress with its property id and add to each cell to the 'cellValuesForRoom' dictionary:
+        cellValues = {}
+        # Take each celladdress with its property id and add to each cell to the 'cellValues' dictionary:
         # the key is the cellAddress, the value is a dictionary where the keys are the rooms and the values are their propertyvalues
         # if the propertyvalue is in the valuedictionary of the actual room.
         for cellAddress, propertyId in cellAddressPropertyIdTable.items():
-            self.cellValuesForRoom[cellAddress] = {room: valuesDictionary[propertyId] for room, valuesDictionary in propertyValuesDictionary.items() if propertyId in valuesDictionary}
+            cellValues[cellAddress] = {room: valuesDictionary[propertyId] for room, valuesDictionary in propertyValuesDictionary.items() if propertyId in valuesDictionary}
+        return cellValues, {}
 
     # This function creates a dictionary {room:id}.
-    # Inserting it to the 'self.cellValueRangeForRoom' with the proper celladdress key ['C4'].
+    # Returning it as a single cell with the proper celladdress key ['C4'].
     def InsertClassificationTo(self, cellAddress):
-        self.cellValuesForRoom[cellAddress] = getElementsClassificationDictionary(self.rooms)
+        return {cellAddress: getElementsClassificationDictionary(self.rooms)}, {}
 
     # This function creates a dictionary {room: [strings contains number and value]}.
-    # Inserting it to the 'self.cellValueRangeForRoom' with the proper celladdress keys list: {room: [strings contains number and value]}. 
+    # Returning it as a cell range with the proper celladdress keys list: {room: [strings contains number and value]}. 
     def InsertRelatedZonesTo(self, cellAddresses):
         # Getting the adjacent rooms dictionary (room: adjacent rooms list)
-        adjacentRooms = getAdjacentRooms(self.rooms)
+        adjacentRooms = getAdjacentRooms(self.rooms, self.relatedElements["walls"])
         adjacentRoomIds = {}
         # Fill the adjacentRoomIds dictionary with room:[list of strings conatins the adjacent rooms number and name separeted with '-'].
         for k, v in adjacentRooms.items():
             adjacentRoomIds[k] = [self.propertyValuesDictionary[item][self.zoneNumberPropertyId] + " - " + self.propertyValuesDictionary[item][self.zoneNamePropertyId] for item in v]
         
         # Add CellAddresses ['C6'-'C15'] as key and adjacentRoomIds {room:[number-name]}.
-        self.cellValueRangeForRoom[tuple(cellAddresses)] = adjacentRoomIds
+        return {}, {tuple(cellAddresses): adjacentRoomIds}
 
     # This function creates two dictionaries {room: the Library parts' names} and {room: library parts' quantities per room}.
-    # Inserting these to the 'self.cellValueRangeForRoom' with the proper celladdress list as keys: {room:names}, {room:qtyties} respectively.
+    # Returning these as cell ranges with the proper celladdress list as keys: {room:names}, {room:qtyties} respectively.
     def InsertObjectLibPartsTo(self, namesCellAddresses, countsCellAddresses):
         # Use the function 'getObjectLibPartsInRooms' and get a dictionary {room: [library parts' names]}.
-        libpartsInRooms = getObjectLibPartsInRooms(self.rooms)
+        libpartsInRooms = getObjectLibPartsInRooms(self.rooms, self.relatedElements["objects"], self.relatedElementProperties)
         libpartNamesInRooms = {}
         libpartCountsInRooms = {}
         # k is the room guid, v is the list with the library parts names in the room.
@@ -239,16 +299,15 @@ class WorkBookFiller:
             # using list comprehension and 'v'as the list of all lements name and the unique libpart names list.
             libpartCountsInRooms[k] = [v.count(libpartName) for libpartName in libpartNamesInRooms[k]]
 
-        # Add CellAddresses ['B20'-'B56'] as key and another dictionary {room:List of unique library parts' names} as value.
-        self.cellValueRangeForRoom[tuple(namesCellAddresses)] = libpartNamesInRooms
-        # Add CellAddresses ['D20'-'D56'] as key and another dictionary {room: List of library part quantities} as value.
-        self.cellValueRangeForRoom[tuple(countsCellAddresses)] = libpartCountsInRooms
+        # Add CellAddresses ['B20'-'B56'] as key and another dictionary {room:List of unique library parts' names} as value,
+        # CellAddresses ['D20'-'D56'] as key and another dictionary {room: List of library part quantities} as value.
+        return {}, {tuple(namesCellAddresses): libpartNamesInRooms, tuple(countsCellAddresses): libpartCountsInRooms}
 
     # This function creates two dictionaries {room: the openings' names} and {room: openings' General_ElementIDs}.
-    # Inserting these to the 'self.cellValueRangeForRoom' with the proper celladdress list as keys: {room:names}, {room:ids} respectively.
+    # Returning these as cell ranges with the proper celladdress list as keys: {room:names}, {room:ids} respectively.
     def InsertOpeningsTo(self, namesCellAddresses, idsCellAddresses):
         # Use the function 'getOpeningsInRooms' and get a dictionary {room: [opening names, General_ElementIDs zipped as tuples]}.
-        openingsInRooms = getOpeningsInRooms(self.rooms)
+        openingsInRooms = getOpeningsInRooms(self.rooms, self.relatedElements["openings"], self.relatedElementProperties)
         libpartNamesInRooms = {}
         elementIdsInRooms = {}
         # k is the room guid, v is the list with the opening names and their Genral element ids.
@@ -262,10 +321,9 @@ class WorkBookFiller:
             # and add to the 'elementIdsInRooms' dictionaryas value with the room guid as key.
             elementIdsInRooms[k] = [t[1] for t in openings]
 
-        # Add CellAddresses ['F20'-'F56'] as key and another dictionary {room:List of all the openings' names} as value.
-        self.cellValueRangeForRoom[tuple(namesCellAddresses)] = libpartNamesInRooms
-        # Add CellAddresses ['G20'-'G56'] as key and another dictionary {room:List of all the openings' General_ElementIDs} as value.
-        self.cellValueRangeForRoom[tuple(idsCellAddresses)] = elementIdsInRooms
+        # Add CellAddresses ['F20'-'F56'] as key and another dictionary {room:List of all the openings' names} as value,
+        # CellAddresses ['G20'-'G56'] as key and another dictionary {room:List of all the openings' General_ElementIDs} as value.
+        return {}, {tuple(namesCellAddresses): libpartNamesInRooms, tuple(idsCellAddresses): elementIdsInRooms}
 
     # This function load the template workbook for editing. Returns the loaded workbook.
     def _initWorkBook(self):
@@ -276,10 +334,13 @@ class WorkBookFiller:
         workbook.template = False
         return workbook
 
-    def _fillWorkbook(self, workbook):
-        # Get the first worksheet of the template workbook.
-        base = workbook.active
-        # The main loop to create all worksheets for the rooms and fill out all the cells with data.
+    # This function prepares the title and the values of every room sheet.
+    # Returns a list of (room, title, {(row, column):value}) tuples in the order of the rooms.
+    def _getRoomSheets(self):
+        # Collect the values of every room from the 'cellValuesForRoom' and 'cellValueRangeForRoom' dictionaries
+        # in one pass: room:{(row, column):value}.
+        roomValues = collectRoomValues(self.cellValuesForRoom, self.cellValueRangeForRoom, self.rooms)
+        roomSheets = []
         for room in self.rooms:
             # Getting the zone name of the actual room into the 'roomName' variable.
             roomName = self.propertyValuesDictionary[room][self.zoneNamePropertyId].replace("/", "-")
@@ -287,64 +348,127 @@ class WorkBookFiller:
             roomId = self.propertyValuesDictionary[room][self.zoneNumberPropertyId].replace("/", "-")
             # If room is among the rooms (this if statement wouldn't be necessary for this code):
             if self.propertyValuesDictionary[room][self.zoneNumberPropertyId]:
-                # Copy the base worksheet in the same workbook. 
-                worksheet = workbook.copy_worksheet(base)
-                # Set the title as a string of the actual room id and room name. e.g. '01 Bedroom' 
-                worksheet.title = f"{roomId} {roomName}"
-                # Looping through cellValuesForRoom dictionary.
-                for cellAddress, cellValueForRoom in self.cellValuesForRoom.items():
-                    if room in cellValueForRoom:
-                        # Write the actual room id in the 'C4' cell.
-                        worksheet[cellAddress] = cellValueForRoom[room]
-                        # Print the result to the concole.
-                        print(f"{worksheet.title}!{cellAddress}={cellValueForRoom[room]}")
-                # Looping through cellValueRangeForRoom dictionary.
-                for cellAddressrange, cellvalue in self.cellValueRangeForRoom.items():
-                    # Looping through the actual zipped 'cellAddressrange' and 'cellvalue[room]'.
-                    # Taking the cell address range (e.g. ['B20'-'B56'])
-                    # and zipping to the cellvalues of the actual room (Names of the library parts).
-                    # Note: Zip function is zipping till the last element of the shortest list.
-                    # The length of the zipped list of tuples will be the same as the shortest list.
-                    for cellAddress, value in zip(cellAddressrange, cellvalue[room]):
-                        # Write to the actual cells the actual values.
-                        worksheet[cellAddress] = value
-                        # Print the result to the concole.
-                        print(f"{worksheet.title}!{cellAddress}={value}")
+                # The title is a string of the actual room id and room name. e.g. '01 Bedroom'
+                roomSheets.append((room, f"{roomId} {roomName}", roomValues[room]))
+        return roomSheets
+
+    def _fillWorkbook(self, workbook):
+        # Get the first worksheet of the template workbook.
+        base = workbook.active
+        # Analyse the template worksheet once (cells, styles, layout), see 'report_template.py'.
+        template = CompiledTemplate(base)
+        # The main loop to create all worksheets for the rooms and fill out all the cells with data.
+        for room, title, values in self._getRoomSheets():
+            # Create the worksheet from the template with the values of the room.
+            worksheet = template.Render(workbook, title, values)
+            # Print the result to the concole.
+            if printCellValues:
+                for (row, column), value in values.items():
+                    print(f"{worksheet.title}!{worksheet.cell(row=row, column=column).coordinate}={value}")
         # Remove the template worksheet from the file.
         workbook.remove(base)
 
+    # This function saves the report into more workbooks (shards) rendered by parallel worker processes.
+    # Arguments: output path (the shards are saved next to it, see 'getShardPaths'),
+    # function returning the shard key of every room (same order as the rooms list).
+    # Returns the list of the saved paths (the merged workbook if 'mergeShards' is True).
+    def SaveShardedWorkbooks(self, outputPath, getShardKeys):
+        roomSheets = self._getRoomSheets()
+        shardKeys = getShardKeys([room for room, _, _ in roomSheets])
+        shards = groupSheetsIntoShards([(title, values) for _, title, values in roomSheets], shardKeys)
+        # Render and save the shards in parallel.
+        paths = RenderShards(self.templatePath, dict(zip(getShardPaths(outputPath, list(shards)), shards.values())), shardWorkers)
+        for path, (shardKey, sheets) in zip(paths, shards.items()):
+            print(f"Saved {len(sheets)} rooms of '{shardKey}' to {path}")
+        # Merge the shards into one workbook.
+        if mergeShards and paths:
+            MergeWorkbooks(paths, outputPath)
+            return [outputPath]
+        return paths
+
+# This function returns the shard key of every room according to the 'shardBy' configuration.
+# Arguments: rooms (in the order of the report).
+def getShardKeys(rooms):
+    if shardBy == "story":
+        # The rooms are grouped by their 3D bounding box's zMin with the grouping engine (see 'grouping.py').
+        # The rooms without bounding box (an error item instead of the box) get the "No story" key.
+        boundingBoxes = acc.Get3DBoundingBoxes(rooms)
+        zPositions = [bb.boundingBox3D.zMin if hasattr(bb, 'boundingBox3D') else None for bb in boundingBoxes]
+        shardKeys = ["No story"] * len(rooms)
+        roomIndices = [index for index, z in enumerate(zPositions) if z is not None]
+        for storyIndex, story in enumerate(sweepClusters(roomIndices, zPositions, STORY_GROUPING_LIMIT)):
+            for index in story:
+                shardKeys[index] = f"Story {storyIndex}"
+        return shardKeys
+    if shardBy == "category":
+        categoryPropertyId = session.GetBuiltInPropertyId('Zone_ZoneCategoryCode')
+        categories = acu.GetPropertyValuesDictionary(rooms, [categoryPropertyId])
+        return [categories[room].get(categoryPropertyId) or "No category" for room in rooms]
+    if shardBy == "chunk":
+        return chunkShardKeys(len(rooms), shardRoomCount)
+    raise ValueError(f"Unknown shardBy configuration: {shardBy}")
+
 # We start from here:
 # Create the templatepath variable path with filename with the os.path.join method.
 templatePath = os.path.join(templateFolder, templateFileName)
 # Create the main class.
 # Arguments: templatePath, rooms = every 'Zone' type elements.
-wbFiller = WorkBookFiller(templatePath, acc.GetElementsByType("Zone"))
-
-# Fill the 'self.cellValuesForRoom' dictionary with the celladdress and
-# the corresponding propertyvalue of the room if it exist.
-# We need the PropertyIds for this function since we have 'UserIds' defined in the 'cellAddressPropertyUserIdTable'. 
-wbFiller.InsertPropertyValuesTo(dict(zip(
-    list(cellAddressPropertyUserIdTable.keys()),
-    acc.GetPropertyIds(list(cellAddressPropertyUserIdTable.values()))
-)))
-
-# Insert related zones to the 'self.cellValueRangeForRoom' dictionary.
-wbFiller.InsertRelatedZonesTo(insertRelatedZonesTo)
-# Insert related library parts per room to the 'self.cellValueRangeForRoom' dictionary.
-wbFiller.InsertObjectLibPartsTo(insertEquipmentNamesTo, insertEquipmentQuantitiesTo)
-# Insert related openings per room to the 'self.cellValueRangeForRoom' dictionary.
-wbFiller.InsertOpeningsTo(insertOpeningNamesTo, insertOpeningElementIDsTo)
-# Insert related classification per room to the 'self.cellValueRangeForRoom' dictionary.
-wbFiller.InsertClassificationTo(insertClassificationTo)
+# The zones and the property ids of the table are independent so they are sent together.
+with session.Batch():
+    rooms = session.Queue(acc.GetElementsByType, "Zone")
+    cellPropertyIds = session.Queue(session.GetPropertyIds, list(cellAddressPropertyUserIdTable.values()))
+wbFiller = WorkBookFiller(templatePath, rooms.Result())
+
+# The queries of the report: the property values, the related elements (with the properties of the objects
+# and openings) and the classifications of the rooms. They are independent of each other.
+queryCalls = [
+    # The cells of the property values of the rooms if they exist.
+    # We need the PropertyIds for this function since we have 'UserIds' defined in the 'cellAddressPropertyUserIdTable'. 
+    (wbFiller.InsertPropertyValuesTo, (dict(zip(
+        list(cellAddressPropertyUserIdTable.keys()),
+        cellPropertyIds.Result()
+    )),)),
+    # The related elements of the rooms for the related zones, library parts and openings.
+    (wbFiller.FetchRelatedElements, ()),
+    # The cell of the classification of the rooms.
+    (wbFiller.InsertClassificationTo, (insertClassificationTo,)),
+]
+# The queries are running concurrently, their wall time is the time of the slowest one instead of the sum.
+if concurrentQueries:
+    propertyValueCells, _, classificationCells = RunConcurrently(session, queryCalls)
+else:
+    propertyValueCells, _, classificationCells = [function(*args) for function, args in queryCalls]
+
+# Fill the 'self.cellValuesForRoom' and 'self.cellValueRangeForRoom' dictionaries in the order of the template.
+wbFiller.AddCells([
+    # The propertyvalues of the rooms.
+    propertyValueCells,
+    # Insert related zones (from the related walls).
+    wbFiller.InsertRelatedZonesTo(insertRelatedZonesTo),
+    # Insert related library parts per room.
+    wbFiller.InsertObjectLibPartsTo(insertEquipmentNamesTo, insertEquipmentQuantitiesTo),
+    # Insert related openings per room.
+    wbFiller.InsertOpeningsTo(insertOpeningNamesTo, insertOpeningElementIDsTo),
+    # The classification of the rooms.
+    classificationCells,
+])
 
 # Create the output path with joining the iutputfolder and output filename.
 outputPath = os.path.join(outputFolder, outputFileName)
-# This function not only saves the file but calling the other functions to do all excel operations.
-wbFiller.SaveWorkbook(outputPath)
-# Using the Archicad API 'OpenFile' utility open the excel file with the default application
-# for this type of files defined in the OS.
-acu.OpenFile(outputPath)
-
-# If the file saved successfully print out to the console the ok message.
-if os.path.exists(outputPath):
-    print("Saved Room Report")
+# Sharded report: the shards are rendered and saved in parallel, they are not opened one by one.
+if shardBy:
+    savedPaths = wbFiller.SaveShardedWorkbooks(outputPath, getShardKeys)
+    if mergeShards and os.path.exists(outputPath):
+        acu.OpenFile(outputPath)
+    if all(os.path.exists(path) for path in savedPaths):
+        print(f"Saved Room Report ({len(savedPaths)} workbooks)")
+else:
+    # This function not only saves the file but calling the other functions to do all excel operations.
+    wbFiller.SaveWorkbook(outputPath)
+    # Using the Archicad API 'OpenFile' utility open the excel file with the default application
+    # for this type of files defined in the OS.
+    acu.OpenFile(outputPath)
+
+    # If the file saved successfully print out to the console the ok message.
+    if os.path.exists(outputPath):
+        print("Saved Room Report")
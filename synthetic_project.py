@@ -0,0 +1,204 @@
+# Import random to generate the positions, names and ids, uuid for the element guids.
+import random, uuid
+# Import SimpleNamespace to create light objects with the same attributes as the Archicad types.
+from types import SimpleNamespace
+# Import typing not essential for the code.
+from typing import Dict, List, Tuple
+
+# This module generates synthetic project data for the benchmarks (see 'benchmark.py').
+#
+# The data has the same shape as the results of the Archicad commands used by the scripts
+# (element ids with guids, bounding box coordinates, navigator item trees, related elements of the rooms),
+# so the core logic of the scripts can be measured without a running Archicad.
+# The same seed always generates the same project.
+
+
+# This class is like an 'ElementIdArrayItem': item.elementId.guid.
+# It can be a dictionary key (the scripts use the rooms as keys).
+class SyntheticElement:
+    def __init__(self, guid: uuid.UUID):
+        self.elementId = SimpleNamespace(guid=guid)
+
+
+# This function creates an element with a random (but seeded) guid.
+def makeElement(rng: random.Random) -> SyntheticElement:
+    return SyntheticElement(uuid.UUID(int=rng.getrandbits(128)))
+
+
+# This function generates the positions of zones (or parking spaces) on a building grid.
+# The elements are placed on stories and on the two sides of corridors (rows) with some noise,
+# so the tolerance limits of the grouping are needed the same way as in a real project.
+# Arguments: number of elements, random generator, number of elements in a row.
+# Returns the xMin, yMin, zMin lists of the elements (in a random order like the Archicad results).
+def generateGridPositions(count: int, rng: random.Random, rowLength: int = 25) -> Tuple[List[float], List[float], List[float]]:
+    rowsPerStory = 8
+    positions = []
+    for index in range(count):
+        story, inStory = divmod(index, rowLength * rowsPerStory)
+        row, column = divmod(inStory, rowLength)
+        positions.append((column * 4.0 + rng.uniform(-0.5, 0.5),
+                          row * 6.0 + rng.uniform(-0.1, 0.1),
+                          story * 3.2 + rng.uniform(-0.2, 0.2)))
+    rng.shuffle(positions)
+    return [p[0] for p in positions], [p[1] for p in positions], [p[2] for p in positions]
+
+
+# This function creates the result of the 'Get3DBoundingBoxes' command from the min positions:
+# list of objects with 'boundingBox3D' (xMin, yMin, zMin, xMax, yMax, zMax).
+# Arguments: xMin, yMin, zMin lists, random generator (for the sizes).
+def generateBoundingBoxes(xs: List[float], ys: List[float], zs: List[float], rng: random.Random) -> List[SimpleNamespace]:
+    return [SimpleNamespace(boundingBox3D=SimpleNamespace(xMin=x, yMin=y, zMin=z, xMax=x + rng.uniform(2, 6),
+                                                          yMax=y + rng.uniform(2, 6), zMax=z + 3.0))
+            for x, y, z in zip(xs, ys, zs)]
+
+
+# This function generates the chairs of an auditorium: rows raising in z, every row with an aisle in the middle.
+# Arguments: number of chairs, random generator.
+# Returns the x and z position of the chairs (in a random order).
+def generateChairPositions(count: int, rng: random.Random) -> Tuple[List[float], List[float]]:
+    chairsPerRow = 40
+    positions = []
+    for index in range(count):
+        row, seat = divmod(index, chairsPerRow)
+        # The aisle is 1.2 m wide in the middle of the row.
+        x = seat * 0.55 + (1.2 if seat >= chairsPerRow // 2 else 0.0)
+        positions.append((x + rng.uniform(-0.02, 0.02), row * 0.35 + rng.uniform(-0.05, 0.05)))
+    rng.shuffle(positions)
+    return [p[0] for p in positions], [p[1] for p in positions]
+
+
+# This function generates the bounding boxes of the chairs of 'generateChairPositions' (0.5 m wide chairs,
+# so the empty gap of the chairs next to each other is about 5 cm and the aisle is 1.25 m).
+# Arguments: number of chairs, random generator.
+def generateChairBoundingBoxes(count: int, rng: random.Random) -> List[SimpleNamespace]:
+    xs, zs = generateChairPositions(count, rng)
+    return [SimpleNamespace(boundingBox3D=SimpleNamespace(xMin=x, yMin=0.0, zMin=z, xMax=x + 0.5, yMax=0.5, zMax=z + 0.9))
+            for x, z in zip(xs, zs)]
+
+
+# This function generates a navigator item tree like the view map or the layout book.
+# Every item has a 'navigatorItemId', a 'name' and 'children' (list of wrappers with a 'navigatorItem' attribute, or None).
+# Arguments: number of items, random generator, max number of children of a folder.
+# Returns the root item and the list of all the items.
+def generateNavigatorTree(count: int, rng: random.Random, maxChildren: int = 12) -> Tuple[SimpleNamespace, List[SimpleNamespace]]:
+    def makeItem():
+        return SimpleNamespace(navigatorItemId=SimpleNamespace(guid=uuid.UUID(int=rng.getrandbits(128))),
+                               name=f"View {len(items)}", children=None, sourceNavigatorItemId=None)
+    items = []
+    root = makeItem()
+    items.append(root)
+    folders = [root]
+    while len(items) < count:
+        parent = rng.choice(folders)
+        if parent.children is None:
+            parent.children = []
+        item = makeItem()
+        parent.children.append(SimpleNamespace(navigatorItem=item))
+        items.append(item)
+        # A full folder does not get more children.
+        if len(parent.children) >= maxChildren:
+            folders.remove(parent)
+        # Every third item is a folder (a new folder is opened if all of them are full).
+        if rng.random() < 0.33 or not folders:
+            folders.append(item)
+    return root, items
+
+
+# This function marks a part of the items as used: they are linked from the layout book or the publisher sets
+# (their guid is the 'sourceNavigatorItemId' of another item).
+# Arguments: the items, ratio of the used items, random generator.
+# Returns the set of the used guids.
+def generateUsedItems(items: List[SimpleNamespace], ratio: float, rng: random.Random) -> set:
+    return {item.navigatorItemId.guid for item in items if rng.random() < ratio}
+
+
+# This function generates rooms with their related walls, objects and openings.
+# The rooms are in a grid, the walls between the neighbouring rooms are shared (adjacent rooms),
+# the openings are in the shared walls so they are related to both rooms.
+# Arguments: number of rooms, random generator.
+# Returns the rooms, dictionary with room:[related elements] and dictionary with element guid:element type.
+def generateRooms(count: int, rng: random.Random) -> Tuple[List, Dict, Dict[str, str]]:
+    columns = max(1, int(count ** 0.5))
+    rooms = [makeElement(rng) for _ in range(count)]
+    relatedElements = {room: [] for room in rooms}
+    elementTypes = {}
+
+    def add(element, elementType, *roomsOfElement):
+        elementTypes[str(element.elementId.guid)] = elementType
+        for room in roomsOfElement:
+            relatedElements[room].append(element)
+
+    for index, room in enumerate(rooms):
+        # The wall to the right and below neighbours are shared, with a door in some of them.
+        for neighbour in (index + 1 if (index + 1) % columns else None, index + columns):
+            if neighbour is not None and neighbour < count:
+                add(makeElement(rng), "Wall", room, rooms[neighbour])
+                if rng.random() < 0.5:
+                    add(makeElement(rng), "Door", room, rooms[neighbour])
+        # Own outer wall, windows and furniture.
+        add(makeElement(rng), "Wall", room)
+        for _ in range(rng.randint(0, 3)):
+            add(makeElement(rng), "Window", room)
+        for _ in range(rng.randint(0, 8)):
+            add(makeElement(rng), "Object", room)
+    return rooms, relatedElements, elementTypes
+
+
+# This function generates the element ids of the elements with some conflicts (same id for more elements).
+# Arguments: number of elements, ratio of the conflicting elements, random generator.
+# Returns dictionary with element guid:element ID key:value pairs.
+def generateElementIds(count: int, conflictRatio: float, rng: random.Random) -> Dict[str, str]:
+    elementIds = {}
+    for index in range(count):
+        guid = str(uuid.UUID(int=rng.getrandbits(128)))
+        # A conflicting element gets the id of an earlier element.
+        value = f"E-{rng.randrange(index):06d}" if index and rng.random() < conflictRatio else f"E-{index:06d}"
+        elementIds[guid] = value
+    return elementIds
+
+
+# This class is like a 'PropertyIdArrayItem': item.propertyId.guid.
+# It can be a dictionary key (the property values dictionaries use the property ids as keys).
+class SyntheticPropertyId:
+    def __init__(self, guid: uuid.UUID):
+        self.propertyId = SimpleNamespace(guid=guid)
+
+
+# The Archicad types used by the Excel import (act.ElementId, act.PropertyId, act.ElementPropertyValue).
+syntheticTypes = SimpleNamespace(
+    ElementId=lambda guid: SimpleNamespace(guid=guid),
+    PropertyId=lambda guid: SimpleNamespace(guid=guid),
+    ElementPropertyValue=lambda elementId, propertyId, propertyValue: SimpleNamespace(elementId=elementId, propertyId=propertyId,
+                                                                                       propertyValue=propertyValue))
+
+
+# This function generates the property values of elements like the ones exported by the Excel export.
+# Arguments: number of elements, number of properties, random generator.
+# Returns the elements, the property ids, the property definitions (details of the properties) and the result
+# of the 'GetPropertyValuesDictionary' utility: {element : {property id : value}}.
+def generatePropertyValues(count: int, propertyCount: int, rng: random.Random) -> Tuple[List, List, List, Dict]:
+    elements = [makeElement(rng) for _ in range(count)]
+    propertyIds = [SyntheticPropertyId(uuid.UUID(int=rng.getrandbits(128))) for _ in range(propertyCount)]
+    propertyDefinitions = [SimpleNamespace(group=SimpleNamespace(name="General Parameters"), name=f"Property {index}")
+                           for index in range(propertyCount)]
+    propertyValuesDictionary = {element: {propertyId: round(rng.uniform(0, 100), 3) for propertyId in propertyIds}
+                                for element in elements}
+    return elements, propertyIds, propertyDefinitions, propertyValuesDictionary
+
+
+# This function creates the 'GetPropertyValuesOfElements' command of the synthetic project: the current values
+# of the elements (the values of 'generatePropertyValues' changed by 'changeRatio', so the import has values to write).
+# Arguments: the {element : {property id : value}} dictionary, ratio of the changed values, random generator.
+# Returns the function (element ids, property ids) -> list of objects with 'propertyValues' (same shape as the command's result).
+def makeGetPropertyValuesOfElements(propertyValuesDictionary: Dict, changeRatio: float, rng: random.Random):
+    currentValues = {str(element.elementId.guid): {str(propertyId.propertyId.guid): value + 1 if rng.random() < changeRatio else value
+                                                   for propertyId, value in valuesDictionary.items()}
+                     for element, valuesDictionary in propertyValuesDictionary.items()}
+
+    def getPropertyValuesOfElements(elementIds: List, propertyIds: List) -> List[SimpleNamespace]:
+        return [SimpleNamespace(propertyValues=[
+                    SimpleNamespace(propertyValue=SimpleNamespace(type="real", status="normal",
+                                                                  value=currentValues[str(elementId.guid)][str(propertyId.guid)]))
+                    for propertyId in propertyIds])
+                for elementId in elementIds]
+    return getPropertyValuesOfElements
@@ -1,17 +1,19 @@
-# Import archicad connection (required), handle_dependencies is not necessary.
-from archicad import ACConnection
+# Import the shared session module (required).
+from archicad_session import OpenSession
+# Import the navigator tree helper to find the unused items.
+from navigator_tree import findTopmostUnusedItems
 
 # Establish the connection with the Archicad software, Archicad must be open and the pln file must be open too.
 #
 # We can use the acu.OpenFile() utility but we need an established connection first so we need to open Archicad and a new plan
 # as a minimum because all utilities use the connection.
-conn = ACConnection.connect()
-assert conn
+# The shared session module is doing the connection and it can send independent commands together.
+session = OpenSession()
 
 # Create shorts of the commands, types and utilities.
-acc = conn.commands
-act = conn.types
-acu = conn.utilities
+acc = session.commands
+act = session.types
+acu = session.utilities
 
 # original comment -> ################################ CONFIGURATION #################################
 # These vairables can be changed based on our needs.
@@ -29,61 +31,42 @@ folderNameForPreviousRun = '-- Previous UnusedViews --'
 def isLinkNavigatorItem(item : act.NavigatorItem):
     return item.sourceNavigatorItemId is not None
 
+# The three requests below are independent, so they are queued and sent together.
 # Getting the ##'LayoutBook' navigator item tree,
 # with the 'GetNavigatorItemTree' using the 'NavigatorTreeId' type.
-layoutBookTree = acc.GetNavigatorItemTree(act.NavigatorTreeId('LayoutBook'))
+layoutBookTree = session.Queue(acc.GetNavigatorItemTree, act.NavigatorTreeId('LayoutBook'))
+# Getting the navigator item tree of the 'ViewMap' (used later).
+viewMapTree = session.Queue(acc.GetNavigatorItemTree, act.NavigatorTreeId('ViewMap'))
+publisherSetNames = session.Queue(acc.GetPublisherSetNames)
+session.Flush()
 # Getting all navigator items with 'sourceNavigatorItemId' in the links list.  
-links = acu.FindInNavigatorItemTree(layoutBookTree.rootItem, isLinkNavigatorItem)
+links = acu.FindInNavigatorItemTree(layoutBookTree.Result().rootItem, isLinkNavigatorItem)
 
+# From 'PublisherSets'/every publisher set getting the navigator item tree,
+# these requests are also sent together.
+publisherSetTrees = [session.Queue(acc.GetNavigatorItemTree, act.NavigatorTreeId('PublisherSets', publisherSetName))
+                        for publisherSetName in publisherSetNames.Result()]
+session.Flush()
 # In all publisher sets loop through 
-for publisherSetName in acc.GetPublisherSetNames():
-    # From 'PublisherSets'/actual publisher set getting the navigator item tree.
-	publisherSetTree = acc.GetNavigatorItemTree(act.NavigatorTreeId('PublisherSets', publisherSetName))
+for publisherSetTree in publisherSetTrees:
     # Adding the actual publisher set navigator items whith 'sourceNavigatorItemId' to the links list.
-	links += acu.FindInNavigatorItemTree(publisherSetTree.rootItem, isLinkNavigatorItem)
+    links += acu.FindInNavigatorItemTree(publisherSetTree.Result().rootItem, isLinkNavigatorItem)
 
 # Getting all unique source links' guids to this set from the links list
 # using list comprehension. 
 sourcesOfLinks = set(link.sourceNavigatorItemId.guid for link in links)
 
-# Getting the navigator item tree of the 'ViewMap'.
-viewMapTree = acc.GetNavigatorItemTree(act.NavigatorTreeId('ViewMap'))
-# Getting unused view tree items out of the viewMapTree if
-# their name is no 'folderName' and not 'folderNameForPreviousRun'
-# and not its navigator id is not in the source links ('sourcesOfLinks').
-unusedViewTreeItems = acu.FindInNavigatorItemTree(viewMapTree.rootItem,
-    lambda node: node.name != folderName and node.name != folderNameForPreviousRun
-        # With this 'FindInNavigatorItemTree' nested 'FindInNavigatorItemTree' in our particular case
-        # the code does not take the nodes and children nodes and so on into the list since we are
-        # negating hence both our out, however if we would want the same as inclusive both the father and children nodes
-        # would be included in the list. This would cause a bit of confusion.
-        # In general the better way would be to start with the 'sourcesOfLinks' list check and then the folders check
-        # to avoid the above confusion.
-        # In the code below this confusion is handled with a for loop so it works fine in any case.
-        and not acu.FindInNavigatorItemTree(node, lambda i: i.navigatorItemId.guid in sourcesOfLinks)
-    )
-# The filtered list will contain only the 'father' not used elements itself.
-unusedViewTreeItemsFiltered = []
-# Loop through the 'unusedViewTreeItems' list
-# to collect the 'father' elements from the 'unusedViewTreeItems' list.
-for ii in unusedViewTreeItems:
-    # Is it a child of an unused item? start value is False.
-    isChildOfUnused = False
-    # Loop through 'unusedViewTreeItems' list.
-    for jj in unusedViewTreeItems:
-        # If the actual element from the first loop is not the same as the actual element of the second loop
-        # and their navigatorItemIds are equal, It means that it is a child element of a not used 'father element'.
-        if ii != jj and acu.FindInNavigatorItemTree(jj, lambda node: node.navigatorItemId.guid == ii.navigatorItemId.guid):
-            # Is it a child of an unused? Yes.
-            isChildOfUnused = True
-            # Leave it and go to the next element.
-            break
-    # If not False means it is True.
-    if not isChildOfUnused:
-        # It is a 'father' element so append to the filtered list.
-        unusedViewTreeItemsFiltered.append(ii)
-# Overwrite the old 'unusedViewTreeItems' list with the filtered one.
-unusedViewTreeItems = unusedViewTreeItemsFiltered
+# Take the navigator item tree of the 'ViewMap' (it was requested together with the 'LayoutBook' tree).
+viewMapTree = viewMapTree.Result()
+# Getting the topmost unused view tree items out of the viewMapTree
+# with the 'findTopmostUnusedItems' function (see 'navigator_tree.py').
+# An item is unused if neither the item nor any item below it is the source of a link ('sourcesOfLinks').
+# The items named 'folderName' and 'folderNameForPreviousRun' are never listed, but the items inside them are checked.
+# The tree is walked only twice and only the 'father' unused items are returned, so their
+# children do not need to be filtered out afterwards.
+unusedViewTreeItems = findTopmostUnusedItems(viewMapTree.rootItem,
+    isUsed=lambda node: node.navigatorItemId.guid in sourcesOfLinks,
+    isExcluded=lambda node: node.name == folderName or node.name == folderNameForPreviousRun)
 
 # Rename the name of the items in the viewMapTree to folderName.
 folderFromPreviousRun = acu.FindInNavigatorItemTree(viewMapTree.rootItem, lambda i: i.name == folderName)
@@ -1,36 +1,46 @@
-# import archicad connection (required)
-from archicad import ACConnection
-# import typing and string not essential for the code
-from typing import List, Tuple, Iterable
-# import itertools cycle method but in this particular code
-# it wouldnt be necessary to use cycle.
-from itertools import cycle
+# import the shared session module (required)
+from archicad_session import OpenSession
+# import the shared diff stage to write only the changed property values
+from property_writer import VerifyWrittenValues, WriteChangedPropertyValues
+# import os to find the folder of the script (for the numbering state file)
+import os
+# import handle_dependencies to check the numpy module
+from archicad import handle_dependencies
+
+# Check if the numpy is importable (installed) if not returns an error
+handle_dependencies('numpy')
+
+# import the numpy bounding box array to group the zones by levels and sides
+from bounding_box_arrays import BoundingBoxArray
+# import the saved numbering state to renumber only the changed stories
+from numbering_state import NumberingState, UpdateNumbering, getElementGuid
 
 # Establish the connection with the Archicad software, Archicad must be open and the pln file must be open too.
 #
 # We can use the acu.OpenFile() utility but we need an established connection first so we need to open Archicad and a new plan
 # as a minimum because all utilities use the connection.
-conn = ACConnection.connect()
-# assert that the connection is alive
-assert conn
+# The shared session module is doing the connection and it can send independent commands together.
+session = OpenSession()
 
 # Create shorts of the commands, types and utilities.
-acc = conn.commands
-act = conn.types
-acu = conn.utilities
+acc = session.commands
+act = session.types
+acu = session.utilities
 
 # original comment -> ################################ CONFIGURATION #################################
 # Getting the property Id (guid) for the General_ElementID property
 # in order to use this to identify
 # the property exactly when we communicate with the API
 # (this is a unique identifier like our social security number).
-propertyId = acu.GetBuiltInPropertyId('Zone_ZoneNumber')
+# The property id and the zones are independent, so the two requests are queued
+# and sent together to Archicad (see 'archicad_session.py').
+propertyIdResult = session.Queue(session.GetBuiltInPropertyId, 'Zone_ZoneNumber')
 
 propertyValueStringPrefix = ''
 # We collect all the 'Zone' element into the 'elements' list
 # using the 'Zone' type with the GetElementsByType command.
 # The elements list contains the 'guids' of all the the zones in the project.
-elements = acc.GetElementsByType('Zone')
+elementsResult = session.Queue(acc.GetElementsByType, 'Zone')
 
 # These variables are to consider some kind of tolerance in the 'z' and ''y coordinate of the zone positions
 # when we are sorting them by the level and the side of the building where they are.
@@ -48,118 +58,90 @@ STORY_GROUPING_LIMIT = 1
 def GeneratePropertyValueString(storyIndex: int, elemIndex: int) -> str:
     # storyIndex 1 digits, elemIndex 2 digits and below 10 it starts with 0.
     return f"{propertyValueStringPrefix}{storyIndex:1d}{elemIndex:02d}"
+
+# How the written values are checked (see 'VerifyWrittenValues' in 'property_writer.py'):
+# "none", "fromWriteResults" (the results of the write, no extra request), "sampled" (read back
+# 'verificationSampleSize' random zones) or "full" (read back every zone).
+verificationMode = "fromWriteResults"
+verificationSampleSize = 100
+# Print every checked guid and value to the console (the problems are always printed).
+printVerificationReport = False
+
+# The folder of the numbering state files (see 'numbering_state.py'): the bounding boxes and numbers of the last run,
+# one file per project (named by 'session.GetProjectKey()').
+# Only the stories with added, removed or moved zones are numbered and written again.
+# None means every zone is numbered and checked on every run.
+numberingStateFolder = os.path.join(os.path.dirname(os.path.realpath(__file__)), "zone_numbering_state")
+# Number all the zones again even if there is a state (e.g. after the zone numbers were changed by hand).
+fullRenumbering = False
 # original comment -> ################################################################################
 
-# This function prepares NormalStringPropertyValue type from the string
-# generated by the function 'GeneratePropertyValueString'.
-# The function of GeneratePropertyValueString could be combined with this
-# since these two functions are working always together.
-def generatePropertyValue(storyIndex: int, elemIndex: int) -> act.NormalStringPropertyValue:
-    return act.NormalStringPropertyValue(GeneratePropertyValueString(storyIndex, elemIndex))
-
-# Create a list of the different levels and building sides.
-# Arguments: List of elements' zMin values, yMin values, tolerance limit.
-# Returns list of tuples(zMin, zMax) with the different levels or
-# (yMin, yMax) with the different side y coordinate.
-# The Min and Max values are always equal in our case.
-def createClusters(positions: Iterable[float], limit: float) -> List[Tuple[float, float]]:
-    # When we are getting the zones to the elements list
-    # the order of the zones is not following our particular logic.
-    # For that reason 'positions' needs to be sorted to avoid duplicates in the 'clusters' list.
-    positions = sorted(positions)
-    # If there is no elements nothing to sort so return an empty list.
-    # In our case we always have elemnts so this check is redundant.
-    if len(positions) == 0:
-        return []
-    # Create empty list for the end result
-    clusters = []
-    # Make the 'position' list iterabel. The list is iterable so this is not required.
-    posIter = iter(positions)
-    # All postions are equel to the first position in the 'positions' list.
-    # In our case we would only need 1 position i.e. firstPos.
-    firstPos = lastPos = next(posIter)
-
-    # Loop all the position and append to the 'clusters' list
-    for pos in posIter:
-    # the different levels or side y coordinate only.
-    # If the actual position - lastPos which is the start at the beginning <= limit (could be == 0).
-        if pos - lastPos <= limit:
-            # Take the actual position as the last one and continue with the next position.
-            lastPos = pos
-            # Else (the actual position - last position > limit (could be > 0)).
-        else:
-            # Append the first and last position tuple to the clusters list.
-            # Fisrt position and last position are always equal in our case.
-            clusters.append((firstPos, lastPos))
-            # Update all the positions to be equal to pos and continue with the next position.
-            firstPos = lastPos = pos
-    # The last position will not reach the else statement because of the lack of next different value,
-    # In order to be this value also added to the 'clusters' list we need to append this after the loop finishes.
-    clusters.append((firstPos, lastPos))
-    return clusters
+# The state file of the open project. The projects without identity (see 'GetProjectKey' in 'archicad_session.py')
+# can not be kept apart in the state folder, every zone of them is numbered on every run.
+numberingStateFile = None
+if numberingStateFolder:
+    projectKey = session.GetProjectKey()
+    if projectKey is None:
+        print("The project has no identity (it is not saved or the Tapir add-on is not installed), every zone is numbered.")
+    else:
+        numberingStateFile = os.path.join(numberingStateFolder, projectKey + '.npz')
+
+# Send the queued requests and take their results.
+propertyId = propertyIdResult.Result()
+elements = elementsResult.Result()
 
 # Getting all 3d bounding boxes of all the zones.
 # The bounding box contains the x, y, z minimum and maximum values of the box
 # can be drawn around the element containging the whole element!
 # Returns a list.
 boundingBoxes = acc.Get3DBoundingBoxes(elements)
-# List of each elements and its bounding box follows.
-# Calling zip method on the elements list and the bounding box list.
-elementBoundingBoxes = list(zip(elements, boundingBoxes))
-# We create the list of the different values of the levels where the zones are located on.
-# Arguments: zMin values of the zones, limit which is the tolerance of the level.
-zClusters = createClusters((bb.boundingBox3D.zMin for bb in boundingBoxes), STORY_GROUPING_LIMIT)
-
-# StoryIndex will increase when all zones on the actual level have their property values generated
-# and appended to the elemPropertyValues list.
-storyIndex = 0
-elemPropertyValues = []
-# Loop through all the zones taking the zMin and zMax.
-# These two values are the same practically and in that sense only the zMin positin would be enough.
-for (zMin, zMax) in zClusters:
-    # Initialise elemIndex with 1 as the first zone element on the actual floor
-    elemIndex = 1
-    # Using list comprehension we prepare a list with the all the zones on the same level 
-    elemsOnStory = [e for e in elementBoundingBoxes if zMin <= e[1].boundingBox3D.zMin <= zMax]
-    # Based on the above created list with all the zones on the actual floor
-    # we are creating 'clusters' list with the side y coordinates.
-    yClusters = createClusters((e[1].boundingBox3D.yMin for e in elemsOnStory), ROW_GROUPING_LIMIT)
-
-    # This loop takes the y Min and Y Max coordinates and the side boolean list zipped and
-    # prepares the final values of the zone numbers.
-    for ((yMin, yMax), reverseOrder) in zip(yClusters, cycle([False, True])):
-        # With list comprehension we are taking the zones on the actual level for the actual side only.
-        elemsInRow = [e for e in elemsOnStory
-                        if yMin <= e[1].boundingBox3D.yMin <= yMax]
-
-        # This loop generate the property values of the zones on the actual level and actual side
-        # Taking the list of the elementsInRow sorted by the xMin values and ordered by the boolean value
-        # which depends on the side.
-        for (elem, bb) in sorted(elemsInRow, key=lambda e: e[1].boundingBox3D.xMin, reverse=reverseOrder):
-            # Preparing and appending the property values to the final elemPropertyValues list
-            # Archicad API type used: ElementPropertyValue()
-            # Arguments: elementId, propertyId,
-            # the string of the value created by the generatePropertyValue function
-            # taking as arguments the storyIndex (level), elemIndex (index number).
-            elemPropertyValues.append(act.ElementPropertyValue(
-                elem.elementId, propertyId, generatePropertyValue(storyIndex, elemIndex)))
-            # Increase elemIndex to go to the next element.
-            elemIndex += 1
-    # Increase the storyIndex to go to the next story
-    storyIndex += 1
+# We group the zones by levels (z) and the levels by the sides of the building (y)
+# with the shared grouping engine (see 'grouping.py').
+# Every zone is sorted only inside its own level and side, the zones are not rescanned per level.
+# Arguments: the tolerance of the level and the side.
+# The grouping is recorded as the 'cluster' phase if the instrumentation is on (see 'archicad_session.py').
+with session.Phase('cluster'):
+    # The bounding boxes are converted once into a numpy array (see 'bounding_box_arrays.py'),
+    # the levels and rows are found on the whole xMin, yMin, zMin columns at once.
+    boxes = BoundingBoxArray.FromBoundingBoxes(boundingBoxes)
+    # The bounding boxes are compared with the ones of the last run (see 'numbering_state.py'),
+    # only the levels with added, removed or moved zones are grouped and numbered again,
+    # the other zones keep their numbers. Without a state every level is numbered.
+    # The numbers are the same as the 'groupIntoStoriesAndRows' and 'numberStoriesAndRows' functions
+    # of 'grouping.py' give, the sides are numbered in alternating direction.
+    state = NumberingState.Load(numberingStateFile) if numberingStateFile and not fullRenumbering else None
+    numbering = UpdateNumbering([getElementGuid(element) for element in elements], boxes, state,
+                                STORY_GROUPING_LIMIT, ROW_GROUPING_LIMIT, GeneratePropertyValueString,
+                                settings={'prefix': propertyValueStringPrefix, 'storyLimit': STORY_GROUPING_LIMIT,
+                                          'rowLimit': ROW_GROUPING_LIMIT, 'propertyId': str(propertyId.guid).lower()})
+print(numbering)
+
+# Preparing the property values of the renumbered zones only.
+# Archicad API type used: ElementPropertyValue()
+# Arguments: elementId, propertyId,
+# the string of the value created by the 'GeneratePropertyValueString' function
+# from the storyIndex (level, starting from 0) and the elemIndex (index number on the level, starting from 1).
+elemPropertyValues = [act.ElementPropertyValue(elements[index].elementId, propertyId,
+                                               act.NormalStringPropertyValue(numbering.numbers[index]))
+                      for index in numbering.recomputedIndices]
 
 # Set the new property values.
 # Argument: elemPropertyValues list.
-acc.SetPropertyValuesOfElements(elemPropertyValues)
+# Only the values different from the current ones are written (see 'property_writer.py'),
+# a re-run on an unchanged model does not modify anything.
+writeSummary = WriteChangedPropertyValues(session, elemPropertyValues)
+print(writeSummary)
 
 # original comment -> # Print the result
 # Check and print the results:
-# Using the 'GetPropertyValuesOfElements' command with the 'elements' and propertyId list arguments
-# preapre a list with the zones modified properties.
-newValues = acc.GetPropertyValuesOfElements(elements, [propertyId])
-# Using list comprehension preapre a list of tuples with elements ids and their property values respectively.
-elemAndValuePairs = [(elements[i].elementId.guid, v.propertyValue.value) for i in range(len(newValues)) for v in newValues[i].propertyValues]
-# Print the elem 'elemAndValuePairs' list sort by the property values.
-# Calling the sorted method on the list using sorting key to be the property value of the tuple.
-for elemAndValuePair in sorted(elemAndValuePairs, key=lambda p: p[1]):
-    print(elemAndValuePair)
+# Reading back the values of all the zones doubles the requests, so the 'verificationMode' decides how they are checked,
+# the default uses the results of the write (see 'VerifyWrittenValues' in 'property_writer.py').
+verificationReport = VerifyWrittenValues(session, writeSummary, elemPropertyValues, verificationMode, verificationSampleSize)
+print(verificationReport)
+# Print the checked elements ids and their property values sorted by the property values (in one write to the console).
+verificationReport.Print(onlyProblems=not printVerificationReport)
+
+# Save the state for the next run. If a value was not written the state is not saved,
+# so the next run numbers those levels again.
+if numberingStateFile and not verificationReport.Problems():
+    numbering.state.Save(numberingStateFile)
@@ -1,49 +1,57 @@
-# import archicad connection (required)
-from archicad import ACConnection
+# import the shared session module (required)
+from archicad_session import OpenSession
+# import the shared diff stage to write only the changed property values
+from property_writer import WriteChangedPropertyValues
+# import typing not essential for the code
+from typing import List
+# import handle_dependencies to check the numpy module
+from archicad import handle_dependencies
+
+# Check if the numpy is importable (installed) if not returns an error
+handle_dependencies('numpy')
+
+# import the numpy bounding box array and the vectorized 'larger first' formatting
+from bounding_box_arrays import BoundingBoxArray, FormatLargerFirst
 
 # Establish the connection with the Archicad software, Archicad must be open and the pln file must be open too.
 #
 # We can use the acu.OpenFile() utility but we need an established connection first so we need to open Archicad and a new plan
 # as a minimum because all utilities use the connection.
-conn = ACConnection.connect()
-# assert that the connection is alive
-assert conn
+# The shared session module is doing the connection and it can send independent commands together.
+session = OpenSession()
 
 # Create shorts of the commands, types and utilities.
-acc = conn.commands
-act = conn.types
-acu = conn.utilities
+acc = session.commands
+act = session.types
+acu = session.utilities
 
 # original comment -> ################################ CONFIGURATION #################################
 # Getting the property Id (guid) of the user defined 'Zone Overall' property
 # from the Zones group in order to use this to identify
 # the property exactly when we communicate with the API
 # (this is a unique identifier like our social security number).
-propertyId = acu.GetUserDefinedPropertyId("ZONES", "Zone Overall")
+# The property id and the zones are independent, so the two requests are queued
+# and sent together to Archicad (see 'archicad_session.py').
+propertyIdResult = session.Queue(session.GetUserDefinedPropertyId, "ZONES", "Zone Overall")
 # We collect all the 'Zone' element into the 'elements' list
 # using the 'Zone' type with the GetElementsByType command.
 # The elements list contains the 'guids' of all the the zones in the project.
-elements = acc.GetElementsByType('Zone')
+elementsResult = session.Queue(acc.GetElementsByType, 'Zone')
 
-# With this function we generate a string property value
+# With this function we generate the string property values of all the zones at once
 # since the user defined 'Zone Overall' is a string type property.
-# Takes as argument the width and height
-# returns a string: width x height or height x width
+# Takes as argument the widths and heights (numpy arrays)
+# returns a list of strings: width x height or height x width
 # taking the highest of these two first.
-def GeneratePropertyValueString(width: float, height: float) -> str:
+def GeneratePropertyValueStrings(widths, heights) -> List[str]:
     # original comment -> # show highest value first - office preference.
-    if width > height:
-        return f"{width:.2f} x {height:.2f}"
-    else:
-        return f"{height:.2f} x {width:.2f}"
+    return FormatLargerFirst(widths, heights, decimals=2, separator=" x ")
 # original comment -> ################################################################################
 
-# This function prepares NormalStringPropertyValue type from the string
-# generated by the function 'GeneratePropertyValueString'.
-# The function of GeneratePropertyValueString could be combined with this
-# since these two functions are working always together.
-def generatePropertyValue(width: float, height: float) -> act.NormalStringPropertyValue:
-    return act.NormalStringPropertyValue(GeneratePropertyValueString(width, height))
+# This function prepares NormalStringPropertyValue type from a string
+# generated by the function 'GeneratePropertyValueStrings'.
+def generatePropertyValue(valueString: str) -> act.NormalStringPropertyValue:
+    return act.NormalStringPropertyValue(valueString)
 
 
 # Getting all 2d bounding boxes of all the zones.
@@ -51,30 +59,37 @@ def generatePropertyValue(width: float, height: float) -> act.NormalStringProper
 # can be drawn around the element containging the whole element!
 # Returns a list.
 # original comment -> # collect all the data
+propertyId = propertyIdResult.Result()
+elements = elementsResult.Result()
 boundingBoxes = acc.Get2DBoundingBoxes(elements)
 
-# Dictionary of each element and its bounding box follows.
-# Calling zip method on the elements list and the bounding box list.
+# The bounding boxes are converted once into a numpy array (one row per element, same order as the elements list),
+# see 'bounding_box_arrays.py'.
 # original comment -> # bind bounding boxes to element ids
-elementBoundingBoxDict = dict(zip(elements, boundingBoxes))
+boxes = BoundingBoxArray.FromBoundingBoxes(boundingBoxes)
 
 # Initialise the elemntPropertyValues list to collect all the final elementproperty values.
 # original comment -> # calculated the widths and heights
 elemPropertyValues = []
-# This for loop is filling up the above created list calculating the width and height.
-for key,value in elementBoundingBoxDict.items():
-        # width = xMax - xMin
-        width = abs(value.boundingBox2D.xMax - value.boundingBox2D.xMin)
-        # height = yMax - yMin
-        height = abs(value.boundingBox2D.yMax - value.boundingBox2D.yMin)
-        
-        # Generate the property value calling the generatePropertyValue function. 
-        newPropertyValue = generatePropertyValue(width, height)
+# The widths (xMax - xMin) and heights (yMax - yMin) of all the zones are calculated at once,
+# the strings are formatted at once too.
+widths, heights, _ = boxes.Extents()
+valueStrings = GeneratePropertyValueStrings(widths, heights)
+# This for loop is filling up the above created list.
+# A zone without bounding box (the command returned an error for it) is skipped.
+for element, valueString, hasBoundingBox in zip(elements, valueStrings, boxes.IsValid()):
+        if not hasBoundingBox:
+            continue
+        # Generate the property value calling the generatePropertyValue function.
+        newPropertyValue = generatePropertyValue(valueString)
         # Generate and append the element property values.
         # ElementPropertyValue type takes arguments:
         # elementId, propertyId, property value
-        elemPropertyValues.append(act.ElementPropertyValue(key.elementId, propertyId, newPropertyValue))
+        elemPropertyValues.append(act.ElementPropertyValue(element.elementId, propertyId, newPropertyValue))
  
 # original comment -> # set the new property values
 # Argument: elemPropertyValues list. (It takes only list even if we have one element)
-acc.SetPropertyValuesOfElements(elemPropertyValues)
+# Only the values different from the current ones are written (see 'property_writer.py'),
+# a re-run on an unchanged model does not modify anything.
+writeSummary = WriteChangedPropertyValues(session, elemPropertyValues)
+print(writeSummary)